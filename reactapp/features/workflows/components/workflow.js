@@ -11,7 +11,7 @@ import {
   SelectionMode
 } from '@xyflow/react';
 import '@xyflow/react/dist/style.css';
-import { FaPlay } from "react-icons/fa";
+import { FaPlay, FaStop } from "react-icons/fa";
 import { useWorkflows } from '../hooks/useWorkflowsContext';
 import { types } from '../store/actions/actionsTypes';
 import NodeConfigPopup from './NodeConfigPopup';
@@ -124,7 +124,7 @@ const NODE_FORMS = {
 
 
 function ProcessNode({ id, data, selected }) {
-  const { dispatch, state } = useWorkflows();
+  const { dispatch, state, cancelNode } = useWorkflows();
   const { backend } = useContext(AppContext);
 
   const base = {
@@ -180,6 +180,11 @@ function ProcessNode({ id, data, selected }) {
     }
   };
 
+  const onCancelNode = (e) => {
+    e.stopPropagation();
+    cancelNode(id);
+  };
+
   const status = data?.status ?? 'idle';
   const statusIcon = (
     status === 'running' ? <Icons.spinner /> :
@@ -239,6 +244,20 @@ function ProcessNode({ id, data, selected }) {
             <FaPlay size={8}/>
           </button>
         )}
+        {(status === 'running' || status === 'queued') && (
+          <button
+            onClick={onCancelNode}
+            title="Cancel this node's run"
+            style={{
+              display: 'grid', placeItems: 'center',
+              width: 22, height: 22, borderRadius: 999,
+              border: '1px solid #7f1d1d',
+              background: '#1f2937', color: '#fecaca', cursor: 'pointer',
+            }}
+          >
+            <FaStop size={8}/>
+          </button>
+        )}
       </div>
 
       {data?.message ? (
@@ -144,6 +144,9 @@ export function WorkflowsProvider({ children }) {
       dispatch({ type: types.WS_MESSAGE, payload: { type: 'NODE_STATUS', ...payload } });
     };
 
+    const onNodeStatusBatch = (payload) =>
+      dispatch({ type: types.UPDATE_NODE_STATUS_BATCH, payload: payload ?? {} });
+
     const onWorkflowSubmitted = (payload) =>
         dispatch({ type: types.WS_MESSAGE, payload: { type: 'WORKFLOW_SUBMITTED', ...payload } });
 
@@ -213,6 +216,7 @@ export function WorkflowsProvider({ children }) {
     backend.on('WS_CONNECTED', onOpen);
     backend.on('WS_DISCONNECTED', onClose);
     backend.on('NODE_STATUS', onNodeStatus);
+    backend.on('NODE_STATUS_BATCH', onNodeStatusBatch);
     backend.on('WORKFLOWS_LIST', onWorkflowsList);
     backend.on('WORKFLOW_GRAPH', onWorkflowGraph);
     backend.on('WORKFLOW_SUBMITTED', onWorkflowSubmitted);
@@ -231,6 +235,7 @@ export function WorkflowsProvider({ children }) {
       backend.off('WS_CONNECTED'); 
       backend.off('WS_DISCONNECTED');
       backend.off('NODE_STATUS');
+      backend.off('NODE_STATUS_BATCH');
       backend.off('WORKFLOWS_LIST');
       backend.off('WORKFLOW_GRAPH');
       backend.off('WORKFLOW_SUBMITTED');
@@ -305,6 +310,39 @@ export function WorkflowsProvider({ children }) {
     }
   };
 
+  // Retry the failed stages of the selected workflow in place (Argo retry, or an incremental re-run)
+  const retryWorkflow = () => {
+    const workflowId = state.ui?.selectedWorkflowId;
+    if (!workflowId) return;
+    try {
+      backend?.do(backend?.actions?.RETRY_WORKFLOW ?? 'RETRY_WORKFLOW', { workflowId });
+    } catch {
+      dispatch({ type: types.WS_ERROR, payload: 'Failed to retry workflow' });
+    }
+  };
+
+  // graceful: let running steps finish (Argo stop) instead of killing them (terminate)
+  const cancelWorkflow = (graceful = false) => {
+    const workflowId = state.ui?.selectedWorkflowId;
+    if (!workflowId) return;
+    try {
+      backend?.do(backend?.actions?.CANCEL_WORKFLOW ?? 'CANCEL_WORKFLOW', { workflowId, graceful });
+    } catch {
+      dispatch({ type: types.WS_ERROR, payload: 'Failed to cancel workflow' });
+    }
+  };
+
+  // A node is cancelled with the run it belongs to
+  const cancelNode = (nodeId, graceful = false) => {
+    try {
+      backend?.do(backend?.actions?.CANCEL_NODE ?? 'CANCEL_NODE', {
+        nodeId, workflowId: state.ui?.selectedWorkflowId || null, graceful,
+      });
+    } catch {
+      dispatch({ type: types.WS_ERROR, payload: 'Failed to cancel node' });
+    }
+  };
+
   // playback & misc unchanged
 
   const startPlayback = () => dispatch({ type: types.PLAYBACK_START });
@@ -336,7 +374,8 @@ export function WorkflowsProvider({ children }) {
 
   const value = useMemo(() => ({
     state, dispatch,
-    runWorkflow, autoLayout, isValidConnection,
+    runWorkflow, retryWorkflow, cancelWorkflow, cancelNode,
+    autoLayout, isValidConnection,
     addNode, removeSelected, applyTemplate,
     startPlayback, resetPlayback,
     setSelectedWorkflow,
@@ -19,6 +19,7 @@ export const types = {
   WORKFLOW_COMPILED: 'WORKFLOW_COMPILED',
   WORKFLOW_SENT: 'WORKFLOW_SENT',
   UPDATE_NODE_STATUS: 'UPDATE_NODE_STATUS',
+  UPDATE_NODE_STATUS_BATCH: 'UPDATE_NODE_STATUS_BATCH',
 
   WS_CONNECTED: 'WS_CONNECTED',
   WS_DISCONNECTED: 'WS_DISCONNECTED',
@@ -129,12 +129,16 @@ export function workflowsReducer(state, action) {
         return { ...state, workflows: msg.items, lastMessage: msg };
       }
 
-      // Backend confirms a submission & which nodes are part of it → show spinners immediately
+      // Backend confirms a submission & which nodes are part of it → show spinners immediately;
+      // clean nodes of an incremental run are not re-run, they keep their earlier result
       if (msg?.type === 'WORKFLOW_SUBMITTED' && Array.isArray(msg.nodeIds)) {
         const ids = new Set(msg.nodeIds);
-        const nodes = state.nodes.map(n =>
-          ids.has(n.id) ? { ...n, data: { ...n.data, status: 'running', message: 'submitted' } } : n
-        );
+        const clean = new Set(Array.isArray(msg.cleanNodeIds) ? msg.cleanNodeIds : []);
+        const nodes = state.nodes.map(n => {
+          if (ids.has(n.id)) return { ...n, data: { ...n.data, status: 'running', message: 'submitted' } };
+          if (clean.has(n.id)) return { ...n, data: { ...n.data, status: 'success', message: 'unchanged' } };
+          return n;
+        });
         return { ...state, nodes, lastMessage: msg };
       }
 
@@ -159,6 +163,18 @@ export function workflowsReducer(state, action) {
       return { ...state, nodes };
     }
 
+    // One frame per watcher tick → one nodes update (one canvas re-render)
+    case types.UPDATE_NODE_STATUS_BATCH: {
+      const items = Array.isArray(action.payload?.items) ? action.payload.items : [];
+      const byId = new Map(items.filter(it => it?.nodeId && it?.status).map(it => [it.nodeId, it]));
+      if (!byId.size) return state;
+      const nodes = state.nodes.map(n => {
+        const it = byId.get(n.id);
+        return it ? { ...n, data: { ...n.data, status: it.status, message: it.message ?? '' } } : n;
+      });
+      return { ...state, nodes, lastMessage: { type: 'NODE_STATUS_BATCH', ...action.payload } };
+    }
+
     // ---- Playback ----
     case types.PLAYBACK_START:
       return { ...state, playback: { ...state.playback, playing: true } };
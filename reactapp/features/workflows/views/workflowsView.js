@@ -14,6 +14,8 @@ import {
   FaHourglassHalf,
   FaRegCircle,
   FaChevronDown,
+  FaRedo,
+  FaStop,
 } from 'react-icons/fa';
 import { LuAlignVerticalJustifyStart, LuAlignStartVertical } from 'react-icons/lu';
 
@@ -354,6 +356,8 @@ function Toolbar({ sidebarVisible }) {
     removeSelected,
     autoLayout,
     runWorkflow,
+    retryWorkflow,
+    cancelWorkflow,
     setSelectedWorkflow,
     state,
     applyTemplate,
@@ -454,6 +458,9 @@ function Toolbar({ sidebarVisible }) {
   );
 
   const statusTheme = STATUS_THEME[selectedWorkflowMeta?.status || 'idle'];
+  const selectedStatus = String(selectedWorkflowMeta?.status || '').toLowerCase();
+  const canCancel = selectedStatus === 'running' || selectedStatus === 'queued';
+  const canRetry = selectedStatus === 'error';
   const lastRunLabel = selectedWorkflowMeta?.last_run_at
     ? new Date(selectedWorkflowMeta.last_run_at).toLocaleString()
     : 'No runs yet';
@@ -536,6 +543,16 @@ function Toolbar({ sidebarVisible }) {
           <IconButton onClick={runWorkflow} aria-label="Run workflow">
             <FaPlay />
           </IconButton>
+          {canRetry && (
+            <IconButton onClick={retryWorkflow} aria-label="Retry failed steps">
+              <FaRedo />
+            </IconButton>
+          )}
+          {canCancel && (
+            <IconButton onClick={() => cancelWorkflow()} $variant="danger" aria-label="Cancel workflow">
+              <FaStop />
+            </IconButton>
+          )}
         </ControlsRow>
       </SectionCard>
 
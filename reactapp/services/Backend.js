@@ -54,9 +54,13 @@ export default class Backend {
       RUN_TEERH: "RUN_TEERH",
       RUN_WORKFLOW: "RUN_WORKFLOW",
       RUN_NODE: "RUN_NODE",
+      RETRY_WORKFLOW: "RETRY_WORKFLOW",
+      CANCEL_WORKFLOW: "CANCEL_WORKFLOW",
+      CANCEL_NODE: "CANCEL_NODE",
       REQUEST_LAST_RUN: "REQUEST_LAST_RUN",
       // server → client pushes you listen for
       NODE_STATUS: "NODE_STATUS",
+      NODE_STATUS_BATCH: "NODE_STATUS_BATCH",
       WORKFLOW_SUBMITTED: "WORKFLOW_SUBMITTED",
       LAST_RUN_LOG: "LAST_RUN_LOG",
       WS_CONNECTED: "WS_CONNECTED",
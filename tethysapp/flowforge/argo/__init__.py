@@ -0,0 +1 @@
+# Argo plumbing shared by the websocket handlers (status streams, clients, caches).
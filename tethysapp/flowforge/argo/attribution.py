@@ -0,0 +1,110 @@
+# tethysapp/flowforge/argo/attribution.py
+"""
+Task-name -> UI-node attribution for one Argo Workflow.
+
+Built once per watcher from ``tasks_by_node``; every Argo node name (``t-...``,
+``<dag>.t-...`` or ``<workflow>.t-...``, plus ``t-...(<i>:<item>)`` for the
+iterations of a compacted fan-out) resolves with a dict lookup, and UI node
+status is kept incrementally so a tick only touches the nodes whose task
+phases actually changed.
+"""
+from __future__ import annotations
+
+from collections import Counter
+
+FAILED_PHASES = frozenset({"Failed", "Error", "Terminated"})
+
+
+def _item_name(node_name: str) -> str | None:
+    """"<task>(<index>:<item>)" -> "<task>(<index>)", None for anything else."""
+    start = node_name.find("(")
+    if start <= 0:
+        return None
+    end = start + 1
+    while end < len(node_name) and node_name[end].isdigit():
+        end += 1
+    if end == start + 1 or end >= len(node_name) or node_name[end] not in ":)":
+        return None
+    return node_name[:end] + ")"
+
+
+class TaskAttribution:
+    """
+    UI node status rules (unchanged from the original polling loop):
+      - error   => ANY expected task Failed/Error/Terminated
+      - success => ALL expected tasks present AND Succeeded
+      - running => otherwise
+    """
+
+    def __init__(self, tasks_by_node: dict[str, list[str]], dag: str = "main", workflow_name: str | None = None):
+        self.expected: dict[str, frozenset[str]] = {
+            ui: frozenset(tasks or []) for ui, tasks in tasks_by_node.items()
+        }
+        self._index: dict[str, tuple[str, str]] = {}
+        for ui, tasks in self.expected.items():
+            for t in tasks:
+                hit = (ui, t)
+                self._index[t] = hit
+                self._index[f"{dag}.{t}"] = hit
+                if workflow_name:
+                    self._index[f"{workflow_name}.{t}"] = hit
+
+        self._phases: dict[str, dict[str, str]] = {ui: {} for ui in self.expected}
+        self._failed: Counter = Counter()
+        self._succeeded: Counter = Counter()
+
+    def resolve(self, node_name: str) -> tuple[str, str] | None:
+        """(ui node id, task name) for an Argo node name, or None if it is not ours."""
+        hit = self._lookup(node_name)
+        if hit is None:
+            # withItems iteration "<task>(<index>:<item>)" is tracked as "<task>(<index>)"
+            item = _item_name(node_name)
+            if item is not None:
+                hit = self._lookup(item)
+        return hit
+
+    def _lookup(self, node_name: str) -> tuple[str, str] | None:
+        hit = self._index.get(node_name)
+        if hit is not None:
+            return hit
+        # Only accept exact "<prefix>.<task>" matches to avoid cross-node leaks;
+        # the prefix may span several levels ("<workflow>.<group>.<task>" for capped stages).
+        dot = node_name.find(".")
+        while dot > 0 and hit is None:
+            hit = self._index.get(node_name[dot + 1:])
+            dot = node_name.find(".", dot + 1)
+        return hit
+
+    def apply(self, phases: dict[str, str]) -> set[str]:
+        """Fold changed {argo node name: phase} in; return the UI node ids that changed."""
+        dirty: set[str] = set()
+        for name, phase in phases.items():
+            hit = self.resolve(name)
+            if hit is None:
+                continue
+            ui, task = hit
+            prev = self._phases[ui].get(task)
+            if prev == phase:
+                continue
+            self._phases[ui][task] = phase
+            if prev in FAILED_PHASES:
+                self._failed[ui] -= 1
+            elif prev == "Succeeded":
+                self._succeeded[ui] -= 1
+            if phase in FAILED_PHASES:
+                self._failed[ui] += 1
+            elif phase == "Succeeded":
+                self._succeeded[ui] += 1
+            dirty.add(ui)
+        return dirty
+
+    def status(self, ui: str) -> str:
+        if self._failed[ui]:
+            return "error"
+        expected = self.expected.get(ui) or ()
+        if expected and self._succeeded[ui] == len(expected):
+            return "success"
+        return "running"
+
+    def nodes(self) -> list[str]:
+        return list(self.expected)
@@ -0,0 +1,155 @@
+# tethysapp/flowforge/argo/client.py
+"""
+Argo server access: Hera WorkflowsService for typed calls, plain JSON for hot reads
+and workflow submission.
+
+Everything goes through ONE requests.Session per process (keep-alive, bounded
+connection pool), and blocking calls made from async code run on a bounded
+thread pool (``argo_call``) so a burst of watchers/submissions cannot open more
+than ARGO_MAX_CONCURRENCY requests at once; ``argo_call`` also applies the
+rate limit and circuit breaker from limits.py.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from hera.shared import global_config
+from hera.workflows import WorkflowsService
+
+from .config import (
+    ARGO_HOST,
+    ARGO_TOKEN,
+    ARGO_NAMESPACE,
+    ARGO_VERIFY_SSL,
+    ARGO_MAX_CONCURRENCY,
+    ARGO_POOL_SIZE,
+    argo_auth_header,
+    argo_url,
+)
+from .limits import PRIORITY_STATUS, breaker, limiter
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_ws: WorkflowsService | None = None
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session to ARGO_HOST."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ARGO_POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.verify = ARGO_VERIFY_SSL
+            _session = session
+        return _session
+
+
+def make_ws() -> WorkflowsService:
+    """The shared WorkflowsService (global_config is set once, the first time)."""
+    global _ws
+    session = get_session()
+    with _lock:
+        if _ws is None:
+            global_config.host = ARGO_HOST
+            global_config.token = ARGO_TOKEN
+            global_config.namespace = ARGO_NAMESPACE
+            global_config.verify_ssl = ARGO_VERIFY_SSL
+            _ws = WorkflowsService(
+                host=ARGO_HOST,
+                token=ARGO_TOKEN,
+                namespace=ARGO_NAMESPACE,
+                verify_ssl=ARGO_VERIFY_SSL,
+                session=session,
+            )
+        return _ws
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=ARGO_MAX_CONCURRENCY, thread_name_prefix="argo")
+        return _executor
+
+
+async def argo_call(fn: Callable[..., T], *args, priority: int = PRIORITY_STATUS, **kwargs) -> T:
+    """
+    Run a blocking Argo call (Hera method, get_json, ...) on the bounded Argo pool.
+
+    The call first passes the circuit breaker (ArgoUnavailable while open) and
+    takes a token from the process-wide limiter at ``priority``.
+    """
+    await limiter.acquire(priority)
+    breaker.before_call()
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+    except Exception as e:
+        breaker.record(e)
+        raise
+    except BaseException:
+        # cancelled while waiting: no verdict on Argo, but a half-open probe must free its slot
+        breaker.release()
+        raise
+    breaker.record(None)
+    return result
+
+
+def get_json(path: str, params: dict | None = None, timeout: float = 30.0) -> Any:
+    """
+    GET an Argo API path and return the decoded JSON body.
+
+    Used where Hera's pydantic models would reject `fields`-trimmed responses
+    (and where parsing full models for every item would be wasted work).
+    """
+    resp = get_session().get(
+        argo_url(path),
+        params={k: v for k, v in (params or {}).items() if v is not None},
+        headers=_headers(),
+        verify=ARGO_VERIFY_SSL,
+        timeout=timeout,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def post_json(path: str, body: Any, timeout: float = 30.0) -> Any:
+    """
+    POST a JSON body to an Argo API path and return the decoded JSON response.
+
+    Errors keep Argo's own message (e.g. a rejected manifest) in the HTTPError.
+    """
+    resp = get_session().post(
+        argo_url(path),
+        json=body,
+        headers=_headers(),
+        verify=ARGO_VERIFY_SSL,
+        timeout=timeout,
+    )
+    if resp.status_code >= 400:
+        try:
+            detail = resp.json().get("message") or resp.text
+        except ValueError:
+            detail = resp.text
+        raise requests.HTTPError(f"{resp.status_code} {resp.reason}: {detail}", response=resp)
+    return resp.json()
+
+
+def _headers() -> dict[str, str]:
+    headers = {"Accept": "application/json"}
+    auth = argo_auth_header()
+    if auth:
+        headers["Authorization"] = auth
+    return headers
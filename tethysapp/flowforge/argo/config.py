@@ -0,0 +1,110 @@
+# tethysapp/flowforge/argo/config.py
+import os
+
+# ---------- Argo / Hera config ----------
+ARGO_HOST = os.getenv("ARGO_HOST", "https://localhost:2746")
+ARGO_TOKEN = os.getenv("ARGO_TOKEN", "")
+ARGO_NAMESPACE = os.getenv("ARGO_NAMESPACE", "argo")
+ARGO_VERIFY_SSL = os.getenv("ARGO_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
+
+# One keep-alive pool per process; at most this many Argo requests in flight
+ARGO_POOL_SIZE = int(os.getenv("ARGO_POOL_SIZE", "10"))
+ARGO_MAX_CONCURRENCY = int(os.getenv("ARGO_MAX_CONCURRENCY", os.getenv("ARGO_POOL_SIZE", "10")))
+
+# Process-wide Argo call budget (argo/limits.py)
+ARGO_RATE_PER_SEC = float(os.getenv("ARGO_RATE_PER_SEC", "20"))
+ARGO_RATE_BURST = float(os.getenv("ARGO_RATE_BURST", "40"))
+ARGO_BREAKER_FAILURES = int(os.getenv("ARGO_BREAKER_FAILURES", "5"))
+ARGO_BREAKER_RESET_SEC = float(os.getenv("ARGO_BREAKER_RESET_SEC", "30"))
+
+# Background RUN_WORKFLOW submissions running at once per process (argo/jobs.py)
+SUBMIT_CONCURRENCY = int(os.getenv("FLOWFORGE_SUBMIT_CONCURRENCY", "4"))
+# Admission of the DB submission queue (consumers/admission.py): Argo runs in flight at once,
+# overall and per user (0 = unlimited); queued submissions are re-checked this often
+QUEUE_MAX_INFLIGHT = int(os.getenv("FLOWFORGE_QUEUE_MAX_INFLIGHT", "32"))
+QUEUE_MAX_INFLIGHT_PER_USER = int(os.getenv("FLOWFORGE_QUEUE_MAX_INFLIGHT_PER_USER", "4"))
+QUEUE_TICK_SEC = float(os.getenv("FLOWFORGE_QUEUE_TICK_SEC", "5"))
+# A dispatched submission no job has claimed after this long lost its dispatcher: it is re-queued
+QUEUE_ORPHAN_SEC = float(os.getenv("FLOWFORGE_QUEUE_ORPHAN_SEC", "600"))
+
+# Re-push every WorkflowTemplate once per process even when its hash matches
+ARGO_FORCE_TEMPLATE_UPDATE = os.getenv("ARGO_FORCE_TEMPLATE_UPDATE", "false").lower() in ("1", "true", "yes")
+# A template verified this recently (same hash) is not re-read from Argo
+TEMPLATE_CACHE_TTL_SEC = float(os.getenv("FLOWFORGE_TEMPLATE_CACHE_TTL_SEC", "300"))
+# Compiled workflow manifests kept per process, keyed by graph+config hash (consumers/handlers/ngiab_compiler.py)
+COMPILE_CACHE_SIZE = int(os.getenv("FLOWFORGE_COMPILE_CACHE_SIZE", "128"))
+# "direct" renders the Workflow JSON from the compiled plan; "hera" builds it through Hera models
+MANIFEST_RENDERER = os.getenv("FLOWFORGE_MANIFEST_RENDERER", "direct").lower()
+# A fan-out with at least this many instances becomes one withItems task (0 = never compact)
+FANOUT_COMPACT_AT = int(os.getenv("FLOWFORGE_FANOUT_COMPACT_AT", "8"))
+# Reuse recorded outputs of identical task instances (content-addressed; node config "cache": false opts out)
+MEMOIZE = os.getenv("FLOWFORGE_MEMOIZE", "true").lower() in ("1", "true", "yes")
+# Default spec.parallelism of a chain run (0 = unlimited); RUN_WORKFLOW options.parallelism overrides
+WORKFLOW_PARALLELISM = int(os.getenv("FLOWFORGE_WORKFLOW_PARALLELISM", "16"))
+# PriorityClass for chain pods ("" = cluster default); RUN_WORKFLOW options.priorityClass overrides
+POD_PRIORITY_CLASS = os.getenv("FLOWFORGE_POD_PRIORITY_CLASS", "")
+# Default per-stage caps, e.g. "run=4,teehr=8" (stage tags: pre, cal_cfg, cal_run, run, teehr);
+# a node's config.max_parallel overrides
+STAGE_PARALLELISM = {
+    tag.strip(): int(cap)
+    for tag, _, cap in (item.partition("=") for item in os.getenv("FLOWFORGE_STAGE_PARALLELISM", "").split(","))
+    if tag.strip() and cap.strip().isdigit()
+}
+
+POLL_SEC = float(os.getenv("ARGO_POLL_SEC", "3.0"))
+# Adaptive polling (see argo/schedule.py): POLL_SEC is the base interval
+POLL_FAST_SEC = float(os.getenv("ARGO_POLL_FAST_SEC", "1.0"))  # just submitted / Pending
+POLL_FAST_WINDOW_SEC = float(os.getenv("ARGO_POLL_FAST_WINDOW_SEC", "60"))
+POLL_MAX_SEC = float(os.getenv("ARGO_POLL_MAX_SEC", "30"))  # long, quiet Running phases
+POLL_RAMP_SEC = float(os.getenv("ARGO_POLL_RAMP_SEC", "120"))  # quiet time per +POLL_SEC
+POLL_ERROR_MAX_SEC = float(os.getenv("ARGO_POLL_ERROR_MAX_SEC", "120"))
+POLL_TIMEOUT_SEC = float(os.getenv("ARGO_POLL_TIMEOUT_SEC", "21600"))  # 6h
+
+# ---------- status tracking ----------
+# "stream": share one workflow-events stream per namespace (polling only as fallback)
+# "poll":   always poll get_workflow
+ARGO_WATCH_MODE = os.getenv("ARGO_WATCH_MODE", "stream").lower()
+# With a healthy but quiet stream, re-read the workflow this often to catch missed events
+ARGO_WATCH_RESYNC_SEC = float(os.getenv("ARGO_WATCH_RESYNC_SEC", "60"))
+# Server may keep the stream idle for a long time; reconnect (resuming) after this
+ARGO_WATCH_READ_TIMEOUT_SEC = float(os.getenv("ARGO_WATCH_READ_TIMEOUT_SEC", "300"))
+ARGO_WATCH_RECONNECT_MAX_SEC = float(os.getenv("ARGO_WATCH_RECONNECT_MAX_SEC", "30"))
+# "inprocess": each web worker runs the watchers for the sockets it serves
+# "daemon":    watchers live in `manage.py flowforge_watcher`; web workers only relay
+FLOWFORGE_WATCHER_MODE = os.getenv("FLOWFORGE_WATCHER_MODE", "inprocess").lower()
+WATCHER_CHANNEL = os.getenv("FLOWFORGE_WATCHER_CHANNEL", "flowforge-watcher")
+# The daemon re-adopts every running/queued workflow from the DB this often
+WATCHER_SWEEP_SEC = float(os.getenv("FLOWFORGE_WATCHER_SWEEP_SEC", "30"))
+# Which replica runs a workflow's watcher: "advisory" = the one holding a Postgres
+# advisory lock on its Argo name (others stand by), "none" = every process that asks
+WATCHER_LEADERSHIP = os.getenv("FLOWFORGE_WATCHER_LEADERSHIP", "advisory").lower()
+LEASE_RETRY_SEC = float(os.getenv("FLOWFORGE_LEASE_RETRY_SEC", "15"))
+LEASE_HEARTBEAT_SEC = float(os.getenv("FLOWFORGE_LEASE_HEARTBEAT_SEC", "10"))
+# Node transitions arriving within this window go out as one NODE_STATUS_BATCH frame
+STATUS_BATCH_DEBOUNCE_SEC = float(os.getenv("FLOWFORGE_STATUS_BATCH_DEBOUNCE_SEC", "0.25"))
+
+
+def argo_auth_header() -> str:
+    """Authorization header value; a bare token gets the 'Bearer' prefix (same rule as Hera)."""
+    token = (ARGO_TOKEN or "").strip()
+    if not token:
+        return ""
+    return token if len(token.split()) > 1 else f"Bearer {token}"
+
+
+def argo_url(path: str) -> str:
+    """Absolute URL of an Argo API path; keeps any path prefix of ARGO_HOST (urljoin would drop it)."""
+    return ARGO_HOST.rstrip("/") + "/" + path.lstrip("/")
+
+# ---------- labels put on every Argo Workflow FlowForge submits ----------
+LABEL_MANAGED = "flowforge.io/managed"
+LABEL_WORKFLOW_ID = "flowforge.io/workflow-id"
+# sha256 of the packaged YAML a WorkflowTemplate was deployed from (argo/templates.py)
+ANNOTATION_TEMPLATE_HASH = "flowforge.io/template-hash"
+# Set by the Argo controller once a workflow reaches a terminal phase
+LABEL_ARGO_COMPLETED = "workflows.argoproj.io/completed"
+
+
+def flowforge_labels(wf_uuid) -> dict[str, str]:
+    """Labels that let one list_workflows call find every active FlowForge run."""
+    return {LABEL_MANAGED: "true", LABEL_WORKFLOW_ID: str(wf_uuid)}
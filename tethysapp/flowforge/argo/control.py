@@ -0,0 +1,42 @@
+# tethysapp/flowforge/argo/control.py
+"""
+Lifecycle calls on Argo Workflows FlowForge already submitted (retry,
+terminate, stop).
+
+Blocking Hera calls like everything else in this package: run them through
+``argo_call(..., priority=PRIORITY_CONTROL)`` so they get ahead of status
+reads but never starve submissions.
+"""
+from __future__ import annotations
+
+from hera.workflows.models import WorkflowRetryRequest, WorkflowStopRequest, WorkflowTerminateRequest
+
+from .client import make_ws
+from .config import ARGO_NAMESPACE
+
+
+def retry_workflow(name: str) -> None:
+    """
+    Retry a Failed/Error workflow in place (same name, same output prefixes):
+    succeeded nodes are kept, failed and skipped ones are re-run.
+    Raises hera NotFound when Argo no longer has the workflow.
+    """
+    make_ws().retry_workflow(
+        name,
+        WorkflowRetryRequest(name=name, namespace=ARGO_NAMESPACE, restart_successful=False),
+        namespace=ARGO_NAMESPACE,
+    )
+
+
+def terminate_workflow(name: str) -> None:
+    """Terminate a running workflow right away: pods are killed, exit handlers are skipped."""
+    make_ws().terminate_workflow(
+        name, WorkflowTerminateRequest(name=name, namespace=ARGO_NAMESPACE), namespace=ARGO_NAMESPACE,
+    )
+
+
+def stop_workflow(name: str, message: str | None = None) -> None:
+    """Stop a running workflow: pods are killed, but exit handlers still run."""
+    make_ws().stop_workflow(
+        name, WorkflowStopRequest(name=name, namespace=ARGO_NAMESPACE, message=message), namespace=ARGO_NAMESPACE,
+    )
@@ -0,0 +1,331 @@
+# tethysapp/flowforge/argo/events.py
+"""
+Namespace-wide Argo workflow event stream.
+
+Rather than every watcher calling ``get_workflow`` on its own timer, one
+long-lived ``/api/v1/workflow-events/{namespace}`` stream per namespace is
+shared by all watchers in the process. Every event is reduced to the node
+phases that changed since the previous event for that workflow, and that
+delta is handed to the watchers subscribed to the workflow name.
+
+The stream runs in a daemon thread (``requests`` is blocking), reconnects with
+backoff and resumes from the last seen ``resourceVersion``. It stops once the
+last watcher unsubscribes (or on ``stop()``) and starts again on demand.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any
+
+import requests
+
+from .config import (
+    ARGO_VERIFY_SSL,
+    ARGO_WATCH_READ_TIMEOUT_SEC,
+    ARGO_WATCH_RECONNECT_MAX_SEC,
+    argo_auth_header,
+    argo_url,
+)
+
+log = logging.getLogger(__name__)
+
+# Only what the watchers need; keeps each event small for big DAGs.
+_EVENT_FIELDS = ",".join([
+    "result.type",
+    "result.object.metadata.name",
+    "result.object.metadata.resourceVersion",
+    "result.object.status.phase",
+    "result.object.status.nodes",
+])
+
+
+@dataclass(frozen=True)
+class WorkflowDelta:
+    """Changed node phases of one Argo Workflow ({node name: phase}).
+
+    ``error`` is set (and nothing else) when a fallback read failed.
+    """
+    name: str
+    phase: str | None = None
+    nodes: dict[str, str] = field(default_factory=dict)
+    deleted: bool = False
+    error: str | None = None
+
+
+def _get(obj: Any, key: str, default=None):
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def node_phases(wf: Any) -> dict[str, str]:
+    """{node name: phase} for a Hera Workflow model or a raw workflow dict."""
+    status = _get(wf, "status") or {}
+    nodes_map = _get(status, "nodes") or {}
+    nodes_iter = nodes_map.values() if isinstance(nodes_map, dict) else (nodes_map or [])
+    out: dict[str, str] = {}
+    for n in nodes_iter:
+        nm = _get(n, "name")
+        ph = _get(n, "phase")
+        if nm and ph:
+            out[str(nm)] = str(ph)
+    return out
+
+
+def delta_from_workflow(wf: Any) -> WorkflowDelta:
+    """Full snapshot of a workflow expressed as a delta (used by the polling fallback)."""
+    metadata = _get(wf, "metadata") or {}
+    status = _get(wf, "status") or {}
+    phase = _get(status, "phase")
+    return WorkflowDelta(
+        name=str(_get(metadata, "name") or ""),
+        phase=str(phase) if phase else None,
+        nodes=node_phases(wf),
+    )
+
+
+class WorkflowFanout:
+    """
+    Per-workflow-name subscriber queues plus the last node phases seen for
+    each subscribed workflow, so sources only hand out what changed.
+    Publishing is thread-safe; subscribing happens on an event loop.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(set)
+        self._phases: dict[str, dict[str, str]] = {}
+        self._wf_phase: dict[str, str | None] = {}
+
+    def subscribe(self, name: str) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[name].add((loop, queue))
+            known = self._phases.get(name)
+            phase = self._wf_phase.get(name)
+        if known:
+            queue.put_nowait(WorkflowDelta(name, phase, dict(known)))
+        self._on_subscribe()
+        return queue
+
+    def unsubscribe(self, name: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subs = self._subscribers.get(name)
+            if not subs:
+                return
+            for entry in [e for e in subs if e[1] is queue]:
+                subs.discard(entry)
+            if not subs:
+                self._subscribers.pop(name, None)
+                self._phases.pop(name, None)
+                self._wf_phase.pop(name, None)
+            idle = not self._subscribers
+        if idle:
+            self._on_idle()
+
+    def names(self) -> set[str]:
+        with self._lock:
+            return set(self._subscribers)
+
+    def _on_subscribe(self) -> None:
+        """Hook for sources that start lazily."""
+
+    def _on_idle(self) -> None:
+        """Hook called when the last subscriber left."""
+
+    def _publish(self, name: str, phase: str | None, current: dict[str, str], deleted: bool = False) -> bool:
+        """Deliver what changed since the last publish; True if anything did."""
+        with self._lock:
+            subs = list(self._subscribers.get(name) or ())
+            if not subs:
+                return False
+            previous = self._phases.get(name) or {}
+            changed = {k: v for k, v in current.items() if previous.get(k) != v}
+            phase_changed = self._wf_phase.get(name) != phase
+            self._phases[name] = current
+            self._wf_phase[name] = phase
+
+        if not changed and not phase_changed and not deleted:
+            return False
+        self._deliver(subs, WorkflowDelta(name, phase, changed, deleted))
+        return True
+
+    def _publish_error(self, name: str, error: str) -> None:
+        with self._lock:
+            subs = list(self._subscribers.get(name) or ())
+        self._deliver(subs, WorkflowDelta(name, error=error))
+
+    @staticmethod
+    def _deliver(subs, delta: WorkflowDelta) -> None:
+        for loop, queue in subs:
+            loop.call_soon_threadsafe(queue.put_nowait, delta)
+
+
+class WorkflowEventStream(WorkflowFanout):
+    """One Argo workflow-events stream for a namespace, fanned out per workflow name."""
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self.connected = False
+        self.last_event_at = 0.0
+        self._resource_version = ""
+        self._thread: threading.Thread | None = None
+        self._stopping: threading.Event | None = None  # set -> the current thread exits
+        self._response: requests.Response | None = None
+
+    def _on_subscribe(self) -> None:
+        self._ensure_thread()
+
+    def _on_idle(self) -> None:
+        with self._lock:
+            if self._subscribers:
+                return  # someone subscribed again meanwhile
+        self.stop()
+
+    # ---------------- stream thread ----------------
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread and self._thread.is_alive() and not self._stopping.is_set():
+                return
+            # a thread still winding down keeps its own (set) event and exits on its own
+            self._stopping = stopping = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run, args=(stopping,), name=f"argo-events-{self.namespace}", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Close the stream and end its thread (a later subscribe starts a new one)."""
+        with self._lock:
+            stopping, response = self._stopping, self._response
+        if stopping is not None:
+            stopping.set()
+        if response is not None:
+            try:
+                response.close()  # unblocks a read waiting on an idle stream
+            except Exception:
+                pass
+
+    def _run(self, stopping: threading.Event) -> None:
+        backoff = 1.0
+        session = requests.Session()
+        try:
+            while not stopping.is_set():
+                try:
+                    self._consume(session, stopping)
+                    backoff = 1.0  # clean end of stream (server/read timeout): resume right away
+                except Exception as e:
+                    if stopping.is_set():
+                        break
+                    log.warning("[argo-events] %s stream dropped: %s (retry in %.0fs)", self.namespace, e, backoff)
+                    stopping.wait(backoff)
+                    backoff = min(backoff * 2, ARGO_WATCH_RECONNECT_MAX_SEC)
+                finally:
+                    if self._stopping is stopping:
+                        self.connected = False
+        finally:
+            session.close()
+            log.info("[argo-events] %s stream stopped", self.namespace)
+
+    def _consume(self, session: requests.Session, stopping: threading.Event) -> None:
+        url = argo_url(f"api/v1/workflow-events/{self.namespace}")
+        params = {"fields": _EVENT_FIELDS}
+        if self._resource_version:
+            params["listOptions.resourceVersion"] = self._resource_version
+        headers = {"Accept": "application/json"}
+        auth = argo_auth_header()
+        if auth:
+            headers["Authorization"] = auth
+
+        try:
+            with session.get(
+                url,
+                params=params,
+                headers=headers,
+                stream=True,
+                verify=ARGO_VERIFY_SSL,
+                timeout=(10, ARGO_WATCH_READ_TIMEOUT_SEC),
+            ) as resp:
+                if resp.status_code == 410:
+                    self._resource_version = ""
+                    return
+                resp.raise_for_status()
+                with self._lock:
+                    if self._stopping is stopping:
+                        self._response = resp
+                if stopping.is_set():
+                    return
+                self.connected = True
+                log.info("[argo-events] %s stream connected (rv=%s)", self.namespace, self._resource_version or "-")
+                for line in resp.iter_lines():
+                    if stopping.is_set():
+                        return
+                    if line:
+                        self._handle_line(line)
+        except requests.exceptions.ConnectionError as e:
+            # urllib3 surfaces read timeouts on an idle stream as connection errors
+            if "Read timed out" in str(e):
+                return
+            raise
+        finally:
+            with self._lock:
+                if self._response is not None and self._stopping is stopping:
+                    self._response = None
+
+    def _handle_line(self, line: bytes) -> None:
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return
+        if "error" in msg:
+            err = msg.get("error") or {}
+            text = str(err.get("message") or err)
+            if "too old resource version" in text or err.get("code") == 410:
+                # Our resume point was compacted away; relist from "now".
+                self._resource_version = ""
+            raise RuntimeError(text)
+
+        result = msg.get("result") or {}
+        obj = result.get("object") or {}
+        metadata = obj.get("metadata") or {}
+        name = metadata.get("name")
+        rv = metadata.get("resourceVersion")
+        if rv:
+            self._resource_version = str(rv)
+        self.last_event_at = time.monotonic()
+        if not name:
+            return
+        self._publish(
+            str(name),
+            (obj.get("status") or {}).get("phase"),
+            node_phases(obj),
+            deleted=result.get("type") == "DELETED",
+        )
+
+_streams: dict[str, WorkflowEventStream] = {}
+_streams_lock = threading.Lock()
+
+
+def get_event_stream(namespace: str) -> WorkflowEventStream:
+    """Process-wide stream for ``namespace`` (created lazily)."""
+    with _streams_lock:
+        stream = _streams.get(namespace)
+        if stream is None:
+            stream = _streams[namespace] = WorkflowEventStream(namespace)
+        return stream
+
+
+def stop_event_streams() -> None:
+    """Stop every namespace stream of this process (shutdown)."""
+    with _streams_lock:
+        streams = list(_streams.values())
+    for stream in streams:
+        stream.stop()
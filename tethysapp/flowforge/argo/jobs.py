@@ -0,0 +1,115 @@
+# tethysapp/flowforge/argo/jobs.py
+"""
+Background submission jobs.
+
+Submissions admitted by the DB queue (consumers/admission.py) run here: the
+Argo side of a submission (template sync, compile, create) is a tracked task.
+At most FLOWFORGE_SUBMIT_CONCURRENCY jobs run at once per process, the rest
+wait in "queued". Each job records which stage it is in so the UI / logs can
+tell "waiting for a slot" from "Argo is slow to accept the workflow".
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+from .config import SUBMIT_CONCURRENCY
+
+log = logging.getLogger(__name__)
+
+# Finished jobs kept around for lookups
+_KEEP_FINISHED = 200
+
+
+@dataclass
+class SubmissionJob:
+    id: str
+    workflow_id: str
+    stage: str = "queued"  # queued -> prepare (template sync + compile) -> create -> submitted | failed
+    argo_workflow: str | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def done(self) -> bool:
+        return self.stage in {"submitted", "failed"}
+
+    def set_stage(self, stage: str) -> None:
+        self.stage = stage
+        self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class SubmissionPipeline:
+    """Runs submission jobs in the background with bounded concurrency."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(concurrency, 1)
+        self._slots: asyncio.Semaphore | None = None
+        self._jobs: OrderedDict[str, SubmissionJob] = OrderedDict()
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def submit(self, workflow_id, run: Callable[[SubmissionJob], Awaitable[None]]) -> SubmissionJob:
+        """Queue ``run(job)``; returns immediately with the job handle."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        job = SubmissionJob(id=uuid.uuid4().hex, workflow_id=str(workflow_id))
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, run), name=f"submit:{job.id}")
+        self._trim()
+        return job
+
+    async def _run(self, job: SubmissionJob, run: Callable[[SubmissionJob], Awaitable[None]]) -> None:
+        try:
+            async with self._slots:
+                await run(job)
+            if not job.done:
+                job.set_stage("submitted")
+        except asyncio.CancelledError:
+            job.error = "cancelled"
+            job.set_stage("failed")
+            raise
+        except Exception as e:
+            job.error = str(e)
+            job.set_stage("failed")
+            log.exception("[submit] job %s for workflow %s failed", job.id, job.workflow_id)
+        finally:
+            self._tasks.pop(job.id, None)
+
+    async def cancel(self, workflow_id) -> list[SubmissionJob]:
+        """
+        Cancel the unfinished jobs of ``workflow_id``. Jobs still queued or preparing are
+        cancelled outright; one already creating its Argo Workflow is let finish, so the
+        caller can terminate the run it created (``job.argo_workflow``).
+        """
+        jobs = [j for j in self.active() if j.workflow_id == str(workflow_id)]
+        for job in jobs:
+            task = self._tasks.get(job.id)
+            if task is None:
+                continue
+            if job.stage in {"queued", "prepare"}:
+                task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        return jobs
+
+    def get(self, job_id: str) -> SubmissionJob | None:
+        return self._jobs.get(job_id)
+
+    def active(self) -> list[SubmissionJob]:
+        return [j for j in self._jobs.values() if not j.done]
+
+    def _trim(self) -> None:
+        finished = [k for k, j in self._jobs.items() if j.done]
+        for k in finished[:max(0, len(finished) - _KEEP_FINISHED)]:
+            self._jobs.pop(k, None)
+
+
+submissions = SubmissionPipeline(SUBMIT_CONCURRENCY)
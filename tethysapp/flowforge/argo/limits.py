@@ -0,0 +1,148 @@
+# tethysapp/flowforge/argo/limits.py
+"""
+Process-wide budget for Argo API calls.
+
+  - ``RateLimiter``: a token bucket shared by every call in the process. Lower
+    priority calls (status reads) must leave a reserve in the bucket, so when
+    it runs low submissions and control calls still get through.
+  - ``CircuitBreaker``: after repeated transport/5xx failures Argo is treated as
+    down for a while; calls fail fast with ``ArgoUnavailable`` instead of piling
+    up threads, and one probe call decides when to close it again.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+
+import requests
+from hera.exceptions import HeraException, InternalServerError, NotImplemented as HeraNotImplemented
+
+from .config import (
+    ARGO_BREAKER_FAILURES,
+    ARGO_BREAKER_RESET_SEC,
+    ARGO_RATE_BURST,
+    ARGO_RATE_PER_SEC,
+)
+
+log = logging.getLogger(__name__)
+
+# Call priorities (lower value wins)
+PRIORITY_SUBMIT = 0    # create workflows
+PRIORITY_CONTROL = 1   # retry / stop / terminate
+PRIORITY_TEMPLATE = 2  # WorkflowTemplate checks and updates
+PRIORITY_STATUS = 3    # watcher reads, listings
+
+# Share of the bucket each priority must leave untouched
+_RESERVE = {
+    PRIORITY_SUBMIT: 0.0,
+    PRIORITY_CONTROL: 0.1,
+    PRIORITY_TEMPLATE: 0.25,
+    PRIORITY_STATUS: 0.5,
+}
+
+
+class ArgoUnavailable(RuntimeError):
+    """Raised instead of calling Argo while the circuit breaker is open."""
+
+
+class RateLimiter:
+    """Token bucket refilled at ``rate`` per second up to ``burst`` tokens."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = max(rate, 0.001)
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self, priority: int = PRIORITY_STATUS) -> float:
+        """Take a token if allowed; else return the seconds to wait before trying again (0.0 = taken)."""
+        floor = self.burst * _RESERVE.get(priority, _RESERVE[PRIORITY_STATUS])
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens - 1.0 >= floor:
+                self._tokens -= 1.0
+                return 0.0
+            return (floor + 1.0 - self._tokens) / self.rate
+
+    async def acquire(self, priority: int = PRIORITY_STATUS) -> None:
+        while True:
+            wait = self.try_acquire(priority)
+            if wait <= 0.0:
+                return
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """closed -> open after ``failures`` straight failures -> half-open after ``reset_sec`` (one probe)."""
+
+    def __init__(self, failures: int, reset_sec: float):
+        self.failures = max(failures, 1)
+        self.reset_sec = reset_sec
+        self._lock = threading.Lock()
+        self._errors = 0
+        self._opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being refused (the half-open probe window counts as open)."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return self._probing or time.monotonic() - self._opened_at < self.reset_sec
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._probing or time.monotonic() - self._opened_at < self.reset_sec:
+                raise ArgoUnavailable("Argo API unavailable (circuit open)")
+            self._probing = True  # this caller is the probe
+
+    def release(self) -> None:
+        """Give up the probe slot without a verdict (the probe was cancelled); the next caller probes."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, exc: BaseException | None) -> None:
+        failed = exc is not None and is_outage(exc)
+        with self._lock:
+            if not failed:
+                if self._opened_at is not None:
+                    log.info("[argo] circuit closed")
+                self._errors = 0
+                self._opened_at = None
+                self._probing = False
+                return
+            self._errors += 1
+            if self._probing or self._errors >= self.failures:
+                if self._opened_at is None or self._probing:
+                    log.warning("[argo] circuit open for %.0fs after: %s", self.reset_sec, exc)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+def is_outage(exc: BaseException) -> bool:
+    """Transport errors and 5xx mean Argo is in trouble; 4xx (not found, conflict, ...) do not."""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError):
+        resp = exc.response
+        return resp is None or resp.status_code >= 500
+    if isinstance(exc, InternalServerError):
+        return True
+    if isinstance(exc, HeraException):
+        # 502/503/504 come back as the generic HeraException
+        return "status code 5" in str(exc) and not isinstance(exc, HeraNotImplemented)
+    return False
+
+
+limiter = RateLimiter(ARGO_RATE_PER_SEC, ARGO_RATE_BURST)
+breaker = CircuitBreaker(ARGO_BREAKER_FAILURES, ARGO_BREAKER_RESET_SEC)
@@ -0,0 +1,139 @@
+# tethysapp/flowforge/argo/poller.py
+"""
+Bulk status polling for when the event stream is unavailable.
+
+One scheduler per namespace keeps the set of Argo Workflow names that have
+watchers and, every tick, makes a single ``list_workflows`` call filtered by
+the FlowForge label instead of one ``get_workflow`` per watcher. Names missing
+from the listing (just completed, or submitted before FlowForge labelled its
+workflows) get one direct read so their final node phases are not lost; a 404
+there is published as a deletion.
+How often that happens adapts to what the workflows are doing (schedule.py).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+
+from .client import argo_call, get_json
+from .config import LABEL_ARGO_COMPLETED, LABEL_MANAGED, POLL_SEC
+from .events import WorkflowFanout, node_phases
+from .limits import ArgoUnavailable, breaker
+from .schedule import PollScheduler
+
+log = logging.getLogger(__name__)
+
+_LIST_FIELDS = "items.metadata.name,items.status.phase,items.status.nodes"
+_GET_FIELDS = "metadata.name,status.phase,status.nodes"
+
+
+class BulkWorkflowPoller(WorkflowFanout):
+    """O(1) Argo requests per tick for every active FlowForge workflow in a namespace.
+
+    Ticks are paced by a PollScheduler: the next list happens when the most
+    urgent tracked workflow is due, and failed lists back off with jitter.
+    """
+
+    _LIST_KEY = "__list__"
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self.scheduler = PollScheduler()
+        self._task: asyncio.Task | None = None
+        self._wake: asyncio.Event | None = None
+
+    def track(self, name: str, kinds=()) -> None:
+        """Size ``name``'s poll interval from its node kinds (call before subscribing)."""
+        self.scheduler.track(name, kinds)
+
+    def intervals(self) -> dict[str, dict]:
+        """Current poll interval per tracked workflow."""
+        return self.scheduler.snapshot()
+
+    def _on_subscribe(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(), name=f"argo-poll-{self.namespace}")
+        else:
+            self._wake.set()  # a new workflow starts in the fast lane
+
+    def unsubscribe(self, name: str, queue: asyncio.Queue) -> None:
+        super().unsubscribe(name, queue)
+        if name not in self.names():
+            self.scheduler.forget(name)
+
+    async def _run(self) -> None:
+        while self.names():
+            started = time.monotonic()
+            try:
+                if breaker.is_open:
+                    # Argo is down: watchers keep their last known (cached) status
+                    delay = POLL_SEC
+                else:
+                    await self._tick()
+                    self.scheduler.forget(self._LIST_KEY)
+                    delay = self.scheduler.next_delay(self.names())
+            except ArgoUnavailable:
+                delay = POLL_SEC
+            except Exception as e:
+                delay = self.scheduler.failed(self._LIST_KEY)
+                log.warning("[argo-poll] %s list failed: %s (retry in %.1fs)", self.namespace, e, delay)
+                for name in self.names():
+                    self._publish_error(name, str(e))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, delay - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _tick(self) -> None:
+        wanted = self.names()
+        selector = f"{LABEL_MANAGED}=true,{LABEL_ARGO_COMPLETED}!=true"
+        listing = await argo_call(
+            get_json,
+            f"api/v1/workflows/{self.namespace}",
+            {"listOptions.labelSelector": selector, "fields": _LIST_FIELDS},
+        )
+
+        seen: set[str] = set()
+        for wf in (listing or {}).get("items") or []:
+            name = (wf.get("metadata") or {}).get("name")
+            if name in wanted:
+                seen.add(name)
+                self._observe(name, wf)
+
+        for name in wanted - seen:
+            if not self.scheduler.due(name):
+                continue
+            try:
+                wf = await argo_call(get_json, f"api/v1/workflows/{self.namespace}/{name}", {"fields": _GET_FIELDS})
+            except ArgoUnavailable:
+                return
+            except Exception as e:
+                if getattr(getattr(e, "response", None), "status_code", None) == 404:
+                    self._publish(name, None, {}, deleted=True)
+                    continue
+                self.scheduler.failed(name)
+                self._publish_error(name, str(e))
+                continue
+            self._observe(name, wf)
+
+    def _observe(self, name: str, wf: dict) -> None:
+        phase = (wf.get("status") or {}).get("phase")
+        changed = self._publish(name, phase, node_phases(wf))
+        self.scheduler.observe(name, phase, changed)
+
+
+_pollers: dict[str, BulkWorkflowPoller] = {}
+_pollers_lock = threading.Lock()
+
+
+def get_bulk_poller(namespace: str) -> BulkWorkflowPoller:
+    """Process-wide poller for ``namespace`` (created lazily)."""
+    with _pollers_lock:
+        poller = _pollers.get(namespace)
+        if poller is None:
+            poller = _pollers[namespace] = BulkWorkflowPoller(namespace)
+        return poller
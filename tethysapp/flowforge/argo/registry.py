@@ -0,0 +1,66 @@
+# tethysapp/flowforge/argo/registry.py
+"""
+Process-wide registry of Argo status watchers.
+
+Exactly one watcher task runs per Argo Workflow name in a process, no matter
+how many websocket connections are looking at it. Watchers publish to the
+channel-layer group of their FlowForge workflow (see ``workflow_group``) and
+every consumer that follows that workflow relays the frames to its browser.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+log = logging.getLogger(__name__)
+
+
+def workflow_group(wf_id) -> str:
+    """Channel-layer group that receives status frames for one FlowForge workflow."""
+    return f"flowforge-wf-{wf_id}"
+
+
+class WatcherRegistry:
+    """Keeps at most one running watcher task per key (the Argo Workflow name)."""
+
+    def __init__(self):
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def ensure(self, key: str, factory: Callable[[], Awaitable[None]]) -> bool:
+        """Start ``factory()`` for ``key`` unless a watcher already runs; True if started."""
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            return False
+
+        async def _run():
+            try:
+                await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("[watchers] watcher for %s crashed", key)
+            finally:
+                if self._tasks.get(key) is current:
+                    self._tasks.pop(key, None)
+
+        current = asyncio.create_task(_run(), name=f"watch:{key}")
+        self._tasks[key] = current
+        return True
+
+    def is_running(self, key: str) -> bool:
+        task = self._tasks.get(key)
+        return task is not None and not task.done()
+
+    def cancel(self, key: str) -> bool:
+        task = self._tasks.pop(key, None)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    def keys(self) -> list[str]:
+        return [k for k, t in self._tasks.items() if not t.done()]
+
+
+watchers = WatcherRegistry()
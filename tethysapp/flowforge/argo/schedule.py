@@ -0,0 +1,144 @@
+# tethysapp/flowforge/argo/schedule.py
+"""
+Adaptive poll intervals for Argo status reads.
+
+Instead of one fixed ``POLL_SEC`` for everything, each tracked workflow gets
+an interval from what we have seen of it:
+  - fast right after submit and while Pending (pods being scheduled),
+  - stretched during long Running phases in which nothing changes, up to a
+    cap that depends on the kinds of tasks in the workflow,
+  - fast again once the workflow gets close to its expected duration,
+  - exponential backoff with jitter after failed reads.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+from .config import (
+    POLL_ERROR_MAX_SEC,
+    POLL_FAST_SEC,
+    POLL_FAST_WINDOW_SEC,
+    POLL_MAX_SEC,
+    POLL_RAMP_SEC,
+    POLL_SEC,
+)
+
+# Rough expected run time per node kind tag (see _kind_tag in the NGIAB handler).
+EXPECTED_SEC_BY_KIND = {
+    "pre": 900.0,
+    "cal_cfg": 120.0,
+    "cal_run": 7200.0,
+    "run": 3600.0,
+    "teehr": 600.0,
+    "other": 600.0,
+}
+# Workflows made only of kinds shorter than this never slow down past POLL_SEC
+_SHORT_KIND_SEC = 300.0
+
+
+class _Track:
+    __slots__ = ("submitted_at", "changed_at", "phase", "expected_sec", "errors", "next_at", "interval")
+
+    def __init__(self, now: float, expected_sec: float):
+        self.submitted_at = now
+        self.changed_at = now
+        self.phase: str | None = None
+        self.expected_sec = expected_sec
+        self.errors = 0
+        self.interval = POLL_FAST_SEC
+        self.next_at = now
+
+
+class PollScheduler:
+    """Per-key poll intervals; keys are Argo Workflow names (or any read target)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tracks: dict[str, _Track] = {}
+
+    def track(self, key: str, kinds=()) -> None:
+        """Start tracking ``key``; ``kinds`` are node kind tags used to size the slow interval."""
+        expected = max((EXPECTED_SEC_BY_KIND.get(k, EXPECTED_SEC_BY_KIND["other"]) for k in kinds), default=0.0)
+        now = time.monotonic()
+        with self._lock:
+            t = self._tracks.get(key)
+            if t is None:
+                self._tracks[key] = _Track(now, expected)
+            elif expected > t.expected_sec:
+                t.expected_sec = expected
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._tracks.pop(key, None)
+
+    def observe(self, key: str, phase: str | None, changed: bool) -> float:
+        """Record a successful read; returns the interval until ``key`` should be read again."""
+        now = time.monotonic()
+        with self._lock:
+            t = self._tracks.get(key)
+            if t is None:
+                t = self._tracks[key] = _Track(now, 0.0)
+            t.errors = 0
+            if changed or phase != t.phase:
+                t.changed_at = now
+            t.phase = phase
+            t.interval = self._interval(t, now)
+            t.next_at = now + t.interval
+            return t.interval
+
+    def failed(self, key: str) -> float:
+        """Record a failed read; returns the backoff (with jitter) before the next try."""
+        now = time.monotonic()
+        with self._lock:
+            t = self._tracks.get(key)
+            if t is None:
+                t = self._tracks[key] = _Track(now, 0.0)
+            t.errors += 1
+            ceiling = min(POLL_ERROR_MAX_SEC, POLL_SEC * (2 ** t.errors))
+            t.interval = random.uniform(ceiling / 2, ceiling)
+            t.next_at = now + t.interval
+            return t.interval
+
+    def due(self, key: str) -> bool:
+        with self._lock:
+            t = self._tracks.get(key)
+            return t is None or time.monotonic() >= t.next_at
+
+    def next_delay(self, keys) -> float:
+        """Seconds until the earliest of ``keys`` is due (POLL_SEC if none are tracked)."""
+        now = time.monotonic()
+        with self._lock:
+            due = [self._tracks[k].next_at for k in keys if k in self._tracks]
+        if not due:
+            return POLL_SEC
+        return max(0.0, min(due) - now)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Current interval, phase and error count per key (for logs / diagnostics)."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                k: {
+                    "phase": t.phase,
+                    "interval": round(t.interval, 2),
+                    "errors": t.errors,
+                    "age": round(now - t.submitted_at, 1),
+                }
+                for k, t in self._tracks.items()
+            }
+
+    @staticmethod
+    def _interval(t: _Track, now: float) -> float:
+        age = now - t.submitted_at
+        if t.phase in (None, "Pending") or age < POLL_FAST_WINDOW_SEC:
+            return POLL_FAST_SEC
+        if t.phase != "Running":
+            return POLL_SEC
+        # Close to the expected end of a long run: tighten up again
+        if t.expected_sec and age >= 0.8 * t.expected_sec:
+            return POLL_SEC
+        ceiling = POLL_SEC if t.expected_sec and t.expected_sec <= _SHORT_KIND_SEC else POLL_MAX_SEC
+        quiet = now - t.changed_at
+        return min(ceiling, POLL_SEC * (1.0 + quiet / POLL_RAMP_SEC))
@@ -0,0 +1,194 @@
+# tethysapp/flowforge/argo/templates.py
+"""
+WorkflowTemplate registry.
+
+Each packaged YAML in ``consumers/templates`` is hashed (sha256 of its text);
+the hash we deployed is stored on the WorkflowTemplate as the
+``flowforge.io/template-hash`` annotation. ``ensure(name)``:
+  - returns without any network call while the template was verified less
+    than TEMPLATE_CACHE_TTL_SEC ago with the current hash,
+  - otherwise reads the template once: missing -> create, different hash ->
+    update in place (no delete/recreate window), same hash -> just cache it.
+
+Every packaged template is provisioned at startup (first websocket connect,
+or ``manage.py flowforge_sync_templates``) and re-verified before its cache
+entry expires, so submissions do not do template management at all.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+from importlib import resources
+
+from hera.exceptions import AlreadyExists, NotFound
+from hera.workflows import WorkflowTemplate
+from hera.workflows.models import WorkflowTemplateUpdateRequest
+
+from .client import argo_call, make_ws
+from .config import (
+    ANNOTATION_TEMPLATE_HASH,
+    ARGO_FORCE_TEMPLATE_UPDATE,
+    ARGO_NAMESPACE,
+    TEMPLATE_CACHE_TTL_SEC,
+)
+from .limits import PRIORITY_TEMPLATE
+
+log = logging.getLogger(__name__)
+
+_TEMPLATES_PKG = "tethysapp.flowforge.consumers.templates"
+
+TEMPLATE_FILES = {
+    "ngiab-data-preprocess": "ngiab-data-preprocess.yaml",
+    "ngiab-calibration-config": "ngiab-calibration-config.yaml",
+    "ngiab-calibration-run": "ngiab-calibration-run.yaml",
+    "ngiab-run": "ngiab-run.yaml",
+    "ngiab-teehr": "ngiab-teehr.yaml",
+    # Dummy variants (update filenames to wherever you ship them)
+    "dummy-preprocess": "dummy-preprocess.yaml",
+    "dummy-calibration-config": "dummy-calibration-config.yaml",
+    "dummy-calibration-run": "dummy-calibration-run.yaml",
+    "dummy-run": "dummy-run.yaml",
+    "dummy-teehr": "dummy-teehr.yaml",
+}
+
+
+@lru_cache(maxsize=None)
+def load_template_yaml_text(name: str) -> str:
+    filename = TEMPLATE_FILES.get(name)
+    if not filename:
+        raise ValueError(f"No YAML file mapped for template '{name}'")
+    with resources.files(_TEMPLATES_PKG).joinpath(filename).open("r", encoding="utf-8") as f:
+        return f.read()
+
+
+@lru_cache(maxsize=None)
+def template_hash(name: str) -> str:
+    return hashlib.sha256(load_template_yaml_text(name).encode("utf-8")).hexdigest()
+
+
+def _deployed_hash(existing) -> str | None:
+    metadata = getattr(existing, "metadata", None)
+    annotations = getattr(metadata, "annotations", None) or {}
+    return annotations.get(ANNOTATION_TEMPLATE_HASH)
+
+
+class TemplateRegistry:
+    """Which template hashes are known to be deployed, and since when."""
+
+    def __init__(self, ttl_sec: float):
+        self.ttl_sec = ttl_sec
+        self._lock = threading.Lock()
+        self._verified: dict[str, tuple[str, float]] = {}  # name -> (hash, verified_at)
+        self._forced: set[str] = set()
+
+    def is_fresh(self, name: str) -> bool:
+        digest = template_hash(name)
+        with self._lock:
+            hit = self._verified.get(name)
+        return hit is not None and hit[0] == digest and time.monotonic() - hit[1] < self.ttl_sec
+
+    def ensure(self, name: str, refresh: bool = False) -> str:
+        """
+        Make sure Argo has the packaged version of ``name`` (blocking); returns what was done.
+        ``refresh`` re-verifies even a fresh cache entry (used by provisioning).
+        """
+        digest = template_hash(name)
+        force = ARGO_FORCE_TEMPLATE_UPDATE and name not in self._forced
+        if not force and not refresh and self.is_fresh(name):
+            return "cached"
+
+        ws = make_ws()
+        try:
+            existing = ws.get_workflow_template(name=name, namespace=ARGO_NAMESPACE)
+        except NotFound:
+            existing = None
+
+        if existing is None:
+            try:
+                self._build(name, digest).create()
+                outcome = "created"
+            except AlreadyExists:
+                # someone else created it between our read and create: compare on the next ensure
+                outcome = "exists"
+                digest = ""
+        elif force or _deployed_hash(existing) != digest:
+            model = self._build(name, digest).build()
+            model.metadata.resource_version = existing.metadata.resource_version
+            ws.update_workflow_template(
+                name, WorkflowTemplateUpdateRequest(template=model), namespace=ARGO_NAMESPACE
+            )
+            outcome = "updated"
+        else:
+            outcome = "unchanged"
+
+        with self._lock:
+            if digest:
+                self._verified[name] = (digest, time.monotonic())
+            self._forced.add(name)
+        if outcome in {"created", "updated"}:
+            log.info("WorkflowTemplate '%s' %s (hash %s).", name, outcome, digest[:12])
+        return outcome
+
+    def invalidate(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                self._verified.clear()
+            else:
+                self._verified.pop(name, None)
+
+    @staticmethod
+    def _build(name: str, digest: str) -> WorkflowTemplate:
+        wt = WorkflowTemplate.from_yaml(load_template_yaml_text(name))
+        wt.annotations = {**(wt.annotations or {}), ANNOTATION_TEMPLATE_HASH: digest}
+        wt.workflows_service = make_ws()
+        return wt
+
+
+templates = TemplateRegistry(TEMPLATE_CACHE_TTL_SEC)
+
+
+def packaged_templates() -> list[str]:
+    """Template names (real and dummy) whose YAML actually ships with the app."""
+    root = resources.files(_TEMPLATES_PKG)
+    return [name for name, filename in TEMPLATE_FILES.items() if root.joinpath(filename).is_file()]
+
+
+async def provision_templates(names=None) -> dict[str, str]:
+    """Verify/sync templates concurrently (default: every packaged one); returns {name: outcome or error}."""
+    names = list(names) if names is not None else packaged_templates()
+
+    async def _one(name: str) -> str:
+        try:
+            return await argo_call(templates.ensure, name, refresh=True, priority=PRIORITY_TEMPLATE)
+        except Exception as e:
+            log.warning("Could not provision WorkflowTemplate '%s': %s", name, e)
+            return f"error: {e}"
+
+    results = await asyncio.gather(*(_one(n) for n in names))
+    return dict(zip(names, results))
+
+
+_refresher: asyncio.Task | None = None
+
+
+async def _refresh_forever() -> None:
+    # Re-verify before entries expire so submits always hit the cache
+    while True:
+        try:
+            results = await provision_templates()
+            log.debug("[templates] provisioned: %s", results)
+        except Exception:
+            log.exception("[templates] provisioning failed")
+        await asyncio.sleep(max(templates.ttl_sec * 0.5, 5.0))
+
+
+def start_template_refresher() -> asyncio.Task:
+    """Provision every packaged template now and keep them verified (once per process)."""
+    global _refresher
+    if _refresher is None or _refresher.done():
+        _refresher = asyncio.create_task(_refresh_forever(), name="flowforge-templates")
+    return _refresher
@@ -0,0 +1,293 @@
+# tethysapp/flowforge/consumers/admission.py
+"""
+Persistent submission queue with per-user fair-share admission.
+
+RUN_WORKFLOW and RUN_NODE (and the legacy RUN_* shims, which go through
+RUN_NODE) do not talk to Argo directly anymore: they store a ``Submission``
+row in the workflows DB and answer right away. One dispatcher per deployment
+-- the replica holding the queue's advisory lock (see leadership.py) --
+admits queued rows while there is capacity:
+  - at most QUEUE_MAX_INFLIGHT runs in flight overall and
+    QUEUE_MAX_INFLIGHT_PER_USER per user; a run is in flight from dispatch
+    until its workflow row leaves queued/running,
+  - next pick: the user with the fewest runs in flight (counting the picks
+    already made), ties to the user with the oldest queued row, so one user's
+    200-branch sweep takes turns with everyone else; within that user's own
+    rows the highest priority goes first, then the oldest. A priority never
+    moves a run ahead of another user's turn.
+Admitted rows are handed to the in-process SubmissionPipeline (argo/jobs.py)
+by the dispatcher registered for their kind; rows still waiting get their
+queue position announced whenever it changes. A job claims its row
+(dispatched -> submitting, see ``claim``) as soon as it gets a pipeline slot;
+only rows left unclaimed for QUEUE_ORPHAN_SEC are taken for orphans of a
+dead dispatcher and re-queued. A claimed row is never re-queued: its Argo
+create may already have gone out.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..argo.config import QUEUE_MAX_INFLIGHT, QUEUE_MAX_INFLIGHT_PER_USER, QUEUE_ORPHAN_SEC, QUEUE_TICK_SEC
+from ..model import Submission, Workflow as WFModel
+from .handlers.model_run_handler import get_async_sessionmaker
+from .leadership import run_as_leader
+
+log = logging.getLogger(__name__)
+
+_LEASE = "flowforge-submission-queue"
+# Queued rows looked at per dispatcher tick
+_SCAN_LIMIT = 1000
+# Client-supplied priorities are clamped to this range (they only order a user's own runs)
+_PRIORITY_RANGE = (-10, 10)
+# Rows that count as in flight (besides their workflow being queued/running)
+_INFLIGHT = ("dispatched", "submitting")
+
+Dispatch = Callable[[Submission], Awaitable[None]]
+Announce = Callable[[Submission, int], Awaitable[None]]
+
+
+def admission_order(
+    queued,
+    inflight: dict[str, int],
+    max_inflight: int = QUEUE_MAX_INFLIGHT,
+    max_per_user: int = QUEUE_MAX_INFLIGHT_PER_USER,
+) -> tuple[list, list]:
+    """
+    Split queued rows into (admit now, still waiting in queue order). Rows need ``user``,
+    ``priority`` and ``created_at``; ``inflight`` counts each user's runs already in flight.
+    """
+    served = dict(inflight)
+    total = sum(served.values())
+    by_user: dict[str, list] = {}
+    for row in queued:
+        by_user.setdefault(row.user, []).append(row)
+    for rows in by_user.values():
+        rows.sort(key=lambda r: (-(r.priority or 0), r.created_at))
+    admit, waiting = [], []
+    while by_user:
+        user = min(by_user, key=lambda u: (served.get(u, 0), min(r.created_at for r in by_user[u])))
+        rows = by_user[user]
+        row = rows.pop(0)
+        if not rows:
+            del by_user[user]
+        full = max_inflight > 0 and total >= max_inflight
+        capped = max_per_user > 0 and served.get(user, 0) >= max_per_user
+        if full or capped:
+            waiting.append(row)
+        else:
+            admit.append(row)
+            total += 1
+        # waiting rows take turns too, so queue positions follow the same fair order
+        served[user] = served.get(user, 0) + 1
+    return admit, waiting
+
+
+class SubmissionQueue:
+    """DB-backed queue of Argo submissions; dispatching runs on the lease holder only."""
+
+    def __init__(self):
+        self._kinds: dict[str, tuple[Dispatch, Announce]] = {}
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._positions: dict = {}  # submission id -> last announced position
+
+    def register(self, kind: str, dispatch: Dispatch, announce: Announce) -> None:
+        """``dispatch(row)`` submits an admitted row; ``announce(row, position)`` reports a waiting one."""
+        self._kinds[kind] = (dispatch, announce)
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        wf_id,
+        user: str,
+        kind: str,
+        payload: dict,
+        node_ids=(),
+        priority=None,
+    ) -> Submission:
+        """Store a submission (superseding the workflow's still-queued ones) and wake the dispatcher."""
+        try:
+            priority = min(max(int(priority or 0), _PRIORITY_RANGE[0]), _PRIORITY_RANGE[1])
+        except (TypeError, ValueError):
+            priority = 0
+        await session.execute(
+            update(Submission)
+            .where(Submission.workflow_id == wf_id, Submission.status == "queued")
+            .values(status="cancelled", message="superseded")
+        )
+        row = Submission(
+            workflow_id=wf_id, user=user, kind=kind, priority=priority,
+            payload=payload, node_ids=list(node_ids), status="queued",
+        )
+        session.add(row)
+        await session.commit()
+        self.wake()
+        return row
+
+    async def cancel(self, session: AsyncSession, wf_id) -> int:
+        """
+        Drop the workflow's queued submissions and flag its dispatched / submitting ones: the
+        replica submitting those checks the flag around its Argo create (see ``cancelled``).
+        Returns how many were cancelled.
+        """
+        result = await session.execute(
+            update(Submission)
+            .where(Submission.workflow_id == wf_id, Submission.status.in_(["queued", *_INFLIGHT]))
+            .values(status="cancelled", message="cancelled")
+            .returning(Submission.id)
+        )
+        cancelled = result.scalars().all()
+        await session.commit()
+        return len(cancelled)
+
+    async def cancelled(self, submission_id) -> bool:
+        """True once the submission was cancelled (possibly from another replica)."""
+        SessionFactory = await get_async_sessionmaker()
+        async with SessionFactory() as session:
+            status = (await session.execute(
+                select(Submission.status).where(Submission.id == submission_id)
+            )).scalar_one_or_none()
+        return status == "cancelled"
+
+    async def claim(self, row: Submission) -> bool:
+        """
+        Take an admitted row for the job that is about to submit it (dispatched -> submitting).
+        False if it was cancelled, or re-queued as an orphan -- and maybe dispatched again, with a
+        new ``dispatched_at`` -- since ``row`` was handed out.
+        """
+        SessionFactory = await get_async_sessionmaker()
+        async with SessionFactory() as session:
+            claimed = (await session.execute(
+                update(Submission)
+                .where(
+                    Submission.id == row.id,
+                    Submission.status == "dispatched",
+                    Submission.dispatched_at == row.dispatched_at,
+                )
+                .values(status="submitting")
+                .returning(Submission.id)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            await session.commit()
+        return claimed is not None
+
+    def wake(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> asyncio.Task:
+        """Compete for the dispatcher lease (once per process)."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(
+                run_as_leader(_LEASE, self._serve, self._still_wanted), name="flowforge-submission-queue",
+            )
+        return self._task
+
+    @staticmethod
+    async def _still_wanted() -> bool:
+        return True
+
+    async def _serve(self) -> None:
+        self._positions.clear()
+        while True:
+            try:
+                await self._requeue_orphans()
+                await self.dispatch_ready()
+            except Exception:
+                log.exception("[queue] dispatch tick failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=QUEUE_TICK_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _requeue_orphans(self) -> int:
+        # Admitted by a dispatcher that died before any job claimed the row. Jobs of a live one
+        # (waiting for a pipeline slot, even across a lost lease) claim well within QUEUE_ORPHAN_SEC;
+        # one that does not is too late anyway: the re-dispatch gets a new dispatched_at.
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=QUEUE_ORPHAN_SEC)
+        SessionFactory = await get_async_sessionmaker()
+        async with SessionFactory() as session:
+            orphans = (await session.execute(
+                update(Submission)
+                .where(
+                    Submission.status == "dispatched",
+                    Submission.dispatched_at < cutoff,
+                    Submission.workflow_id.in_(select(WFModel.id).where(WFModel.status == "queued")),
+                )
+                .values(status="queued", dispatched_at=None)
+                .returning(Submission.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all()
+            await session.commit()
+        if orphans:
+            log.info("[queue] re-queued %d submission(s) no job claimed within %.0fs", len(orphans), QUEUE_ORPHAN_SEC)
+        return len(orphans)
+
+    async def dispatch_ready(self) -> int:
+        """Admit what fits now, announce the new positions of the rest; returns how many were admitted."""
+        SessionFactory = await get_async_sessionmaker()
+        async with SessionFactory() as session:
+            queued = (await session.execute(
+                select(Submission)
+                .where(Submission.status == "queued")
+                .order_by(Submission.created_at)
+                .limit(_SCAN_LIMIT)
+            )).scalars().all()
+            if not queued:
+                self._positions.clear()
+                return 0
+            inflight = dict((await session.execute(
+                select(Submission.user, func.count(Submission.id))
+                .join(WFModel, WFModel.id == Submission.workflow_id)
+                .where(Submission.status.in_(_INFLIGHT), WFModel.status.in_(["queued", "running"]))
+                .group_by(Submission.user)
+            )).all())
+            admit, waiting = admission_order(queued, inflight)
+            admitted = set()
+            now = datetime.now(timezone.utc)
+            if admit:
+                # rows cancelled since we read them are not admitted
+                admitted = set((await session.execute(
+                    update(Submission)
+                    .where(Submission.id.in_([r.id for r in admit]), Submission.status == "queued")
+                    .values(status="dispatched", dispatched_at=now)
+                    .returning(Submission.id)
+                    .execution_options(synchronize_session=False)
+                )).scalars().all())
+                await session.commit()
+
+        for row in admit:
+            if row.id not in admitted:
+                continue
+            # the job claims the row with this dispatched_at (see claim)
+            row.status, row.dispatched_at = "dispatched", now
+            dispatch, _ = self._kinds[row.kind]
+            try:
+                await dispatch(row)
+            except Exception:
+                log.exception("[queue] could not dispatch submission %s (workflow %s)", row.id, row.workflow_id)
+
+        positions = {}
+        for position, row in enumerate(waiting, start=1):
+            positions[row.id] = position
+            if self._positions.get(row.id) != position:
+                _, announce = self._kinds[row.kind]
+                try:
+                    await announce(row, position)
+                except Exception:
+                    log.warning("[queue] could not announce position of submission %s", row.id)
+        self._positions = positions
+        if admitted or waiting:
+            log.debug("[queue] admitted %d, %d waiting", len(admitted), len(waiting))
+        return len(admitted)
+
+
+submission_queue = SubmissionQueue()
@@ -13,6 +13,9 @@ class BackendActions(StrEnum):
     RUN_TEERH                       = auto()
     RUN_WORKFLOW                    = auto()
     RUN_NODE                        = auto()
+    RETRY_WORKFLOW                  = auto()
+    CANCEL_WORKFLOW                 = auto()
+    CANCEL_NODE                     = auto()
     REQUEST_LAST_RUN                = auto()
 
     # outgoing (to frontend)
@@ -21,6 +24,7 @@ class BackendActions(StrEnum):
     WORKFLOW_RESULT             = auto()
     WORKFLOW_GRAPH              = auto()
     NODE_STATUS                 = auto()
+    NODE_STATUS_BATCH           = auto()
     LAST_RUN_LOG                = auto()
     WORKFLOW_SUBMITTED          = auto()
     MESSAGE_ACKNOWLEDGE         = auto()
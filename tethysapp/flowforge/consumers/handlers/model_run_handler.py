@@ -21,6 +21,49 @@ from ..backend_actions import BackendActions
 
 log = logging.getLogger(__name__)
 
+# One engine/sessionmaker per process, shared by every connection and watcher.
+_engine = None
+_Session = None
+
+
+async def get_async_sessionmaker():
+    """
+    Lazily build and cache the process-wide async sessionmaker.
+
+    Calls App.get_persistent_store_database(...) via database_sync_to_async
+    to avoid SynchronousOnlyOperation in async context. See:
+     - Channels docs on DB access from AsyncConsumer
+     - Django async docs (sync_to_async)
+    """
+    global _engine, _Session
+    if _Session:
+        return _Session
+
+    # This hits Django ORM under the hood -> wrap with database_sync_to_async
+    sync_url = await database_sync_to_async(App.get_persistent_store_database)(
+        "workflows", as_url=True
+    )
+    async_url = sync_url.set(drivername="postgresql+asyncpg")
+    db_url = str(async_url)
+
+    if _Session:  # another coroutine finished first while we awaited
+        return _Session
+
+    _engine = create_async_engine(db_url, echo=False, future=True)
+    if async_sessionmaker:
+        _Session = async_sessionmaker(_engine, expire_on_commit=False, class_=AsyncSession)
+    else:
+        # Fallback for older SQLAlchemy: still returns an async session class
+        _Session = sessionmaker(bind=_engine, class_=AsyncSession, expire_on_commit=False)
+
+    return _Session
+
+
+async def get_async_engine():
+    """The process-wide async engine behind get_async_sessionmaker()."""
+    await get_async_sessionmaker()
+    return _engine
+
 
 class ModelBackendHandler:
     """
@@ -51,31 +94,10 @@ class ModelBackendHandler:
     # Async sessionmaker bootstrap (wrap Django/Tethys ORM calls correctly)
     # -------------------------------------------------------------------------
     async def get_sessionmaker(self):
-        """
-        Lazily build and cache an async sessionmaker.
-
-        Calls App.get_persistent_store_database(...) via database_sync_to_async
-        to avoid SynchronousOnlyOperation in async context. See:
-         - Channels docs on DB access from AsyncConsumer
-         - Django async docs (sync_to_async)
-        """
-        if self._Session:
-            return self._Session
-
-        # This hits Django ORM under the hood -> wrap with database_sync_to_async
-        sync_url = await database_sync_to_async(App.get_persistent_store_database)(
-            "workflows", as_url=True
-        )
-        async_url = sync_url.set(drivername="postgresql+asyncpg")
-        db_url = str(async_url)
-
-        self._engine = create_async_engine(db_url, echo=False, future=True)
-        if async_sessionmaker:
-            self._Session = async_sessionmaker(self._engine, expire_on_commit=False, class_=AsyncSession)
-        else:
-            # Fallback for older SQLAlchemy: still returns an async session class
-            self._Session = sessionmaker(bind=self._engine, class_=AsyncSession, expire_on_commit=False)
-
+        """Async sessionmaker for this handler (the process-wide one)."""
+        if not self._Session:
+            self._Session = await get_async_sessionmaker()
+            self._engine = _engine
         return self._Session
 
     # -------------------------------------------------------------------------
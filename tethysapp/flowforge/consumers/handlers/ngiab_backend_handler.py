@@ -1,147 +1,140 @@
 # tethysapp/ngiab/consumers/ngiab_backend_handler.py
 import asyncio
+import functools
 import json
 import logging
-import os
 import time
 from collections import defaultdict
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
-from importlib import resources
+from typing import List
 
-from sqlalchemy import select
+from sqlalchemy import case, func, or_, select, update
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from hera.workflows import Workflow, WorkflowTemplate, DAG, Task, Parameter, WorkflowsService
-from hera.workflows.models import WorkflowTemplateRef, TemplateRef, Arguments
-from hera.shared import global_config
+from hera.exceptions import NotFound
+from hera.workflows import Workflow, Parameter
+from hera.workflows.models import WorkflowTemplateRef
 
+from channels.layers import get_channel_layer
+
+from tethysapp.flowforge.app import App
 from ..backend_actions import BackendActions
-from .model_run_handler import ModelBackendHandler as MBH
+from .model_run_handler import ModelBackendHandler as MBH, get_async_sessionmaker
 from ...model import Workflow as WFModel, Node as NodeModel, WorkflowTemplate as WTModel, VirtualOutput as VOModel
 
-log = logging.getLogger(__name__)
+from ...argo.config import (
+    ARGO_NAMESPACE,
+    ARGO_WATCH_MODE,
+    ARGO_WATCH_RESYNC_SEC,
+    POLL_TIMEOUT_SEC,
+    STATUS_BATCH_DEBOUNCE_SEC,
+    FLOWFORGE_WATCHER_MODE,
+    WATCHER_CHANNEL,
+    WATCHER_LEADERSHIP,
+    flowforge_labels,
+)
+from ...argo.attribution import TaskAttribution
+from ...argo.client import argo_call, make_ws
+from ...argo.control import retry_workflow, stop_workflow, terminate_workflow
+from ...argo.limits import PRIORITY_CONTROL, PRIORITY_SUBMIT, PRIORITY_TEMPLATE, ArgoUnavailable
+from ...argo.events import WorkflowDelta, delta_from_workflow, get_event_stream
+from ...argo.poller import get_bulk_poller
+from ...argo.jobs import SubmissionJob, submissions
+from ...argo.registry import watchers, workflow_group
+from ...argo.templates import templates
+from ..admission import submission_queue
+from ..leadership import run_as_leader
+from .ngiab_compiler import (
+    _bucket,
+    _kind_tag,
+    _kind_to_template,
+    _params_for,
+    _parse_s3_url,
+    _resolve_workflow_name_placeholder,
+    WorkflowOptions,
+    compile_chain,
+    create_workflow,
+    dirty_nodes,
+    user_config,
+)
 
-# ---------- Argo / Hera config ----------
-ARGO_HOST = os.getenv("ARGO_HOST", "https://localhost:2746")
-ARGO_TOKEN = os.getenv("ARGO_TOKEN", "")
-ARGO_NAMESPACE = os.getenv("ARGO_NAMESPACE", "argo")
-ARGO_VERIFY_SSL = os.getenv("ARGO_VERIFY_SSL", "false").lower() in ("1", "true", "yes")
-
-ARGO_FORCE_TEMPLATE_UPDATE = os.getenv("ARGO_FORCE_TEMPLATE_UPDATE", "false").lower() in ("1", "true", "yes")
-
-POLL_SEC = float(os.getenv("ARGO_POLL_SEC", "3.0"))
-POLL_TIMEOUT_SEC = float(os.getenv("ARGO_POLL_TIMEOUT_SEC", "21600"))  # 6h
-
-_TEMPLATE_FILES = {
-    "ngiab-data-preprocess": "ngiab-data-preprocess.yaml",
-    "ngiab-calibration-config": "ngiab-calibration-config.yaml",
-    "ngiab-calibration-run": "ngiab-calibration-run.yaml",
-    "ngiab-run": "ngiab-run.yaml",
-    "ngiab-teehr": "ngiab-teehr.yaml",
-    # Dummy variants (update filenames to wherever you ship them)
-    "dummy-preprocess": "dummy-preprocess.yaml",
-    "dummy-calibration-config": "dummy-calibration-config.yaml",
-    "dummy-calibration-run": "dummy-calibration-run.yaml",
-    "dummy-run": "dummy-run.yaml",
-    "dummy-teehr": "dummy-teehr.yaml",
-}
+log = logging.getLogger(__name__)
 
 _TERMINAL = {"Succeeded", "Failed", "Error", "Terminated"}
+# Node message of a cancelled row; such rows are final until the next run or retry
+CANCELLED = "cancelled"
 
 
-# --- ADD/REPLACE: helpers near your other small helpers ----------------------
-
-def _slug(x: str) -> str:
-    import re
-    return re.sub(r"[^a-zA-Z0-9\-]+", "-", str(x)).strip("-").lower() or "n"
-
-def _kind_tag(kind_or_label: str) -> str:
-    k = (kind_or_label or "").lower()
-    # normalize a few variants we've seen in the UI
-    if "pre-process" in k or "preprocess" in k:
-        return "pre"
-    if "calibration-config" in k:
-        return "cal_cfg"
-    if "calibration-run" in k:
-        return "cal_run"
-    if "teehr" in k:
-        return "teehr"
-    if ("ngiab" in k) and ("run" in k):
-        return "run"
-    return "other"
-
-def _allowed_parent(parent_tag: str, child_tag: str) -> bool:
-    # Stage-to-stage rules:
-    # pre -> cal_cfg -> cal_run -> run -> teehr
-    if child_tag == "cal_cfg":
-        return parent_tag == "pre"
-    if child_tag == "cal_run":
-        return parent_tag == "cal_cfg"
-    if child_tag == "run":
-        # run can take from cal_run, or (fallbacks) cal_cfg, pre
-        return parent_tag in ("cal_run", "cal_cfg", "pre")
-    if child_tag == "teehr":
-        return parent_tag == "run"
-    # default: no constraints
-    return True
+async def _iter_workflow_deltas(argo_wf_name: str, kinds=()):
+    """
+    Yield WorkflowDelta updates for ONE Argo Workflow until the caller stops iterating.
+      - stream mode: deltas come from the shared namespace event stream; we only
+        read the workflow directly when the stream has been quiet for
+        ARGO_WATCH_RESYNC_SEC (catches anything the stream missed).
+      - poll mode / stream down: deltas come from the namespace's bulk poller
+        (one labelled list_workflows call per tick for all watchers).
+    A failed read yields a delta with only `error` set; a quiet period yields an
+    empty delta. Either way callers get a chance to check their timeouts.
+    `kinds` (node kind tags) let the poll scheduler size this workflow's interval.
+    """
+    ws = make_ws()
+    stream = get_event_stream(ARGO_NAMESPACE) if ARGO_WATCH_MODE == "stream" else None
+    poller = get_bulk_poller(ARGO_NAMESPACE)
+    poller.track(argo_wf_name, kinds)
+    queue = stream.subscribe(argo_wf_name) if stream else None
+    poll_queue = None
+    resync_sec = ARGO_WATCH_RESYNC_SEC
+    try:
+        while True:
+            if stream is not None and stream.connected:
+                if poll_queue is not None:
+                    poller.unsubscribe(argo_wf_name, poll_queue)
+                    poll_queue = None
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=resync_sec)
+                    continue
+                except asyncio.TimeoutError:
+                    pass  # quiet stream: resync with one direct read
+                try:
+                    wf = await argo_call(ws.get_workflow, argo_wf_name, ARGO_NAMESPACE)
+                except ArgoUnavailable:
+                    yield WorkflowDelta(argo_wf_name)  # circuit open: keep the cached status
+                    continue
+                except NotFound:
+                    yield WorkflowDelta(argo_wf_name, deleted=True)
+                    continue
+                except Exception as e:
+                    # back off (with jitter) instead of retrying at a fixed rate
+                    resync_sec = poller.scheduler.failed(argo_wf_name)
+                    yield WorkflowDelta(argo_wf_name, error=str(e))
+                    continue
+                resync_sec = ARGO_WATCH_RESYNC_SEC
+                yield delta_from_workflow(wf)
+                continue
 
-def _parent_preference_order(tag: str) -> int:
-    # Smaller number == stronger preference when multiple valid parents exist
-    # Used only for the 'run' stage to choose cal_run over cal_cfg over pre
-    order = {"cal_run": 0, "cal_cfg": 1, "pre": 2, "run": 0, "other": 9}
-    return order.get(tag, 9)
-
-def _normalize_edges(edges_in) -> list[tuple[str, str]]:
-    """Accept either [{'source': 'a', 'target': 'b'}, ...] or [('a','b'), ...]."""
-    out: list[tuple[str, str]] = []
-    for e in edges_in or []:
-        if isinstance(e, dict):
-            s, t = e.get("source"), e.get("target")
-        elif isinstance(e, (list, tuple)) and len(e) >= 2:
-            s, t = e[0], e[1]
-        else:
-            continue
-        if s is not None and t is not None:
-            out.append((str(s), str(t)))
-    return out
-
-def _topo_layers(nodes: list[dict], edges: list) -> list[list[str]]:
-    """Topological layering; edges can be normalized tuples or dicts."""
-    # normalize edges first
-    e2 = _normalize_edges(edges)
-    ids = [str(n["id"]) for n in nodes]
-    indeg = {i: 0 for i in ids}
-    adj = {i: [] for i in ids}
-    for (s, t) in e2:
-        if s in adj and t in indeg:
-            adj[s].append(t)
-            indeg[t] += 1
-    layers, frontier = [], [i for i in ids if indeg[i] == 0]
-    seen = set()
-    while frontier:
-        layers.append(frontier[:])
-        seen.update(frontier)
-        nxt = []
-        for u in frontier:
-            for v in adj[u]:
-                indeg[v] -= 1
-                if indeg[v] == 0 and v not in seen:
-                    nxt.append(v)
-        frontier = nxt
-    # Any nodes not reached (e.g. cyclic or isolated) go into a last layer
-    if len(seen) != len(ids):
-        layers.append([i for i in ids if i not in seen])
-    return layers
+            if poll_queue is None:
+                poll_queue = poller.subscribe(argo_wf_name)
+            try:
+                yield await asyncio.wait_for(poll_queue.get(), timeout=ARGO_WATCH_RESYNC_SEC)
+            except asyncio.TimeoutError:
+                yield WorkflowDelta(argo_wf_name)
+    finally:
+        if queue is not None:
+            stream.unsubscribe(argo_wf_name, queue)
+        if poll_queue is not None:
+            poller.unsubscribe(argo_wf_name, poll_queue)
+        if argo_wf_name not in poller.names():
+            poller.scheduler.forget(argo_wf_name)
 
 
 async def _watch_workflow_nodes(
-    self,
+    publisher: "_WorkflowStatusPublisher",
     argo_wf_name: str,
     tasks_by_node: dict[str, list[str]],  # {ui_node_id: [tname, ...]}
     datasets_by_node: dict[str, list[dict]],
     wf_id,
+    kinds=(),
 ) -> None:
     """
     Watch ONE Argo Workflow and fan-out granular node status to the UI:
@@ -150,154 +143,119 @@ async def _watch_workflow_nodes(
       - error   => ANY expected task Failed/Error/Terminated.
       - running => otherwise (including when downstream tasks haven't appeared yet).
     If ANY node errors, mark all non-terminal siblings "error" (upstream failure).
-    Emit the S3 URL once the aggregate becomes success.
+    A deleted Argo Workflow, or one that ended with nodes still unfinished, fails
+    those nodes the same way. Emit the S3 URL once the aggregate becomes success.
+    Runs once per Argo Workflow per process; frames go to every follower of the
+    workflow through `publisher` (see _WorkflowStatusPublisher).
     """
-    ws = make_ws()
-    loop = asyncio.get_running_loop()
     start = time.monotonic()
 
-    # Canonicalize expected names and provide a resolver for "<dag>.<task>"
-    expected_by_node: dict[str, set[str]] = {k: set(v or []) for k, v in tasks_by_node.items()}
+    # Compiled once: Argo node name ("t-...", "<dag>.t-...") -> UI node, with incremental status
+    attribution = TaskAttribution(tasks_by_node, workflow_name=argo_wf_name)
     recorded_outputs: dict[str, set[str]] = defaultdict(set)
 
-    def match_task(node_name: str, expected: set[str]) -> str | None:
-        if node_name in expected:
-            return node_name
-        # DAG tasks typically show as "main.<task>" in NodeStatus.name
-        # Only accept exact "<dag>.<task>" matches to avoid cross-node leaks.
-        dot = node_name.find(".")
-        if dot > 0:
-            tail = node_name[dot + 1 :]
-            if tail in expected:
-                return tail
-        return None
-
     last_sent: dict[str, str] = {}  # ui_node_id -> last ui status
-    all_nodes = set(expected_by_node.keys())
+    all_nodes = set(attribution.nodes())
+    first_tick = True
+
+    async for delta in _iter_workflow_deltas(argo_wf_name, kinds):
+        if time.monotonic() - start > POLL_TIMEOUT_SEC:
+            # timeout every non-terminal node
+            batch = _NodeStatusBatch(wf_id)
+            for ui_node_id in all_nodes:
+                if last_sent.get(ui_node_id) not in {"success", "error"}:
+                    await _emit_status(publisher, ui_node_id, "error", "poll timeout")
+                    batch.set_status(ui_node_id, "error", "poll timeout")
+            SessionFactory = await publisher.get_sessionmaker()
+            async with SessionFactory() as session:
+                await batch.flush(session)
+            await publisher.flush_status()
+            return
+
+        if delta.deleted:
+            await _fail_unfinished(publisher, wf_id, "workflow deleted")
+            return
+        if delta.error is not None:
+            # Read errors are silent here; the stream/poller keeps retrying.
+            continue
 
-    while True:
         try:
-            wf = await loop.run_in_executor(None, ws.get_workflow, argo_wf_name, ARGO_NAMESPACE)
-            status = getattr(wf, "status", None)
-            nodes_map = getattr(status, "nodes", None) or {}
-            nodes_iter = nodes_map.values() if isinstance(nodes_map, dict) else (nodes_map or [])
-
-            # Build a quick index of phases keyed by expected task-name per UI node
-            phases_by_ui: dict[str, dict[str, str]] = {k: {} for k in expected_by_node}
-            for n in nodes_iter:
-                nm = getattr(n, "name", None) or (isinstance(n, dict) and n.get("name"))
-                ph = getattr(n, "phase", None) or (isinstance(n, dict) and n.get("phase"))
-                if not nm or not ph:
-                    continue
-                nm = str(nm); ph = str(ph)
-                for ui_node_id, expected in expected_by_node.items():
-                    t = match_task(nm, expected)
-                    if t:
-                        phases_by_ui[ui_node_id][t] = ph
+            # Only UI nodes whose task phases changed need a new status
+            changed = attribution.apply(delta.nodes) if delta.nodes else set()
+            if first_tick and delta.nodes:
+                changed |= all_nodes
+                first_tick = False
+            if not changed:
+                if delta.phase in _TERMINAL:
+                    # ended without (further) news about our tasks: nothing will finish them now
+                    await _fail_unfinished(publisher, wf_id, f"argo: {delta.phase}")
+                    return
+                continue
 
-            # Compute & emit statuses per UI node
+            # Compute & emit statuses for the changed UI nodes; persist them as ONE batch
+            batch = _NodeStatusBatch(wf_id)
             someone_failed = False
-            for ui_node_id, expected in expected_by_node.items():
-                collected = list(phases_by_ui[ui_node_id].values())
-                if any(p in {"Failed", "Error", "Terminated"} for p in collected):
-                    ui = "error"
+            for ui_node_id in changed:
+                ui = attribution.status(ui_node_id)
+                if ui == "error":
                     someone_failed = True
-                elif expected and (len(phases_by_ui[ui_node_id]) == len(expected)) and all(p == "Succeeded" for p in collected):
-                    ui = "success"
-                else:
-                    ui = "running"
 
                 if last_sent.get(ui_node_id) != ui:
                     last_sent[ui_node_id] = ui
-                    await _emit_status(self, ui_node_id, ui, ui)
-                    SessionFactory = await self.get_sessionmaker()
-                    async with SessionFactory() as session:
-                        await _update_node_db(session, wf_id, ui_node_id, ui, ui)
-                        if ui == "success":
-                            node = await _get_node_by_name(session, wf_id, ui_node_id)
-                            if node:
-                                pointers = datasets_by_node.get(ui_node_id) or []
-                                if not pointers:
-                                    user = _user_id(self)
-                                    pointers = [{
-                                        "dataset_bucket": _bucket(),
-                                        "dataset_key": f"{user}/{wf_id}/{argo_wf_name}/{ui_node_id}",
-                                        "dataset_prefix": f"{user}/{wf_id}/{argo_wf_name}/{ui_node_id}/",
-                                    }]
-
-                                for ptr in pointers:
-                                    bucket = ptr.get("dataset_bucket") or _bucket()
-                                    key = _resolve_workflow_name_placeholder(ptr.get("dataset_key"), argo_wf_name).lstrip("/")
-                                    prefix_hint = _resolve_workflow_name_placeholder(ptr.get("dataset_prefix"), argo_wf_name).lstrip("/")
-
-                                    if not key and not prefix_hint:
-                                        continue
-
-                                    normalized = key if key else prefix_hint.rstrip("/") + "/"
-                                    if normalized in recorded_outputs[ui_node_id]:
-                                        continue
-
-                                    extra_info = {
-                                        "workflow_id": str(wf_id),
-                                        "node_name": ui_node_id,
-                                        "argo_workflow": argo_wf_name,
-                                        "task": ptr.get("task"),
-                                    }
-                                    if prefix_hint:
-                                        extra_info["dataset_prefix"] = prefix_hint.rstrip("/") + "/"
-
-                                    await _record_virtual_output(
-                                        session,
-                                        node,
-                                        bucket,
-                                        normalized,
-                                        extra=extra_info,
-                                    )
-                                    recorded_outputs[ui_node_id].add(normalized)
-
-            # If a node failed, fail all non-terminal siblings once and stop.
+                    await _emit_status(publisher, ui_node_id, ui, ui)
+                    batch.set_status(ui_node_id, ui, ui)
+                    if ui == "success":
+                        batch.add_node_outputs(
+                            ui_node_id, datasets_by_node.get(ui_node_id), publisher.user, argo_wf_name,
+                            seen=recorded_outputs[ui_node_id],
+                        )
+
+            # If a node failed, fail all non-terminal siblings (same transaction) and stop.
             if someone_failed:
-                SessionFactory = await self.get_sessionmaker()
-                async with SessionFactory() as session:
-                    rows = (await session.execute(
-                        select(NodeModel).where(NodeModel.workflow_id == wf_id)
-                    )).scalars().all()
-                    for row in rows:
-                        if last_sent.get(row.name) not in {"success", "error"}:
-                            await _emit_status(self, row.name, "error", "upstream failure")
-                            await _update_node_db(session, wf_id, row.name, "error", "upstream failure")
-                    await _recompute_workflow_status(session, wf_id)
-                return
+                batch.fail_remaining("upstream failure")
 
-            # Recompute aggregate; if all succeeded, announce S3 & stop.
-            SessionFactory = await self.get_sessionmaker()
+            SessionFactory = await publisher.get_sessionmaker()
             async with SessionFactory() as session:
-                agg = await _recompute_workflow_status(session, wf_id)
-                if agg == "success":
-                    user = _user_id(self)
-                    bucket = _bucket()
-                    s3url = f"s3://{bucket}/{user}/{wf_id}/"
-                    await self.send_action(BackendActions.WORKFLOW_RESULT, {
-                        "workflowId": str(wf_id), "s3url": s3url
-                    })
-                    return
+                agg = await batch.flush(session)
 
-        except Exception as e:
-            # Keep polling unless we time out; do NOT flip others to success.
-            # We can still emit "running" to the node that last changed if desired,
-            # but silence is fine here to avoid noise.
-            if time.monotonic() - start > POLL_TIMEOUT_SEC:
-                # timeout every non-terminal node
-                SessionFactory = await self.get_sessionmaker()
-                async with SessionFactory() as session:
-                    for ui_node_id in all_nodes:
-                        if last_sent.get(ui_node_id) not in {"success", "error"}:
-                            await _emit_status(self, ui_node_id, "error", "poll timeout")
-                            await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
+            if someone_failed:
+                for name in batch.upstream_failed:
+                    last_sent[name] = "error"
+                    await _emit_status(publisher, name, "error", "upstream failure")
+                await publisher.flush_status()
                 return
 
-        await asyncio.sleep(POLL_SEC)
+            # If all succeeded, announce S3 & stop.
+            if agg == "success":
+                await publisher.flush_status()  # node frames before the result toast
+                user = publisher.user
+                bucket = _bucket()
+                s3url = f"s3://{bucket}/{user}/{wf_id}/"
+                await publisher.send_action(BackendActions.WORKFLOW_RESULT, {
+                    "workflowId": str(wf_id), "s3url": s3url
+                })
+                return
+
+            if delta.phase in _TERMINAL:
+                await publisher.flush_status()
+                await _fail_unfinished(publisher, wf_id, f"argo: {delta.phase}")
+                return
+
+        except Exception:
+            # Keep watching unless we time out; do NOT flip others to success.
+            log.exception("[watch] %s: failed to apply status update", argo_wf_name)
+
 
+async def _fail_unfinished(publisher: "_WorkflowStatusPublisher", wf_id, message: str) -> None:
+    """Mark every node row that is not success/error as error (one transaction) and tell the UI."""
+    batch = _NodeStatusBatch(wf_id)
+    batch.fail_remaining(message)
+    SessionFactory = await publisher.get_sessionmaker()
+    async with SessionFactory() as session:
+        await batch.flush(session)
+    for name in batch.upstream_failed:
+        await _emit_status(publisher, name, "error", message)
+    await publisher.flush_status()
 
 
 async def _set_workflow_status(session: AsyncSession, wf_id, status: str, touch_last_run: bool = False):
@@ -308,32 +266,151 @@ async def _set_workflow_status(session: AsyncSession, wf_id, status: str, touch_
             wf.last_run_at = datetime.now(timezone.utc)
         await session.commit()
 
-async def _recompute_workflow_status(session: AsyncSession, wf_id):
-    rows = (await session.execute(select(NodeModel.status).where(NodeModel.workflow_id == wf_id))).all()
-    statuses = {r[0] for r in rows}
-    if not statuses:
-        return None
-    if "error" in statuses:
-        await _set_workflow_status(session, wf_id, "error", touch_last_run=True)
-        return "error"
-    elif statuses.issubset({"success"}):
-        await _set_workflow_status(session, wf_id, "success", touch_last_run=True)
-        return "success"
-    else:
-        await _set_workflow_status(session, wf_id, "running")
-        return "running"
+
+def _aggregate_status_sql(wf_id):
+    """Scalar subquery: error if any node errored, success if all succeeded, else running (NULL w/o nodes)."""
+    return (
+        select(
+            case(
+                (func.count(NodeModel.id) == 0, None),
+                (func.bool_or(NodeModel.status == "error"), "error"),
+                (func.bool_and(NodeModel.status == "success"), "success"),
+                else_="running",
+            )
+        )
+        .where(NodeModel.workflow_id == wf_id)
+        .scalar_subquery()
+    )
 
 
-async def _record_virtual_output(
-    session: AsyncSession,
-    node: NodeModel,
-    bucket: str,
-    prefix: str,
-    extra: dict | None = None,
-):
-    if not bucket or not prefix:
-        return
+class _NodeStatusBatch:
+    """
+    Node transitions (and virtual outputs) collected during one watcher tick,
+    written in ONE transaction:
+      - a single bulk UPDATE of the node rows (CASE on node name),
+      - optionally "fail every non-terminal node" as one more UPDATE,
+      - the aggregate workflow status recomputed in SQL.
+    Cancelled rows are never overwritten (late watcher ticks of a terminated run).
+    """
+
+    def __init__(self, wf_id):
+        self.wf_id = wf_id
+        self._status: dict[str, tuple[str, str]] = {}
+        self._outputs: list[tuple[str, str, str, dict]] = []
+        self._fail_message: str | None = None
+        self.upstream_failed: list[str] = []
+
+    def set_status(self, node_name: str, status: str, message: str = "") -> None:
+        self._status[node_name] = (status, message)
+
+    def add_output(self, node_name: str, bucket: str, prefix: str, extra: dict | None = None) -> None:
+        if bucket and prefix:
+            self._outputs.append((node_name, bucket, prefix, extra or {}))
+
+    def add_node_outputs(self, node_name: str, pointers, user: str, argo_wf_name: str, seen: set | None = None) -> None:
+        """Queue the VirtualOutputs of a node that just succeeded (default S3 prefix when it declared none)."""
+        seen = seen if seen is not None else set()
+        if not pointers:
+            pointers = [{
+                "dataset_bucket": _bucket(),
+                "dataset_key": f"{user}/{self.wf_id}/{argo_wf_name}/{node_name}",
+                "dataset_prefix": f"{user}/{self.wf_id}/{argo_wf_name}/{node_name}/",
+            }]
+
+        for ptr in pointers:
+            bucket = ptr.get("dataset_bucket") or _bucket()
+            key = _resolve_workflow_name_placeholder(ptr.get("dataset_key"), argo_wf_name).lstrip("/")
+            prefix_hint = _resolve_workflow_name_placeholder(ptr.get("dataset_prefix"), argo_wf_name).lstrip("/")
+
+            if not key and not prefix_hint:
+                continue
+
+            normalized = key if key else prefix_hint.rstrip("/") + "/"
+            if normalized in seen:
+                continue
+
+            extra_info = {
+                "workflow_id": str(self.wf_id),
+                "node_name": node_name,
+                "argo_workflow": argo_wf_name,
+                "task": ptr.get("task"),
+            }
+            if ptr.get("cache_key"):
+                extra_info["cache_key"] = ptr["cache_key"]  # memo lookups (ngiab_compiler._cache_key)
+            if ptr.get("reused"):
+                extra_info["reused"] = True
+            if prefix_hint:
+                extra_info["dataset_prefix"] = prefix_hint.rstrip("/") + "/"
+
+            self.add_output(node_name, bucket, normalized, extra=extra_info)
+            seen.add(normalized)
+
+    def fail_remaining(self, message: str) -> None:
+        """Also mark every node that is not success/error (after this batch) as error."""
+        self._fail_message = message
+
+    def __bool__(self) -> bool:
+        return bool(self._status or self._outputs or self._fail_message)
+
+    async def flush(self, session: AsyncSession) -> str | None:
+        """Write the batch and commit; returns the aggregate workflow status."""
+        now = datetime.now(timezone.utc)
+        if self._status:
+            names = list(self._status)
+            await session.execute(
+                update(NodeModel)
+                .where(
+                    NodeModel.workflow_id == self.wf_id,
+                    NodeModel.name.in_(names),
+                    or_(NodeModel.status.is_distinct_from("error"), NodeModel.message.is_distinct_from(CANCELLED)),
+                )
+                .values(
+                    status=case({n: st for n, (st, _) in self._status.items()}, value=NodeModel.name),
+                    message=case({n: msg for n, (_, msg) in self._status.items()}, value=NodeModel.name),
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+        if self._fail_message is not None:
+            failed = await session.execute(
+                update(NodeModel)
+                .where(NodeModel.workflow_id == self.wf_id, NodeModel.status.notin_(["success", "error"]))
+                .values(status="error", message=self._fail_message, updated_at=now)
+                .returning(NodeModel.name)
+                .execution_options(synchronize_session=False)
+            )
+            self.upstream_failed = [r[0] for r in failed.all()]
+
+        if self._outputs:
+            wanted = {name for name, _, _, _ in self._outputs}
+            ids = dict((await session.execute(
+                select(NodeModel.name, NodeModel.id)
+                .where(NodeModel.workflow_id == self.wf_id, NodeModel.name.in_(wanted))
+            )).all())
+            session.add_all(
+                _virtual_output_row(ids[name], name, bucket, prefix, extra)
+                for name, bucket, prefix, extra in self._outputs
+                if name in ids
+            )
+
+        agg = _aggregate_status_sql(self.wf_id)
+        result = await session.execute(
+            update(WFModel)
+            .where(WFModel.id == self.wf_id, agg.isnot(None))
+            .values(
+                status=agg,
+                last_run_at=case((agg.in_(["success", "error"]), now), else_=WFModel.last_run_at),
+            )
+            .returning(WFModel.status)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        await session.commit()
+        return row[0] if row else None
 
+
+def _virtual_output_row(node_id, node_name: str, bucket: str, prefix: str, extra: dict | None = None) -> VOModel:
     sanitized = (prefix or "").lstrip("/")
     if sanitized.endswith("/"):
         normalized_key = sanitized.rstrip("/") + "/"
@@ -342,17 +419,48 @@ async def _record_virtual_output(
         normalized_key = sanitized
         uri = f"s3://{bucket}/{normalized_key}"
 
-    vo = VOModel(
-        node_id=node.id,
-        name=node.name,
+    return VOModel(
+        node_id=node_id,
+        name=node_name,
         storage_scheme="s3",
         bucket=bucket,
         object_key=normalized_key,
         uri=uri,
         extra=extra or {},
     )
-    session.add(vo)
-    await session.commit()
+
+
+async def _memo_outputs(session: AsyncSession, user: str, keys=None, workflow_id=None) -> dict[str, tuple[str, str]]:
+    """{cache_key: (bucket, object_key)} of the user's recorded outputs, by key and/or workflow; newest wins."""
+    if keys is not None and not keys:
+        return {}
+    cache_key = VOModel.extra["cache_key"].as_string()
+    stmt = (
+        select(cache_key, VOModel.bucket, VOModel.object_key)
+        .join(NodeModel, NodeModel.id == VOModel.node_id)
+        .where(NodeModel.user == user, cache_key.isnot(None))
+        .order_by(VOModel.created_at)
+    )
+    if keys is not None:
+        stmt = stmt.where(cache_key.in_(list(keys)))
+    if workflow_id is not None:
+        stmt = stmt.where(NodeModel.workflow_id == workflow_id)
+    return {key: (bucket, obj) for key, bucket, obj in (await session.execute(stmt)).all() if bucket and obj}
+
+
+async def _recorded_outputs(session: AsyncSession, wf_id) -> dict[str, list[tuple[str, str, str]]]:
+    """{node name: [(bucket, object_key, cache_key), ...]} of the workflow's successful nodes, in recording order."""
+    stmt = (
+        select(NodeModel.name, VOModel.bucket, VOModel.object_key, VOModel.extra["cache_key"].as_string())
+        .join(VOModel, VOModel.node_id == NodeModel.id)
+        .where(NodeModel.workflow_id == wf_id, NodeModel.status == "success")
+        .order_by(VOModel.created_at)
+    )
+    recorded: dict[str, list[tuple[str, str, str]]] = defaultdict(list)
+    for name, bucket, obj, key in (await session.execute(stmt)).all():
+        if bucket and obj:
+            recorded[name].append((bucket, obj, key or ""))
+    return dict(recorded)
 
 
 async def _store_runtime_metadata(
@@ -400,13 +508,6 @@ async def _store_runtime_metadata(
         await session.commit()
 
 
-async def _get_node_by_name(session: AsyncSession, wf_id, node_name: str) -> NodeModel | None:
-    return (
-        await session.execute(
-            select(NodeModel).where(NodeModel.workflow_id == wf_id, NodeModel.name == node_name)
-        )
-    ).scalar_one_or_none()
-
 def _phase_to_ui(phase: str | None) -> str:
     p = (phase or "").strip() or "Pending"
     if p == "Succeeded":
@@ -415,55 +516,12 @@ def _phase_to_ui(phase: str | None) -> str:
         return "error"
     return "running"
 
-def make_ws() -> WorkflowsService:
-    global_config.host = ARGO_HOST
-    global_config.token = ARGO_TOKEN
-    global_config.namespace = ARGO_NAMESPACE
-    global_config.verify_ssl = ARGO_VERIFY_SSL
-    return WorkflowsService(
-        host=ARGO_HOST,
-        token=ARGO_TOKEN,
-        namespace=ARGO_NAMESPACE,
-        verify_ssl=ARGO_VERIFY_SSL,
-    )
-
 # ---------- template upsert helpers ----------
-def _load_template_yaml_text(name: str) -> str:
-    pkg = "tethysapp.flowforge.consumers.templates"
-    filename = _TEMPLATE_FILES.get(name)
-    if not filename:
-        raise ValueError(f"No YAML file mapped for template '{name}'")
-    with resources.files(pkg).joinpath(filename).open("r", encoding="utf-8") as f:
-        return f.read()
-
 def _ensure_template_exists_or_create(name: str) -> None:
-    ws = make_ws()
+    """Blocking; a template verified within the cache TTL costs no Argo round trip (argo/templates.py)."""
     try:
-        exists = True
-        try:
-            ws.get_workflow_template(name=name, namespace=ARGO_NAMESPACE)
-        except Exception:
-            exists = False
-
-        if exists and not ARGO_FORCE_TEMPLATE_UPDATE:
-            return
-
-        if exists and ARGO_FORCE_TEMPLATE_UPDATE:
-            try:
-                ws.delete_workflow_template(name=name, namespace=ARGO_NAMESPACE)
-                log.info("Deleted existing WorkflowTemplate '%s' for update.", name)
-            except Exception as e:
-                log.warning("Could not delete WorkflowTemplate '%s': %s", name, e)
-
-        yaml_text = _load_template_yaml_text(name)
-        wt = WorkflowTemplate.from_yaml(yaml_text)
-        wt.create()
-        log.info("Created/updated WorkflowTemplate '%s'.", name)
+        templates.ensure(name)
     except Exception as e:
-        msg = str(e)
-        if "already exists" in msg or "409" in msg:
-            log.info("Template '%s' exists (409), continuing.", name)
-            return
         raise ValueError(
             f"Template check failed: Could not verify or create WorkflowTemplate "
             f"'{name}' in namespace '{ARGO_NAMESPACE}': {e}"
@@ -473,19 +531,25 @@ def _ensure_template_exists_or_create(name: str) -> None:
 def _has_edge(edges: List[dict], src: str, dst: str) -> bool:
     return any(e.get("source") == src and e.get("target") == dst for e in (edges or []))
 
-# ---------- S3 helpers ----------
-def _parse_s3_url(u: str) -> Tuple[str, str]:
-    """Return (bucket, key) for s3://bucket/key...; raises ValueError if malformed."""
-    u = (u or "").strip()
-    if not u.startswith("s3://"):
-        raise ValueError("not an s3:// URL")
-    rest = u[5:]
-    i = rest.find("/")
-    if i <= 0:
-        raise ValueError("missing key")
-    return rest[:i], rest[i + 1 :].lstrip("/")
-
 # ---------- parameter builders ----------
+def _adhoc_config(cfg: dict) -> dict:
+    """Normalize the S3 inputs of a node run on its own (no upstream node feeds it)."""
+    if "input_s3_url" in cfg and (("input_bucket" not in cfg) or ("input_key" not in cfg)):
+        try:
+            b, k = _parse_s3_url(str(cfg["input_s3_url"]))
+            cfg.setdefault("input_bucket", b)
+            cfg.setdefault("input_key", k.lstrip("/"))
+            cfg.setdefault("input_s3_key", k.lstrip("/"))
+        except Exception:
+            pass
+    if "input_key" in cfg and isinstance(cfg["input_key"], str):
+        cfg["input_key"] = cfg["input_key"].lstrip("/")
+
+    if "input_s3_key" in cfg and isinstance(cfg["input_s3_key"], str):
+        cfg["input_s3_key"] = cfg["input_s3_key"].lstrip("/")
+    return cfg
+
+
 def _user_id(handler: MBH) -> str:
     u = handler.backend_consumer.scope.get("user")
     return getattr(u, "username", "anonymous")
@@ -493,195 +557,171 @@ def _user_id(handler: MBH) -> str:
 def _run_id() -> str:
     return datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
 
-def _bucket() -> str:
-    return os.getenv("NGIAB_S3_BUCKET", "test-ngen")
-
-def _kind_to_template(kind: str, mode: str = "real") -> str:
-    """Map UI node kind to a WorkflowTemplate name for the selected mode."""
-    mode = (mode or "real").lower()
-    # Real templates (provided)
-    REAL = {
-        "pre-process":        "ngiab-data-preprocess",
-        "preprocess":         "ngiab-data-preprocess",
-        "calibration-config": "ngiab-calibration-config",
-        "calibration-run":    "ngiab-calibration-run",
-        "run ngiab":          "ngiab-run",
-        "teehr":              "ngiab-teehr",
-        "default":            "ngiab-run",
-    }
-    # Dummy templates (adjust names to your cluster if different)
-    DUMMY = {
-        "pre-process":        "dummy-preprocess",
-        "preprocess":         "dummy-preprocess",
-        "calibration-config": "dummy-calibration-config",
-        "calibration-run":    "dummy-calibration-run",
-        "run ngiab":          "dummy-run",
-        "teehr":              "dummy-teehr",
-        "default":            "dummy-run",
+# ---------- status helpers ----------
+class _WorkflowStatusPublisher:
+    """
+    Handler-shaped sink for process-wide watchers: frames go to the workflow's
+    channel-layer group (every consumer following it) instead of one socket,
+    or to one consumer's ``channel`` when given (ad-hoc node runs).
+    """
+
+    def __init__(self, wf_id, user: str, channel: str | None = None):
+        self.wf_id = wf_id
+        self.user = user
+        self.channel = channel
+        self._pending: dict[str, dict] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    def queue_status(self, node_id: str, status: str, message: str = "") -> None:
+        """Buffer a transition; the debounce window coalesces them into one frame (latest per node wins)."""
+        self._pending.pop(node_id, None)
+        self._pending[node_id] = {"nodeId": node_id, "status": status, "message": message}
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(STATUS_BATCH_DEBOUNCE_SEC)
+        self._flush_task = None
+        await self.flush_status()
+
+    async def flush_status(self) -> None:
+        """Send everything buffered now as one NODE_STATUS_BATCH frame."""
+        task, self._flush_task = self._flush_task, None
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        if not self._pending:
+            return
+        items, self._pending = list(self._pending.values()), {}
+        await self.send_action(BackendActions.NODE_STATUS_BATCH, {"workflowId": str(self.wf_id), "items": items})
+
+    async def send_action(self, action: BackendActions | str, payload: dict) -> None:
+        action_type = action.name if isinstance(action, BackendActions) else str(action)
+        message = {
+            "type": "flowforge.relay",
+            "action": action_type,
+            # channel layers only carry plain types (no UUIDs/datetimes)
+            "payload": json.loads(json.dumps(payload, default=str)),
+        }
+        layer = get_channel_layer(App.package)
+        if self.channel:
+            await layer.send(self.channel, message)
+        else:
+            await layer.group_send(workflow_group(self.wf_id), message)
+
+    async def get_sessionmaker(self):
+        return await get_async_sessionmaker()
+
+def watch_spec(
+    argo_wf_name: str, tasks_by_node, datasets_by_node, wf_id, user: str, kinds=(), channel=None, phase_node=None,
+) -> dict:
+    """
+    Everything a watcher needs, as plain JSON (it may cross the channel layer).
+    ``channel`` sends its frames to that one consumer instead of the workflow group (ad-hoc runs);
+    ``phase_node`` follows a single-node (templateRef) Workflow by its phase, for that UI node.
+    """
+    spec = {
+        "argo_workflow": argo_wf_name,
+        "workflow_id": str(wf_id),
+        "user": user,
+        "tasks": tasks_by_node or {},
+        "datasets": datasets_by_node or {},
+        "kinds": sorted(kinds or ()),
     }
-    table = REAL if mode == "real" else DUMMY
-    k = (kind or "").lower()
-    for key, tpl in table.items():
-        if key != "default" and key in k:
-            return tpl
-    return table["default"]
-
-def _job_root_prefix(user: str, wf_uuid: str) -> str:
-    # user/<workflow-uuid>/<argo-job-name>
-    # NOTE: {{workflow.name}} is resolved by Argo at runtime.
-    return f"{user}/{wf_uuid}/{{{{workflow.name}}}}"
-
-
-def _resolve_workflow_name_placeholder(value: str | None, argo_wf_name: str) -> str:
-    if not value:
-        return ""
-    return (
-        str(value)
-        .replace("{{workflow.name}}", argo_wf_name)
-        .replace("{{ workflow.name }}", argo_wf_name)
-    )
+    if channel:
+        spec["reply_to"] = channel
+    if phase_node:
+        spec["phase_node"] = phase_node
+    return json.loads(json.dumps(spec, default=str))
 
 
-def _params_for(
-    kind: str,
-    cfg: Dict[str, Any],
-    user: str,
-    wf_uuid: str,                 # <-- CHANGED: pass workflow UUID instead of run_id for paths
-    last_in_chain: bool,
-    upstream_key: Optional[str],
-    upstream_bucket: Optional[str] = None,
-) -> Dict[str, str]:
-    bucket = _bucket()
-
-    # Base output path = user/<wf-uuid>/<argo-job-name>
-    out_prefix = _job_root_prefix(user, wf_uuid)
-    final_prefix = ""             # <- requirement #3: no more /Run/Final/
-
-    k = (kind or "").lower()
-
-    if "pre-process" in k or "preprocess" in k:
-        return {
-            "output_bucket": str(cfg.get("output_bucket") or bucket),
-            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
-            "selector_type": str(cfg.get("selector_type") or "gage"),
-            "selector_value": str(cfg.get("selector_value") or "01359139"),
-            "vpu": str(cfg.get("vpu") or ""),
-            "start_date": str(cfg.get("start_date") or "2020-01-01"),
-            "end_date": str(cfg.get("end_date") or "2020-01-15"),
-            "output_name": str(cfg.get("output_name") or "ngiab"),
-            "source": str(cfg.get("source") or "nwm"),
-            "debug": str(cfg.get("debug") or "false"),
-            "all": str(cfg.get("all") or "false"),
-            "subset": str(cfg.get("subset") or "true"),
-            "forcings": str(cfg.get("forcings") or "true"),
-            "realization": str(cfg.get("realization") or "true"),
-            "run": str(cfg.get("run") or "false"),
-            "validate": str(cfg.get("validate") or "false"),
-        }
+def start_status_watcher(spec: dict) -> bool:
+    """
+    Run the watcher described by `spec` in this process unless one already runs; True if started.
+    With WATCHER_LEADERSHIP=advisory only the replica holding the workflow's
+    advisory lock actually watches; the others stand by (see consumers/leadership.py).
+    """
+    wf_id = UUID(str(spec["workflow_id"]))
+    argo_wf_name = spec["argo_workflow"]
+    publisher = _WorkflowStatusPublisher(wf_id, spec.get("user") or "", channel=spec.get("reply_to"))
+
+    def body():
+        if spec.get("phase_node"):
+            return _watch_workflow_phase(publisher, argo_wf_name, spec["phase_node"], wf_id)
+        return _watch_workflow_nodes(
+            publisher, argo_wf_name, spec.get("tasks") or {}, spec.get("datasets") or {}, wf_id, spec.get("kinds") or (),
+        )
 
-    if "calibration-config" in k:
-        ibucket = str(cfg.get("input_bucket") or bucket)
-        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
-        if not ikey and cfg.get("input_s3_url"):
-            try:
-                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
-            except Exception:
-                pass
-        ikey = ikey.lstrip("/")
-        return {
-            "output_bucket": str(cfg.get("output_bucket") or bucket),
-            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
-            "final_prefix": final_prefix,
-            "input_bucket": ibucket,
-            "input_key": ikey,
-            "input_s3_key": ikey,
-            "input_s3_url": str(cfg.get("input_s3_url") or ""),
-            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
-            "gage": str(cfg.get("gage") or cfg.get("selector_value") or "01359139"),
-            "iterations": str(cfg.get("iterations") or "100"),
-            "warmup": str(cfg.get("warmup") or "365"),
-            "calibration_ratio": str(cfg.get("calibration_ratio") or "0.5"),
-            "force": str(cfg.get("force") or "false"),
-            "debug": str(cfg.get("debug") or "false"),
-            "vpu": str(cfg.get("vpu") or ""),
-        }
+    async def still_active() -> bool:
+        SessionFactory = await get_async_sessionmaker()
+        async with SessionFactory() as session:
+            status = (await session.execute(
+                select(WFModel.status).where(WFModel.id == wf_id)
+            )).scalar_one_or_none()
+        return status in {"running", "queued"}
+
+    if WATCHER_LEADERSHIP == "advisory":
+        return watchers.ensure(argo_wf_name, lambda: run_as_leader(argo_wf_name, body, still_active))
+    return watchers.ensure(argo_wf_name, body)
+
+
+async def active_watch_specs(session: AsyncSession) -> list[dict]:
+    """watch_spec() for every running/queued workflow that has an Argo run and runtime task names."""
+    wfs = (await session.execute(
+        select(WFModel).where(WFModel.status.in_(["running", "queued"]))
+    )).scalars().all()
+    if not wfs:
+        return []
+    nodes = (await session.execute(
+        select(NodeModel).where(NodeModel.workflow_id.in_([wf.id for wf in wfs]))
+    )).scalars().all()
+    nodes_by_wf: dict = defaultdict(list)
+    for row in nodes:
+        nodes_by_wf[row.workflow_id].append(row)
+
+    specs = []
+    for wf in wfs:
+        spec = _runtime_watch_spec(wf, nodes_by_wf.get(wf.id) or [])
+        if spec is not None:
+            specs.append(spec)
+    return specs
+
+
+def _argo_workflow_name(wf: WFModel) -> str | None:
+    try:
+        return json.loads(wf.message or "{}").get("argo_workflow")
+    except Exception:
+        return None
 
-    if "calibration-run" in k:
-        ibucket = str(cfg.get("input_bucket") or bucket)
-        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
-        if not ikey and cfg.get("input_s3_url"):
-            try:
-                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
-            except Exception:
-                pass
-        ikey = ikey.lstrip("/")
-        return {
-            "output_bucket": str(cfg.get("output_bucket") or bucket),
-            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
-            "final_prefix": final_prefix,
-            "input_bucket": ibucket,
-            "input_key": ikey,
-            "input_s3_key": ikey,
-            "input_s3_url": str(cfg.get("input_s3_url") or ""),
-            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
-        }
 
-    if "run" in k and "ngiab" in k:
-        ibucket = str(cfg.get("input_bucket") or bucket)
-        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
-        if not ikey and cfg.get("input_s3_url"):
-            try:
-                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
-            except Exception:
-                pass
-        ikey = ikey.lstrip("/")
-        return {
-            "output_bucket": str(cfg.get("output_bucket") or bucket),
-            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
-            "final_prefix": final_prefix,
-            "input_bucket": ibucket,
-            "input_key": ikey,
-            "input_s3_url": str(cfg.get("input_s3_url") or ""),
-            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
-            "output_name": str(cfg.get("output_name") or "ngiab"),
-            "ngen_np": str(cfg.get("ngen_np") or "8"),
-            "image_ngen": str(cfg.get("image_ngen") or "awiciroh/ciroh-ngen-image:latest"),
-        }
-    if "teehr" in k:
-        # derive input bucket/key (from upstream pointer or provided fields)
-        ibucket = str(cfg.get("input_bucket") or bucket)
-        ikey = upstream_key or str(cfg.get("input_s3_key") or cfg.get("input_key") or "")
-        if (not ikey) and cfg.get("input_s3_url"):
-            try:
-                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"]))
-                ikey = _ikey
-            except Exception:
-                pass
-        ikey = ikey.lstrip("/")
-
-        subdir_default = "outputs"
-        if upstream_key and not str(upstream_key).endswith("outputs.tgz"):
-            subdir_default = f"{cfg.get('input_subdir') or 'ngiab'}/outputs"
-
-        return {
-            "output_bucket": str(cfg.get("output_bucket") or upstream_bucket or bucket),
-            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
-            "final_prefix": final_prefix,
-            "input_bucket": ibucket,
-            "input_s3_key": ikey,
-            "input_s3_url": str(cfg.get("input_s3_url") or ""),
-            "teehr_inputs_subdir": str(cfg.get("teehr_inputs_subdir") or subdir_default),  # <— updated default
-            "teehr_results_subdir": str(cfg.get("teehr_results_subdir") or "teehr"),
-            "teehr_args": str(cfg.get("teehr_args") or ""),
-            "image_teehr": str(cfg.get("image_teehr") or "awiciroh/ngiab-teehr:x86"),
-        }
+def _forget_argo_run(wf: WFModel) -> None:
+    """Drop the previous run's Argo name, so nothing re-attaches to that run while the row waits in the queue."""
+    try:
+        metadata = json.loads(wf.message or "{}")
+    except Exception:
+        metadata = {}
+    metadata.pop("argo_workflow", None)
+    wf.message = json.dumps(metadata) if metadata else None
 
-    # teehr, default, etc.
-    return {"output_bucket": bucket, "output_prefix": out_prefix, "final_prefix": final_prefix}
+
+def _runtime_watch_spec(wf: WFModel, rows) -> dict | None:
+    """
+    watch_spec() from the stored runtime metadata, for the node rows that still have tasks
+    to follow (finished, reused or clean rows are left alone); None if there is nothing to watch.
+    """
+    argo_name = _argo_workflow_name(wf)
+    rows = [r for r in rows if r.status != "success" and ((r.config or {}).get("_runtime") or {}).get("tasks")]
+    if not argo_name or not rows:
+        return None
+    tasks = {r.name: r.config["_runtime"]["tasks"] for r in rows}
+    datasets = {r.name: r.config["_runtime"].get("datasets") or [] for r in rows}
+    kinds = {_kind_tag(r.kind or r.name) for r in rows}
+    return watch_spec(argo_name, tasks, datasets, wf.id, wf.user, kinds)
 
 
-# ---------- status helpers ----------
 async def _emit_status(handler: MBH, node_id: str, status: str, message: str = ""):
+    if isinstance(handler, _WorkflowStatusPublisher):
+        handler.queue_status(node_id, status, message)
+        return
     await handler.send_action(BackendActions.NODE_STATUS, {"nodeId": node_id, "status": status, "message": message})
 
 async def _update_node_db(session: AsyncSession, wf_id, node_name: str, status: str, message: str = ""):
@@ -696,36 +736,374 @@ async def _update_node_db(session: AsyncSession, wf_id, node_name: str, status:
         node.updated_at = datetime.now(timezone.utc)
         await session.commit()
 
+async def launch_watcher(
+    argo_wf_name: str,
+    tasks_by_node: dict[str, list[str]],
+    datasets_by_node: dict[str, list[dict]],
+    wf_id,
+    user: str,
+    kinds=(),
+    channel=None,
+    phase_node=None,
+) -> None:
+    """Make sure ONE watcher runs for the workflow: in this process, or (FLOWFORGE_WATCHER_MODE=daemon) in the daemon."""
+    await launch_watch_spec(watch_spec(argo_wf_name, tasks_by_node, datasets_by_node, wf_id, user, kinds, channel, phase_node))
+
+
+async def launch_watch_spec(spec: dict) -> None:
+    """launch_watcher() for an already built watch_spec()."""
+    if FLOWFORGE_WATCHER_MODE == "daemon":
+        await get_channel_layer(App.package).send(WATCHER_CHANNEL, {"type": "watch.start", **spec})
+        return
+    start_status_watcher(spec)
+
+
+async def _ensure_templates_for_nodes(nodes: List[dict], mode: str) -> None:
+    needed = {_kind_to_template((n.get("label") or n.get("id") or ""), mode) for n in nodes}
+    log.info("[DAG] ensure templates: %s", needed)
+    # one check per distinct template, concurrently, on the Argo pool
+    await asyncio.gather(*(
+        argo_call(_ensure_template_exists_or_create, tpl, priority=PRIORITY_TEMPLATE) for tpl in needed
+    ))
+
+
+async def _submit_chain(
+    job: SubmissionJob,
+    publisher: _WorkflowStatusPublisher,
+    chain_nodes: list[dict],
+    edges: list[dict],
+    user: str,
+    wf_id,
+    mode: str,
+    options: WorkflowOptions | None = None,
+    prior_outputs: dict[str, tuple[str, str]] | None = None,
+    pinned: dict[str, list[tuple[str, str, str]]] | None = None,
+    submission=None,
+) -> None:
+    """
+    Background stages of RUN_WORKFLOW:
+      prepare -> template sync (Argo pool) and DAG compile (LRU, else default executor) in parallel,
+                 with ``pinned`` (clean) nodes fed from their recorded outputs instead of run,
+                 then memo lookup: instances whose cache key has a recorded output are dropped
+      create  -> submit the Workflow, store runtime metadata, start the watcher
+    Failures mark every node still to run "error" in one transaction. The queued
+    ``submission`` row is claimed first (see _claim_submission); a cancel of it (from
+    any replica) stops the job before the create, or terminates the run right after it.
+    """
+    if not await _claim_submission(job, submission):
+        return
+    submission_id = submission.id if submission is not None else None
+    pinned = pinned or {}
+    node_ids = [nid for nid in (node.get("id") or (node.get("label") or "") for node in chain_nodes) if nid not in pinned]
+    loop = asyncio.get_running_loop()
+    try:
+        job.set_stage("prepare")
+        # Compile the DAG with fan-out semantics (cached per graph+config) while templates sync
+        _, compiled = await asyncio.gather(
+            _ensure_templates_for_nodes([n for n in chain_nodes if n.get("id") not in pinned], mode),
+            loop.run_in_executor(
+                None, functools.partial(compile_chain, chain_nodes, edges, mode, options, pinned=pinned),
+            ),
+        )
+        reuse = await _memo_hits(publisher, user, compiled.cache_keys(), prior_outputs)
+        if reuse:
+            compiled = await loop.run_in_executor(
+                None,
+                functools.partial(compile_chain, chain_nodes, edges, mode, options, reuse=reuse, pinned=pinned),
+            )
+            await _record_reused(publisher, wf_id, compiled.reused_by_node)
+            node_ids = [nid for nid in node_ids if nid not in compiled.reused_by_node]
+        if not compiled.has_tasks:
+            job.set_stage("submitted")  # everything was memoized: nothing to send to Argo
+            return
+        manifest, tasks_by_node, datasets_by_node = compiled.render(user, str(wf_id))
+
+        if await _submission_cancelled(job, submission_id):
+            return
+        job.set_stage("create")
+        argo_name = await argo_call(create_workflow, manifest, priority=PRIORITY_SUBMIT)
+        job.argo_workflow = argo_name
+        await _store_runtime_metadata(publisher, wf_id, argo_name, tasks_by_node, datasets_by_node)
+        if await _terminate_if_cancelled(job, submission_id, argo_name):
+            return
+        # mark the workflow row as running and set last_run_at
+        SessionFactory = await publisher.get_sessionmaker()
+        async with SessionFactory() as session:
+            await _set_workflow_status(session, wf_id, "running", touch_last_run=True)
+
+        # Notify the UI that this Argo Workflow name backs all nodes...
+        for node_id in node_ids:
+            await _emit_status(publisher, node_id, "running", f"argo: {argo_name}")
+        # ...then start ONE watcher that attributes phases to the right UI node
+        kinds = {_kind_tag(n.get("label") or n.get("id") or "") for n in chain_nodes}
+        await launch_watcher(argo_name, tasks_by_node, datasets_by_node, wf_id, user, kinds, publisher.channel)
+        job.set_stage("submitted")
+
+    except Exception as e:
+        job.error = str(e)
+        job.set_stage("failed")
+        log.exception("[submit] workflow %s failed to submit", wf_id)
+        batch = _NodeStatusBatch(wf_id)
+        for node_id in node_ids:
+            await _emit_status(publisher, node_id, "error", f"submit failed: {e}")
+            batch.set_status(node_id, "error", f"submit failed: {e}")
+        SessionFactory = await publisher.get_sessionmaker()
+        async with SessionFactory() as session:
+            await batch.flush(session)
+        await publisher.flush_status()
+
+
+async def _claim_submission(job: SubmissionJob, submission) -> bool:
+    """
+    Claim the admitted row before working on it. If it was cancelled, or re-queued (and maybe
+    dispatched to another job) since this job was started, the job is dropped: no second run.
+    """
+    if submission is None or await submission_queue.claim(submission):
+        return True
+    job.error = "no longer dispatched"
+    job.set_stage("failed")
+    log.info("[submit] submission %s was cancelled or re-queued before its job started", submission.id)
+    return False
+
+
+async def _submission_cancelled(job: SubmissionJob, submission_id) -> bool:
+    """
+    True if the queued submission was cancelled meanwhile. CANCEL_* may run on a replica
+    that does not dispatch (so it cannot cancel our job); it flags the Submission row instead.
+    """
+    if submission_id is None or not await submission_queue.cancelled(submission_id):
+        return False
+    job.error = "cancelled"
+    job.set_stage("failed")
+    return True
+
+
+async def _terminate_if_cancelled(job: SubmissionJob, submission_id, argo_name: str) -> bool:
+    """
+    After the create (and after its run name is stored): terminate the run if the submission was
+    cancelled meanwhile. A cancel that flags the row after this check finds the stored name itself.
+    """
+    if not await _submission_cancelled(job, submission_id):
+        return False
+    try:
+        await argo_call(terminate_workflow, argo_name, priority=PRIORITY_CONTROL)
+    except NotFound:
+        pass
+    except Exception as e:
+        log.warning("[cancel] could not terminate %s: %s", argo_name, e)
+    log.info("[cancel] terminated %s: its submission was cancelled while it was created", argo_name)
+    return True
+
+
+async def _memo_hits(
+    publisher: _WorkflowStatusPublisher, user: str, keys: set[str], prior: dict | None,
+) -> dict[str, tuple[str, str]]:
+    """Recorded outputs for the cache keys of this compile (earlier runs of this workflow included)."""
+    if not keys:
+        return {}
+    SessionFactory = await publisher.get_sessionmaker()
+    async with SessionFactory() as session:
+        hits = await _memo_outputs(session, user, keys=keys)
+    for key, output in (prior or {}).items():
+        if key in keys:
+            hits.setdefault(key, output)
+    if hits:
+        log.info("[memo] %d of %d task instance(s) reuse recorded outputs", len(hits), len(keys))
+    return hits
+
+
+async def _record_reused(publisher: _WorkflowStatusPublisher, wf_id, reused_by_node: dict) -> None:
+    """Nodes with nothing left to run are done: mark them success and record the reused outputs."""
+    if not reused_by_node:
+        return
+    batch = _NodeStatusBatch(wf_id)
+    for node_id, pointers in reused_by_node.items():
+        batch.set_status(node_id, "success", "reused previous output")
+        batch.add_node_outputs(node_id, pointers, publisher.user, "")
+        await _emit_status(publisher, node_id, "success", "reused previous output")
+    SessionFactory = await publisher.get_sessionmaker()
+    async with SessionFactory() as session:
+        agg = await batch.flush(session)
+    await publisher.flush_status()
+    if agg == "success":
+        await publisher.send_action(BackendActions.WORKFLOW_RESULT, {
+            "workflowId": str(wf_id), "s3url": f"s3://{_bucket()}/{publisher.user}/{wf_id}/",
+        })
+
+
+async def _submit_node(
+    job: SubmissionJob,
+    publisher: _WorkflowStatusPublisher,
+    wf_id,
+    node_id: str,
+    kind: str,
+    cfg: dict,
+    submission=None,
+) -> None:
+    """
+    Background stages of RUN_NODE: template sync, then one templateRef Workflow whose
+    phase is followed under the watcher registry (so CANCEL_NODE can stop it). The
+    submission is claimed and cancels are honoured around the create as in _submit_chain.
+    """
+    if not await _claim_submission(job, submission):
+        return
+    submission_id = submission.id if submission is not None else None
+    SessionFactory = await publisher.get_sessionmaker()
+    job.set_stage("prepare")
+    tpl = _kind_to_template(kind)
+    try:
+        await argo_call(_ensure_template_exists_or_create, tpl, priority=PRIORITY_TEMPLATE)
+    except Exception as e:
+        job.error = f"template error: {e}"
+        job.set_stage("failed")
+        await _emit_status(publisher, node_id, "error", f"template error: {e}")
+        async with SessionFactory() as session:
+            await _update_node_db(session, wf_id, node_id, "error", f"template error: {e}")
+        await publisher.flush_status()
+        return
+
+    params = _params_for(
+        kind, cfg, publisher.user, str(wf_id),      # <-- wf_uuid
+        last_in_chain=True,
+        upstream_key=cfg.get("input_s3_key") or cfg.get("input_key"),
+    )
+    if await _submission_cancelled(job, submission_id):
+        return
+    job.set_stage("create")
+    try:
+        with Workflow(
+            generate_name=f"{tpl}-",
+            entrypoint="main",
+            labels=flowforge_labels(wf_id),
+            workflow_template_ref=WorkflowTemplateRef(name=tpl),
+            workflows_service=make_ws(),
+        ) as w:
+            w.arguments = [Parameter(name=k, value=v) for k, v in params.items()]
+        await argo_call(w.create, priority=PRIORITY_SUBMIT)
+        argo_name = job.argo_workflow = w.name
+        async with SessionFactory() as session:
+            # CANCEL_NODE finds the run here
+            await session.execute(
+                update(WFModel).where(WFModel.id == wf_id).values(message=json.dumps({"argo_workflow": argo_name}))
+            )
+            await session.commit()
+        if await _terminate_if_cancelled(job, submission_id, argo_name):
+            return
+        async with SessionFactory() as session:
+            await _set_workflow_status(session, wf_id, "running", touch_last_run=True)
+        await _emit_status(publisher, node_id, "running", f"argo: {argo_name}")
+        await launch_watcher(argo_name, {}, {}, wf_id, publisher.user, channel=publisher.channel, phase_node=node_id)
+        job.set_stage("submitted")
+    except Exception as e:
+        job.error = f"submit failed: {e}"
+        job.set_stage("failed")
+        await _emit_status(publisher, node_id, "error", f"submit failed: {e}")
+        async with SessionFactory() as session:
+            await _update_node_db(session, wf_id, node_id, "error", f"submit failed: {e}")
+    await publisher.flush_status()
+
+
+async def _watch_workflow_phase(publisher: _WorkflowStatusPublisher, argo_wf_name: str, ui_node_id: str, wf_id) -> None:
+    """Follow the phase of a single-node (templateRef) Workflow until it is terminal."""
+    start = time.monotonic()
+
+    async for delta in _iter_workflow_deltas(argo_wf_name):
+        if delta.error is not None:
+            await _emit_status(publisher, ui_node_id, "running", f"poll error: {delta.error}")
+            if time.monotonic() - start > POLL_TIMEOUT_SEC:
+                await _emit_status(publisher, ui_node_id, "error", "poll timeout")
+                SessionFactory = await publisher.get_sessionmaker()
+                async with SessionFactory() as session:
+                    await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
+                return
+            continue
+
+        if delta.deleted:
+            await _fail_unfinished(publisher, wf_id, "workflow deleted")
+            return
+        if delta.phase is None and not delta.nodes:
+            continue  # quiet period, nothing new
+        phase = delta.phase
+        ui = _phase_to_ui(phase)
+        await _emit_status(publisher, ui_node_id, ui, phase or "Pending")
+
+        # node row + overall WF status in one transaction
+        batch = _NodeStatusBatch(wf_id)
+        batch.set_status(ui_node_id, ui, f"argo: {argo_wf_name} • {phase or 'Pending'}")
+        SessionFactory = await publisher.get_sessionmaker()
+        async with SessionFactory() as session:
+            await batch.flush(session)
+        if (phase or "Pending") in _TERMINAL:
+            return
+
+        if time.monotonic() - start > POLL_TIMEOUT_SEC:
+            await _emit_status(publisher, ui_node_id, "error", "poll timeout")
+            SessionFactory = await publisher.get_sessionmaker()
+            async with SessionFactory() as session:
+                await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
+            return
+
+
+def _submission_publisher(row) -> _WorkflowStatusPublisher:
+    # ad-hoc node runs answer the socket that asked for them; chains publish to the workflow group
+    return _WorkflowStatusPublisher(row.workflow_id, row.user, channel=(row.payload or {}).get("reply_to"))
+
+
+async def _dispatch_chain(row) -> None:
+    p = row.payload or {}
+    publisher = _submission_publisher(row)
+    options = WorkflowOptions.from_data(p.get("options"))
+    submissions.submit(row.workflow_id, lambda job: _submit_chain(
+        job, publisher, p.get("nodes") or [], p.get("edges") or [], row.user, row.workflow_id,
+        p.get("mode") or "real", options, p.get("prior_outputs") or {}, p.get("pinned") or {}, row,
+    ))
+
+
+async def _dispatch_node(row) -> None:
+    p = row.payload or {}
+    publisher = _submission_publisher(row)
+    submissions.submit(row.workflow_id, lambda job: _submit_node(
+        job, publisher, row.workflow_id, p["node_id"], p.get("kind") or "process", p.get("config") or {}, row,
+    ))
+
+
+async def _announce_position(row, position: int) -> None:
+    publisher = _submission_publisher(row)
+    for node_id in row.node_ids or []:
+        await publisher.send_action(BackendActions.NODE_STATUS, {
+            "nodeId": node_id, "status": "queued", "message": f"queued: position {position}",
+            "position": position, "workflowId": str(row.workflow_id),
+        })
+
+
+submission_queue.register("chain", _dispatch_chain, _announce_position)
+submission_queue.register("node", _dispatch_node, _announce_position)
+
+
 class NgiabBackendHandler(MBH):
     def __init__(self, backend_consumer):
         super().__init__(backend_consumer)
-        self._active_watchers: set[tuple[str, str]] = set()
 
-    def _launch_watcher(
+    async def _launch_watcher(
         self,
         argo_wf_name: str,
         tasks_by_node: dict[str, list[str]],
         datasets_by_node: dict[str, list[dict]],
         wf_id,
+        kinds=(),
     ) -> None:
-        key = (str(wf_id), argo_wf_name)
-        if key in self._active_watchers:
-            return
-
-        async def _run():
-            try:
-                await _watch_workflow_nodes(self, argo_wf_name, tasks_by_node, datasets_by_node, wf_id)
-            finally:
-                self._active_watchers.discard(key)
-
-        self._active_watchers.add(key)
-        asyncio.create_task(_run())
+        """Follow the workflow's status group and make sure ONE watcher runs for it (see launch_watcher)."""
+        await self.backend_consumer.follow_workflow(wf_id)
+        await launch_watcher(argo_wf_name, tasks_by_node, datasets_by_node, wf_id, _user_id(self), kinds)
 
     @property
     def receiving_actions(self) -> dict[str, callable]:
         actions = {
             "RUN_WORKFLOW": self.receive_run_workflow,
             "RUN_NODE": self.receive_run_node,
+            "RETRY_WORKFLOW": self.receive_retry_workflow,
+            "CANCEL_WORKFLOW": self.receive_cancel_workflow,
+            "CANCEL_NODE": self.receive_cancel_node,
             "REQUEST_LAST_RUN": self.receive_request_last_run,
             "LIST_WORKFLOWS": self.receive_list_workflows,
             "GET_WORKFLOW": self.receive_get_workflow,
@@ -744,352 +1122,7 @@ class NgiabBackendHandler(MBH):
                 actions[key] = fn
         return actions
 
-    # ---------------- polling ----------------
-    async def _poll_argo_to_terminal(self, argo_wf_name: str, ui_node_id: str, wf_id) -> None:
-        ws = make_ws()
-        loop = asyncio.get_running_loop()
-        start = time.monotonic()
-
-        while True:
-            try:
-                wf = await loop.run_in_executor(None, ws.get_workflow, argo_wf_name, ARGO_NAMESPACE)
-                phase = getattr(getattr(wf, "status", None), "phase", None)
-            except Exception as e:
-                await _emit_status(self, ui_node_id, "running", f"poll error: {e}")
-                if time.monotonic() - start > POLL_TIMEOUT_SEC:
-                    await _emit_status(self, ui_node_id, "error", "poll timeout")
-                    SessionFactory = await self.get_sessionmaker()
-                    async with SessionFactory() as session:
-                        await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
-                    return
-                await asyncio.sleep(POLL_SEC)
-                continue
-
-            ui = _phase_to_ui(phase)
-            await _emit_status(self, ui_node_id, ui, phase or "Pending")
-
-            SessionFactory = await self.get_sessionmaker()
-            async with SessionFactory() as session:
-                await _update_node_db(session, wf_id, ui_node_id, ui, f"argo: {argo_wf_name} • {phase or 'Pending'}")
-                # reflect overall WF status as nodes move
-                await _recompute_workflow_status(session, wf_id)
-            if (phase or "Pending") in _TERMINAL:
-                return
-
-            if time.monotonic() - start > POLL_TIMEOUT_SEC:
-                await _emit_status(self, ui_node_id, "error", "poll timeout")
-                SessionFactory = await self.get_sessionmaker()
-                async with SessionFactory() as session:
-                    await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
-                return
-
-            await asyncio.sleep(POLL_SEC)
-
-
-    async def _poll_tasks_to_terminal(self, argo_wf_name: str, task_names: list[str], ui_node_id: str, wf_id) -> None:
-        """
-        Poll just THIS UI node's Argo tasks and emit its status:
-        - error   -> if ANY task failed/errored/terminated
-        - success -> if ALL expected tasks are present AND succeeded
-        - running -> otherwise
-        On error: fail all non-terminal siblings (upstream failure).
-        """
-        ws = make_ws()
-        loop = asyncio.get_running_loop()
-        start = time.monotonic()
-        last_sent = None
-        failed_broadcast_done = False
-
-        # The exact task names we created in Hera for this UI node (e.g., t-my-node-00, t-my-node-01, …)
-        expected = set(task_names or [])
-        if not expected:
-            # Nothing to track for this node; keep it running until timeout, then error.
-            await _emit_status(self, ui_node_id, "running", "no tasks to poll")
-        def _canonical_match(nm: str) -> Optional[str]:
-            """Return the expected task name t if 'nm' belongs to it (exact or '<dag>.<t>')."""
-            if nm in expected:
-                return nm
-            # DAG nodes typically show as 'main.<task-name>' in NodeStatus.name
-            for t in expected:
-                if nm.endswith("." + t):
-                    return t
-            return None
-
-        while True:
-            try:
-                wf = await loop.run_in_executor(None, ws.get_workflow, argo_wf_name, ARGO_NAMESPACE)
-                status = getattr(wf, "status", None)
-                nodes_map = getattr(status, "nodes", None) or {}
-                nodes_iter = nodes_map.values() if isinstance(nodes_map, dict) else (nodes_map or [])
-
-                # Collect latest phase per expected task (by canonical task-name key)
-                phases_by_task: dict[str, str] = {}
-                for n in nodes_iter:
-                    nm = getattr(n, "name", None) or (isinstance(n, dict) and n.get("name"))
-                    ph = getattr(n, "phase", None) or (isinstance(n, dict) and n.get("phase"))
-                    if not nm or not ph:
-                        continue
-                    t = _canonical_match(str(nm))
-                    if not t:
-                        continue
-                    phases_by_task[t] = str(ph)
-
-                # Decide this UI node's status
-                collected = list(phases_by_task.values())
-                if any(p in {"Failed", "Error", "Terminated"} for p in collected):
-                    ui = "error"
-                elif expected and (len(phases_by_task) == len(expected)) and all(p == "Succeeded" for p in collected):
-                    ui = "success"
-                else:
-                    ui = "running"
-
-            except Exception as e:
-                ui = "running"
-                await _emit_status(self, ui_node_id, "running", f"poll error: {e}")
-                if time.monotonic() - start > POLL_TIMEOUT_SEC:
-                    await _emit_status(self, ui_node_id, "error", "poll timeout")
-                    SessionFactory = await self.get_sessionmaker()
-                    async with SessionFactory() as session:
-                        await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
-                    return
-                await asyncio.sleep(POLL_SEC)
-                continue
-
-            # Only emit when the state actually changes
-            if ui != last_sent:
-                last_sent = ui
-                await _emit_status(self, ui_node_id, ui, ui)
-                SessionFactory = await self.get_sessionmaker()
-                async with SessionFactory() as session:
-                    await _update_node_db(session, wf_id, ui_node_id, ui, ui)
-
-                    # If THIS node failed, mark non-terminal siblings as failed (once).
-                    if ui == "error" and not failed_broadcast_done:
-                        failed_broadcast_done = True
-                        try:
-                            rows = (await session.execute(
-                                select(NodeModel).where(NodeModel.workflow_id == wf_id)
-                            )).scalars().all()
-                            for row in rows:
-                                if row.name == ui_node_id:
-                                    continue
-                                if row.status not in {"success", "error"}:
-                                    await _emit_status(self, row.name, "error", "upstream failure")
-                                    await _update_node_db(session, wf_id, row.name, "error", "upstream failure")
-                        except Exception:
-                            pass
-
-                    # Update aggregate WF status & emit S3 URL when all are success
-                    agg = await _recompute_workflow_status(session, wf_id)
-                    if agg == "success":
-                        user = _user_id(self)
-                        bucket = _bucket()
-                        s3url = f"s3://{bucket}/{user}/{wf_id}/"
-                        await self.send_action(BackendActions.WORKFLOW_RESULT, {
-                            "workflowId": str(wf_id), "s3url": s3url
-                        })
-
-            # Stop polling this node when terminal
-            if ui in {"error", "success"}:
-                return
-
-            if time.monotonic() - start > POLL_TIMEOUT_SEC:
-                await _emit_status(self, ui_node_id, "error", "poll timeout")
-                SessionFactory = await self.get_sessionmaker()
-                async with SessionFactory() as session:
-                    await _update_node_db(session, wf_id, ui_node_id, "error", "poll timeout")
-                return
-
-            await asyncio.sleep(POLL_SEC)
-
-
     # ---------------- helpers ----------------
-    # def _ensure_templates_for_nodes(self, nodes: List[dict]) -> None:
-    #     needed = {_kind_to_template((n.get("label") or n.get("id") or "")) for n in nodes}
-    def _ensure_templates_for_nodes(self, nodes: List[dict], mode: str) -> None:
-        needed = {_kind_to_template((n.get("label") or n.get("id") or ""), mode) for n in nodes}
-        log.info("[DAG] ensure templates: %s", needed)
-        for tpl in needed:
-            _ensure_template_exists_or_create(tpl)
-
-# --- REPLACE the whole _build_chain_workflow(...) with the version below -----
-
-    def _build_chain_workflow(
-        self,
-        chain: list[dict],
-        user: str,
-        wf_uuid: str,
-        edges: list[dict] | None = None,
-
-        mode: str = "real",
-    ) -> tuple[Workflow, dict[str, list[str]]]:
-        from hera.workflows.models import TemplateRef, Arguments
-        def _label(n: dict) -> str:
-            return str(n.get("label") or n.get("id") or "").strip()
-
-        def _make_params(node: dict, last_flag: bool, incoming: dict | None, branch: str) -> dict:
-            """Build params and append the branch suffix to output/final prefixes."""
-            kind = _label(node)
-            cfg = (node.get("config") or {})
-            upstream_key = None
-            if incoming and incoming.get("dataset_bucket") and incoming.get("dataset_key"):
-                upstream_key = incoming["dataset_key"]
-            upstream_bucket = incoming.get("dataset_bucket") if incoming else None
-            params = _params_for(
-                kind, cfg, user, wf_uuid, last_in_chain=last_flag,
-                upstream_key=upstream_key, upstream_bucket=upstream_bucket
-            )
-            # If we know the producing bucket/key, set explicit inputs for artifact binding
-            if incoming and incoming.get("dataset_bucket") and incoming.get("dataset_key"):
-                params.setdefault("input_bucket", incoming["dataset_bucket"])
-                params.setdefault("input_key", incoming["dataset_key"])
-                params.setdefault("input_s3_key", incoming["dataset_key"])
-            # unique branch path for outputs
-            base = params.get("output_prefix")
-            if base:
-                params["output_prefix"] = f"{base.rstrip('/')}/{branch}"
-            if params.get("final_prefix"):
-                params["final_prefix"] = f"{params['final_prefix'].rstrip('/')}/{branch}"
-            return params
-
-        def _dataset_pointer_from_params(kind: str, params: dict, inherit: dict | None = None) -> dict:
-            lk = (kind or "").lower()
-            inherit = dict(inherit or {})
-            if ("preprocess" in lk) or ("pre-process" in lk):
-                inherit.update({
-                    "dataset_bucket": params.get("output_bucket", ""),
-                    "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/{params.get('output_name','ngiab')}.tgz",
-                })
-                return inherit
-            if "calibration-config" in lk:
-                inherit.update({
-                    "dataset_bucket": params.get("output_bucket", ""),
-                    "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/calibration-prepared.tgz",
-                })
-                return inherit
-            if "calibration-run" in lk:
-                inherit.update({
-                    "dataset_bucket": params.get("output_bucket", ""),
-                    "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/calibrated.tgz",
-                })
-                return inherit
-            if (("ngiab" in lk) and ("run" in lk)):
-                inherit.update({
-                    "dataset_bucket": params.get("output_bucket", ""),
-                    "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/{params.get('output_name','ngiab')}.tgz",
-                })
-                return inherit
-            if "teehr" in lk:
-                # teehr packages into teehr_results.tgz
-                inherit.update({
-                    "dataset_bucket": params.get("output_bucket", ""),
-                    "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/teehr_results.tgz",
-                })
-                return inherit
-            return inherit
-
-        ws = make_ws()
-
-        # Keep only nodes provided in 'chain'
-        nodes_by_id: dict[str, dict] = {str(n["id"]): n for n in chain}
-        node_ids = list(nodes_by_id.keys())
-
-        # Normalize the incoming UI edges to (src, dst)
-        norm_edges = _normalize_edges(edges or [])
-        log.info("[DAG] UI edges (normalized): %s", norm_edges)
-
-        # Build parents/children maps on the induced subgraph
-        parents = {nid: [] for nid in node_ids}
-        children = {nid: [] for nid in node_ids}
-        for (s, t) in norm_edges:
-            if s in nodes_by_id and t in nodes_by_id:
-                parents[t].append(s)
-                children[s].append(t)
-
-        # Topological order
-        topo_layers = _topo_layers([{"id": nid} for nid in node_ids], norm_edges)
-        log.info("[DAG] topo layers: %s", topo_layers)
-
-        # Tags by node id
-        kind_by_id = {}
-        tag_by_id = {}
-        for nid, node in nodes_by_id.items():
-            k = node.get("label") or node.get("id") or ""
-            kind_by_id[nid] = k
-            tag_by_id[nid] = _kind_tag(k)
-
-        sinks = {nid for nid in node_ids if not children[nid]}
-
-        def _is_dataset_consumer(tag: str) -> bool:
-            return tag in {"cal_cfg", "cal_run", "run", "teehr"}
-
-        with Workflow(generate_name="ngiab-chain-", entrypoint="main", workflows_service=ws) as w:
-            tasks_by_node: dict[str, list[str]] = {nid: [] for nid in node_ids}
-            datasets_by_node: dict[str, list[dict]] = {nid: [] for nid in node_ids}
-            with DAG(name="main"):
-                instances_by_node: dict[str, list[dict]] = {}
-
-                for layer in topo_layers:
-                    for nid in layer:
-                        node = nodes_by_id[nid]
-                        kind = node.get("label") or node.get("id")
-                        tag = tag_by_id[nid]
-                        # tpl_name = _kind_to_template(kind)
-                        tpl_name = _kind_to_template(kind, mode)
-                        _ensure_template_exists_or_create(tpl_name)
-
-                        is_last = nid in sinks
-                        raw_parents = parents.get(nid, [])
-                        valid_parent_ids = [pid for pid in raw_parents if _allowed_parent(tag_by_id[pid], tag)]
-                        if tag == "run" and len(valid_parent_ids) > 1:
-                            valid_parent_ids.sort(key=lambda x: _parent_preference_order(tag_by_id[x]))
-
-                        parent_instances: list[dict] = []
-                        for pid in valid_parent_ids:
-                            parent_instances.extend(instances_by_node.get(pid, []))
-
-                        created: list[dict] = []
-                        if parent_instances and _is_dataset_consumer(tag):
-                            # fan-out
-                            for idx, pinst in enumerate(parent_instances):
-                                tname = f"t-{_slug(kind)}-{_slug(nid)}-{idx:02d}"
-                                params = _make_params(node, is_last, incoming=pinst, branch=tname)
-                                Task(
-                                    name=tname,
-                                    template_ref=TemplateRef(name=tpl_name, template="main"),
-                                    arguments=Arguments(parameters=[Parameter(name=k, value=v) for k, v in params.items()]),
-                                    dependencies=[pinst["task"]],
-                                )
-                                tasks_by_node[nid].append(tname)
-                                pointer = _dataset_pointer_from_params(kind, params, inherit=pinst)
-                                pointer.update({"task": tname, "kind": kind, "tag": tag})
-                                created.append(pointer)
-                        else:
-                            # single instance (optional fan-in)
-                            dep_names = []
-                            for pid in valid_parent_ids:
-                                for pi in instances_by_node.get(pid, []):
-                                    dep_names.append(pi["task"])
-                            tname = f"t-{_slug(kind)}-{_slug(nid)}-00"
-                            incoming = parent_instances[0] if len(parent_instances) == 1 else None
-                            params = _make_params(node, is_last, incoming=incoming, branch=tname)
-                            Task(
-                                name=tname,
-                                template_ref=TemplateRef(name=tpl_name, template="main"),
-                                arguments=Arguments(parameters=[Parameter(name=k, value=v) for k, v in params.items()]),
-                                dependencies=dep_names or None,
-                            )
-                            tasks_by_node[nid].append(tname)
-                            pointer = _dataset_pointer_from_params(kind, params, inherit=incoming or {})
-                            pointer.update({"task": tname, "kind": kind, "tag": tag})
-                            created.append(pointer)
-
-                        instances_by_node[nid] = created
-                        datasets_by_node[nid] = created
-
-        return w, tasks_by_node, datasets_by_node
-
-
     @MBH.action_handler
     async def receive_get_workflow(self, event, action, data, session: AsyncSession):
         """Return {nodes, edges} for a workflow id. Falls back to Node rows if graph is missing."""
@@ -1117,35 +1150,20 @@ class NgiabBackendHandler(MBH):
                 if row:
                     n["status"] = row.status
                     existing_cfg = n.get("config") or {}
-                    n["config"] = {**existing_cfg, **(row.config or {})}
+                    n["config"] = {**existing_cfg, **user_config(row.config)}
         else:
             # Fallback: reconstruct nodes from Node table; edges unknown
             nodes = [
                 {
                     "id": n.name,
                     "label": n.kind,
-                    "config": n.config or {},
+                    "config": user_config(n.config),
                     "status": n.status,
                 }
                 for n in node_rows
             ]
             edges = []
 
-        runtime_tasks = {}
-        runtime_datasets = {}
-        for row in node_rows:
-            runtime = (row.config or {}).get("_runtime") or {}
-            runtime_tasks[row.name] = runtime.get("tasks") or []
-            runtime_datasets[row.name] = runtime.get("datasets") or []
-
-        argo_name = None
-        if wf.message:
-            try:
-                meta = json.loads(wf.message)
-                argo_name = meta.get("argo_workflow")
-            except Exception:
-                argo_name = None
-
         payload = {
             "workflow": {"id": wf.id, "name": wf.name, "status": wf.status},
             "nodes": nodes,
@@ -1154,8 +1172,11 @@ class NgiabBackendHandler(MBH):
         }
         await self.send_action(BackendActions.WORKFLOW_GRAPH, payload)
 
-        if wf.status in {"running", "queued"} and argo_name and any(runtime_tasks.values()):
-            self._launch_watcher(argo_name, runtime_tasks, runtime_datasets, wf.id)
+        # Same relaunch as the reconciler: only rows that still have tasks to follow
+        spec = _runtime_watch_spec(wf, node_rows) if wf.status in {"running", "queued"} else None
+        if spec:
+            await self.backend_consumer.follow_workflow(wf.id)
+            await launch_watch_spec(spec)
 
     @MBH.action_handler
     async def receive_list_workflows(self, event, action, data, session: AsyncSession):
@@ -1199,7 +1220,8 @@ class NgiabBackendHandler(MBH):
     async def receive_run_workflow(self, event, action, data, session: AsyncSession):
         wf_data = data.get("workflow") or {}
         selected_wf_id = data.get("workflowId")
-        nodes = wf_data.get("nodes", [])
+        # server-owned keys (_runtime, ...) that come back from GET_WORKFLOW are not part of the graph
+        nodes = [{**n, "config": user_config(n.get("config"))} for n in wf_data.get("nodes", [])]
         edges = wf_data.get("edges", [])
         mode  = (data or {}).get("mode") or "real"
         selected_ids: List[str] = data.get("selected") or []
@@ -1257,10 +1279,6 @@ class NgiabBackendHandler(MBH):
         chain_nodes = [nodes_by_id[i] for i in keep]
         edges_kept = [e for e in edges_sub if e["source"] in keep and e["target"] in keep]
 
-        # Ensure templates exist for everything we’re about to run
-        # self._ensure_templates_for_nodes(chain_nodes)
-        self._ensure_templates_for_nodes(chain_nodes, mode)
-
         # Reuse selected workflow row if provided; else create a new one
         wt_row = await self._get_or_create_template_row(session, "ngiab-chain", user, {"source": "yaml"})
         wf_row = None
@@ -1271,13 +1289,29 @@ class NgiabBackendHandler(MBH):
                 )).scalar_one_or_none()
             except Exception:
                 wf_row = None
+        prior_outputs: dict[str, tuple[str, str]] = {}
+        pinned: dict[str, list[tuple[str, str, str]]] = {}
         if wf_row:
+            # the dirty node rows (and their outputs) go away below: keep what they produced for memo hits
+            prior_outputs = await _memo_outputs(session, user, workflow_id=wf_row.id)
+            if not data.get("full"):
+                # incremental run: only changed nodes and their descendants are re-executed,
+                # clean ones keep their rows/status and feed their recorded outputs downstream
+                recorded = await _recorded_outputs(session, wf_row.id)
+                dirty = dirty_nodes(wf_row.graph, chain_nodes, edges_kept, set(recorded))
+                if dirty:
+                    pinned = {n["id"]: recorded[n["id"]] for n in chain_nodes if n["id"] not in dirty}
+                if pinned:
+                    log.info("[incremental] workflow %s: %d dirty, %d clean node(s)", wf_row.id, len(dirty), len(pinned))
             wf_row.graph = {"nodes": chain_nodes, "edges": edges_kept}
             wf_row.template_id = wt_row.id
             wf_row.status = "queued"
+            _forget_argo_run(wf_row)
             await session.commit()
-            # clear old node rows and re-seed in the stored order
-            await session.execute(NodeModel.__table__.delete().where(NodeModel.workflow_id == wf_row.id))
+            # clear the other node rows and re-seed them in the stored order
+            await session.execute(NodeModel.__table__.delete().where(
+                NodeModel.workflow_id == wf_row.id, NodeModel.name.notin_(list(pinned)),
+            ))
             await session.commit()
         else:
             wf_row = WFModel(
@@ -1295,6 +1329,14 @@ class NgiabBackendHandler(MBH):
         for order, node in enumerate(chain_nodes):
             label = node.get("label") or node.get("id")
             node_id = node.get("id") or (node.get("label") or "")
+            if node_id in pinned:
+                # clean row: keeps status and outputs, loses the old run's task names (_runtime)
+                await session.execute(
+                    update(NodeModel)
+                    .where(NodeModel.workflow_id == wf_row.id, NodeModel.name == node_id)
+                    .values(order_index=order, config=node.get("config") or {})
+                )
+                continue
             session.add(NodeModel(
                 workflow_id=wf_row.id,
                 name=node_id,
@@ -1306,42 +1348,214 @@ class NgiabBackendHandler(MBH):
             ))
         await session.commit()
 
-        # optimistic UI updates
-        for node in chain_nodes:
-            node_id = node.get("id") or (node.get("label") or "")
-            await _emit_status(self, node_id, "running", "submitting")
+        # Queue the Argo side (admission control, consumers/admission.py) and answer right away
+        node_ids = [nid for nid in (node.get("id") or (node.get("label") or "") for node in chain_nodes) if nid not in pinned]
+        await self.backend_consumer.follow_workflow(wf_row.id)
+        wf_id = wf_row.id
+        submission = await submission_queue.enqueue(session, wf_id, user, "chain", {
+            "nodes": chain_nodes,
+            "edges": edges_kept,
+            "mode": mode,
+            "options": (data or {}).get("options"),  # parallelism / priorityClass
+            "prior_outputs": prior_outputs,
+            "pinned": pinned,
+        }, node_ids, priority=(data or {}).get("priority"))
+        await self.send_action(BackendActions.WORKFLOW_SUBMITTED, {
+            "submissionId": str(submission.id), "workflowId": str(wf_id), "nodeIds": node_ids,
+            "cleanNodeIds": sorted(pinned),
+        })
+
+        # Other selected nodes, totally disconnected from the kept subgraph: ONE ad-hoc run for all of them
+        other_ids = selected_set - keep
+        others = [n for n in nodes if n["id"] in other_ids]
+        if others:
+            await self._run_adhoc_batch(session, others, user, mode, (data or {}).get("priority"))
 
-        # Build the DAG with fan-out semantics (per-parent instances) and submit
-        try:
-            w, tasks_by_node, datasets_by_node = self._build_chain_workflow(
-                chain_nodes, user, wf_uuid=str(wf_row.id), edges=edges_kept, mode=mode
-            )
-            w.create()
-            await _store_runtime_metadata(self, wf_row.id, w.name, tasks_by_node, datasets_by_node)
-            # mark the workflow row as running and set last_run_at
-            await _set_workflow_status(session, wf_row.id, "running", touch_last_run=True)
-            
-            # Notify the UI that this Argo Workflow name backs all nodes...
-            for node in chain_nodes:
-                node_id = node.get("id") or (node.get("label") or "")
-                await _emit_status(self, node_id, "running", f"argo: {w.name}")
-            # ...then start ONE watcher that attributes phases to the right UI node
-            self._launch_watcher(w.name, tasks_by_node, datasets_by_node, wf_row.id)
+    async def _run_adhoc_batch(self, session: AsyncSession, nodes: list[dict], user: str, mode: str, priority=None) -> None:
+        """
+        Run unconnected nodes as one workflow row and one multi-task Argo Workflow (a chain
+        without edges): one submission, one watcher, frames answered to this socket.
+        """
+        batch = [
+            {"id": n["id"], "label": n.get("label") or n["id"], "config": _adhoc_config(dict(n.get("config") or {}))}
+            for n in nodes
+        ]
+        wf = WFModel(
+            name=f"ad-hoc-{_run_id()}",
+            user=user,
+            status="queued",
+            graph={"nodes": batch, "edges": []},
+            layers=[[n["id"] for n in batch]],
+        )
+        session.add(wf)
+        await session.flush()
+        for order, n in enumerate(batch):
+            session.add(NodeModel(
+                workflow_id=wf.id, name=n["id"], kind=n["label"], user=user,
+                config=n["config"], status="idle", order_index=order,
+            ))
+        await session.commit()
 
+        node_ids = [n["id"] for n in batch]
+        for node_id in node_ids:
+            await _emit_status(self, node_id, "queued", "queued for submission")
+        submission = await submission_queue.enqueue(session, wf.id, user, "chain", {
+            "nodes": batch,
+            "edges": [],
+            "mode": mode,
+            "reply_to": self.backend_consumer.channel_name,
+        }, node_ids, priority=priority)
+        await self.send_action(BackendActions.WORKFLOW_SUBMITTED, {
+            "submissionId": str(submission.id), "workflowId": str(wf.id), "nodeIds": node_ids,
+        })
 
-        except Exception as e:
-            for node in chain_nodes:
-                node_id = node.get("id") or (node.get("label") or "")
-                await _emit_status(self, node_id, "error", f"submit failed: {e}")
-                await _update_node_db(session, wf_row.id, node_id, "error", f"submit failed: {e}")
+    @MBH.action_handler
+    async def receive_retry_workflow(self, event, action, data, session: AsyncSession):
+        """
+        Retry a failed chain in place with Argo's retry on the stored ``argo_workflow``:
+        completed stages are not re-executed, only failed / upstream-failed node rows are
+        reset and followed by a fresh watcher. When Argo no longer has the run, the stored
+        graph is re-run incrementally instead (only nodes without a successful output).
+        """
+        wf_id = (data or {}).get("workflowId") or (data or {}).get("id")
+        wf = None
+        if wf_id:
+            try:
+                wf = (await session.execute(
+                    select(WFModel).where(WFModel.id == UUID(str(wf_id)))
+                )).scalar_one_or_none()
+            except ValueError:
+                wf = None
+        if wf is None:
+            await self.send_action(BackendActions.NODE_STATUS, {"nodeId": "", "status": "error", "message": "Workflow not found."})
+            return
+        if wf.status in {"running", "queued"}:
+            await self.send_action(BackendActions.NODE_STATUS, {"nodeId": "", "status": "error", "message": "Workflow is still running."})
+            return
 
-        # Optionally run *other* selected nodes that are totally disconnected from the kept subgraph
-        other_ids = selected_set - keep
-        for n in nodes:
-            if n["id"] in other_ids:
-                await self.receive_run_node(event, action, {"nodeId": n["id"], "label": n.get("label"), "config": n.get("config") or {}})
+        argo_name = _argo_workflow_name(wf)
+        if argo_name:
+            try:
+                await argo_call(retry_workflow, argo_name, priority=PRIORITY_CONTROL)
+            except NotFound:
+                log.info("[retry] %s is gone from Argo; re-running workflow %s incrementally", argo_name, wf.id)
+                argo_name = None
+            except Exception as e:
+                log.warning("[retry] could not retry %s: %s", argo_name, e)
+                await self.send_action(BackendActions.NODE_STATUS, {"nodeId": "", "status": "error", "message": f"retry failed: {e}"})
+                return
+        if not argo_name:
+            graph = wf.graph or {}
+            await self.receive_run_workflow(event, action, {
+                "workflow": {"nodes": graph.get("nodes") or [], "edges": graph.get("edges") or []},
+                "workflowId": str(wf.id),
+                "mode": (data or {}).get("mode"),
+            })
+            return
 
+        # Reset failed and upstream-failed rows (one UPDATE) and mark the workflow running
+        message = f"retrying: {argo_name}"
+        reset = (await session.execute(
+            update(NodeModel)
+            .where(NodeModel.workflow_id == wf.id, NodeModel.status == "error")
+            .values(status="running", message=message, updated_at=datetime.now(timezone.utc))
+            .returning(NodeModel.name)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await _set_workflow_status(session, wf.id, "running", touch_last_run=True)
+
+        await self.backend_consumer.follow_workflow(wf.id)
+        for node_id in reset:
+            await _emit_status(self, node_id, "running", message)
+        rows = (await session.execute(
+            select(NodeModel).where(NodeModel.workflow_id == wf.id, NodeModel.name.in_(list(reset)))
+        )).scalars().all()
+        spec = _runtime_watch_spec(wf, rows)
+        if spec is not None:
+            await self._launch_watcher(argo_name, spec["tasks"], spec["datasets"], wf.id, spec["kinds"])
 
+    @MBH.action_handler
+    async def receive_cancel_workflow(self, event, action, data, session: AsyncSession):
+        """
+        Cancel a workflow run: pending submission jobs are dropped, the Argo Workflow is
+        terminated (``graceful`` -> stopped, exit handlers still run), every unfinished node
+        row is marked cancelled in one transaction and the watcher is stopped.
+        """
+        wf_id = (data or {}).get("workflowId") or (data or {}).get("id")
+        wf = None
+        if wf_id:
+            try:
+                wf = (await session.execute(
+                    select(WFModel).where(WFModel.id == UUID(str(wf_id)))
+                )).scalar_one_or_none()
+            except ValueError:
+                wf = None
+        if wf is None:
+            await self.send_action(BackendActions.NODE_STATUS, {"nodeId": "", "status": "error", "message": "Workflow not found."})
+            return
+        await self._cancel_run(session, wf, graceful=bool((data or {}).get("graceful")))
+
+    @MBH.action_handler
+    async def receive_cancel_node(self, event, action, data, session: AsyncSession):
+        """
+        Cancel the run a node is part of (``workflowId``, else the user's newest unfinished
+        run of that node, e.g. an ad-hoc RUN_NODE). Argo cannot kill a single task of a
+        running DAG, so the whole run backing the node is terminated.
+        """
+        node_id = (data or {}).get("nodeId")
+        if not node_id:
+            raise ValueError("Missing 'nodeId'")
+        stmt = (
+            select(WFModel)
+            .join(NodeModel, NodeModel.workflow_id == WFModel.id)
+            .where(NodeModel.name == node_id, NodeModel.status.notin_(["success", "error"]))
+        )
+        wf_id = (data or {}).get("workflowId")
+        try:
+            stmt = stmt.where(WFModel.id == UUID(str(wf_id))) if wf_id else stmt.where(WFModel.user == _user_id(self))
+            wf = (await session.execute(stmt.order_by(WFModel.created_at.desc()).limit(1))).scalars().first()
+        except ValueError:
+            wf = None
+        if wf is None:
+            await self.send_action(BackendActions.NODE_STATUS, {"nodeId": node_id, "status": "error", "message": "Nothing to cancel."})
+            return
+        await self._cancel_run(session, wf, graceful=bool((data or {}).get("graceful")))
+
+    async def _cancel_run(self, session: AsyncSession, wf: WFModel, graceful: bool = False) -> None:
+        # Still queued: drop it. Dispatched: flag it first, so the dispatching replica (maybe not
+        # this one) stops before its Argo create or terminates the run, or we find the run below.
+        # Our own jobs: cancel them, or let them create the Argo run and terminate that
+        await submission_queue.cancel(session, wf.id)
+        jobs = await submissions.cancel(wf.id)
+        await session.refresh(wf)
+        argo_names = {j.argo_workflow for j in jobs if j.argo_workflow}
+        if _argo_workflow_name(wf):
+            argo_names.add(_argo_workflow_name(wf))
+
+        for name in argo_names:
+            try:
+                if graceful:
+                    await argo_call(stop_workflow, name, "cancelled from FlowForge", priority=PRIORITY_CONTROL)
+                else:
+                    await argo_call(terminate_workflow, name, priority=PRIORITY_CONTROL)
+            except NotFound:
+                pass  # already gone from Argo
+            except Exception as e:
+                log.warning("[cancel] could not stop %s: %s", name, e)
+                await self.send_action(BackendActions.NODE_STATUS, {"nodeId": "", "status": "error", "message": f"cancel failed: {e}"})
+                return
+            # stop following it here (or in the daemon); other replicas see the Terminated phase
+            watchers.cancel(name)
+            if FLOWFORGE_WATCHER_MODE == "daemon":
+                await get_channel_layer(App.package).send(WATCHER_CHANNEL, {"type": "watch.stop", "argo_workflow": name})
+
+        batch = _NodeStatusBatch(wf.id)
+        batch.fail_remaining(CANCELLED)
+        await batch.flush(session)
+        await self.backend_consumer.follow_workflow(wf.id)
+        for node_id in batch.upstream_failed:
+            await _emit_status(self, node_id, "error", CANCELLED)
+        log.info("[cancel] workflow %s: %d node(s) cancelled, argo %s", wf.id, len(batch.upstream_failed), sorted(argo_names))
 
     async def _get_or_create_template_row(self, session: AsyncSession, name: str, user: str, spec: dict | None):
         existing = (await session.execute(select(WTModel).where(WTModel.name == name).limit(1))).scalar_one_or_none()
@@ -1360,25 +1574,10 @@ class NgiabBackendHandler(MBH):
         if not node_id:
             raise ValueError("Missing 'nodeId'")
         kind = (data.get("label") or "process")
-        cfg = data.get("config") or {}
+        cfg = _adhoc_config(data.get("config") or {})  # normalize S3 URL for single-node calibration runs
         user = _user_id(self)
         run = _run_id()
 
-        # normalize S3 URL for single-node calibration runs
-        if "input_s3_url" in cfg and (("input_bucket" not in cfg) or ("input_key" not in cfg)):
-            try:
-                b, k = _parse_s3_url(str(cfg["input_s3_url"]))
-                cfg.setdefault("input_bucket", b)
-                cfg.setdefault("input_key", k.lstrip("/"))
-                cfg.setdefault("input_s3_key", k.lstrip("/"))
-            except Exception:
-                pass
-        if "input_key" in cfg and isinstance(cfg["input_key"], str):
-            cfg["input_key"] = cfg["input_key"].lstrip("/")
-
-        if "input_s3_key" in cfg and isinstance(cfg["input_s3_key"], str):
-            cfg["input_s3_key"] = cfg["input_s3_key"].lstrip("/")
-
         wf = WFModel(
             name=f"ad-hoc-{run}",
             user=user,
@@ -1391,40 +1590,13 @@ class NgiabBackendHandler(MBH):
         session.add(NodeModel(workflow_id=wf.id, name=node_id, kind=kind, user=user, config=cfg, status="idle"))
         await session.commit()
 
-        await _emit_status(self, node_id, "running", "submitting")
-
-        tpl = _kind_to_template(kind)
-        try:
-            _ensure_template_exists_or_create(tpl)
-        except Exception as e:
-            await _emit_status(self, node_id, "error", f"template error: {e}")
-            # update database status for this node
-            await _update_node_db(session, wf.id, node_id, "error", f"template error: {e}")
-            return
-
-        params = _params_for(
-            kind, cfg, user, str(wf.id),      # <-- wf_uuid
-            last_in_chain=True,
-            upstream_key=cfg.get("input_s3_key") or cfg.get("input_key"),
-        )
-        ws = make_ws()
-        try:
-            with Workflow(
-                generate_name=f"{tpl}-",
-                entrypoint="main",
-                workflow_template_ref=WorkflowTemplateRef(name=tpl),
-                workflows_service=ws,
-            ) as w:
-                w.arguments = [Parameter(name=k, value=v) for k, v in params.items()]
-            w.create()
-            await _set_workflow_status(session, wf.id, "running", touch_last_run=True)
-            await _emit_status(self, node_id, "running", f"argo: {w.name}")
-            asyncio.create_task(self._poll_argo_to_terminal(w.name, node_id, wf.id))
-        except Exception as e:
-            await _emit_status(self, node_id, "error", f"submit failed: {e}")
-            # update database status for this node
-            await _update_node_db(session, wf.id, node_id, "error", f"submit failed: {e}")
-            return
+        await _emit_status(self, node_id, "queued", "queued for submission")
+        await submission_queue.enqueue(session, wf.id, user, "node", {
+            "node_id": node_id,
+            "kind": kind,
+            "config": cfg,
+            "reply_to": self.backend_consumer.channel_name,
+        }, [node_id], priority=data.get("priority"))
 
     # ---------------- Playback stub ----------------
     @MBH.action_handler
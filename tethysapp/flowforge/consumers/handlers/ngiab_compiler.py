@@ -0,0 +1,934 @@
+# tethysapp/flowforge/consumers/handlers/ngiab_compiler.py
+"""
+UI graph -> Argo Workflow compiler for RUN_WORKFLOW.
+
+The UI graph (nodes, edges, configs, mode) is first frozen into a hashable
+``GraphIR``; compiling it (edge normalization, topo layers, stage tags,
+``_params_for``, fan-out) yields a Workflow manifest in which the run-specific
+values (user and workflow UUID) are placeholders. Compiled manifests are kept
+in an LRU keyed by the IR digest, so re-running the same workflow -- or any
+chain whose nodes, edges and configs did not change -- skips compilation and
+only swaps the real user / workflow UUID into a copy (``CompiledWorkflow.render``).
+
+Compilation is split in two: ``plan_chain`` lays out TaskSpecs, and
+``render_manifest`` turns them into the Argo Workflow JSON directly -- no
+Hera Workflow/DAG/Task objects or pydantic validation -- which is what gets
+POSTed on the pooled session. ``render_hera`` builds the same manifest through
+Hera and is kept as the reference (FLOWFORGE_MANIFEST_RENDERER=hera).
+
+A fan-out of FLOWFORGE_FANOUT_COMPACT_AT or more instances is compacted into
+ONE task with ``withItems`` (one item per upstream dataset pointer, holding
+only the params that differ), so the manifest grows by a few strings per
+instance instead of a full task. Iterations are tracked in ``tasks_by_node``
+as "<task>(<index>)"; TaskAttribution maps Argo's "<task>(<index>:...)" nodes
+back onto them. A compacted task starts once all of its parent tasks are done.
+
+Throughput knobs: the run's ``parallelism`` / pod priority class
+(WorkflowOptions), a per-stage cap (node config ``max_parallel``, default
+FLOWFORGE_STAGE_PARALLELISM) that wraps the stage's tasks in a nested DAG with
+its own ``parallelism``, and CPU/memory requests passed to the templates
+(``cpu_request`` / ``memory_request``; ngen_np for NGIAB runs).
+
+Memoization: every task instance gets a ``cache_key`` (template + params
+without output paths + the upstream instance's cache key). The key travels in
+its dataset pointer into ``VirtualOutput.extra``; when a later compile is given
+those outputs (``reuse``) the instance is not run and its recorded output is
+wired downstream instead.
+
+Incremental runs: ``dirty_nodes`` diffs a chain against the previously stored
+graph; clean nodes are ``pinned`` to their recorded outputs and only the dirty
+subgraph gets tasks.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from hera.workflows import DAG, Task, Workflow
+from hera.workflows.models import Arguments, Parameter, TemplateRef
+
+from ...argo.client import post_json
+from ...argo.config import (
+    ARGO_NAMESPACE,
+    COMPILE_CACHE_SIZE,
+    FANOUT_COMPACT_AT,
+    MANIFEST_RENDERER,
+    MEMOIZE,
+    POD_PRIORITY_CLASS,
+    STAGE_PARALLELISM,
+    WORKFLOW_PARALLELISM,
+    flowforge_labels,
+)
+
+log = logging.getLogger(__name__)
+
+# Stand-ins for the run-specific values inside a cached manifest
+USER_PLACEHOLDER = "__flowforge_user__"
+WF_UUID_PLACEHOLDER = "__flowforge_wf_uuid__"
+
+
+# ---------- graph helpers ----------
+
+def _slug(x: str) -> str:
+    import re
+    return re.sub(r"[^a-zA-Z0-9\-]+", "-", str(x)).strip("-").lower() or "n"
+
+def _kind_tag(kind_or_label: str) -> str:
+    k = (kind_or_label or "").lower()
+    # normalize a few variants we've seen in the UI
+    if "pre-process" in k or "preprocess" in k:
+        return "pre"
+    if "calibration-config" in k:
+        return "cal_cfg"
+    if "calibration-run" in k:
+        return "cal_run"
+    if "teehr" in k:
+        return "teehr"
+    if ("ngiab" in k) and ("run" in k):
+        return "run"
+    return "other"
+
+def _allowed_parent(parent_tag: str, child_tag: str) -> bool:
+    # Stage-to-stage rules:
+    # pre -> cal_cfg -> cal_run -> run -> teehr
+    if child_tag == "cal_cfg":
+        return parent_tag == "pre"
+    if child_tag == "cal_run":
+        return parent_tag == "cal_cfg"
+    if child_tag == "run":
+        # run can take from cal_run, or (fallbacks) cal_cfg, pre
+        return parent_tag in ("cal_run", "cal_cfg", "pre")
+    if child_tag == "teehr":
+        return parent_tag == "run"
+    # default: no constraints
+    return True
+
+def _parent_preference_order(tag: str) -> int:
+    # Smaller number == stronger preference when multiple valid parents exist
+    # Used only for the 'run' stage to choose cal_run over cal_cfg over pre
+    order = {"cal_run": 0, "cal_cfg": 1, "pre": 2, "run": 0, "other": 9}
+    return order.get(tag, 9)
+
+def _normalize_edges(edges_in) -> list[tuple[str, str]]:
+    """Accept either [{'source': 'a', 'target': 'b'}, ...] or [('a','b'), ...]."""
+    out: list[tuple[str, str]] = []
+    for e in edges_in or []:
+        if isinstance(e, dict):
+            s, t = e.get("source"), e.get("target")
+        elif isinstance(e, (list, tuple)) and len(e) >= 2:
+            s, t = e[0], e[1]
+        else:
+            continue
+        if s is not None and t is not None:
+            out.append((str(s), str(t)))
+    return out
+
+def _topo_layers(nodes: list[dict], edges: list) -> list[list[str]]:
+    """Topological layering; edges can be normalized tuples or dicts."""
+    # normalize edges first
+    e2 = _normalize_edges(edges)
+    ids = [str(n["id"]) for n in nodes]
+    indeg = {i: 0 for i in ids}
+    adj = {i: [] for i in ids}
+    for (s, t) in e2:
+        if s in adj and t in indeg:
+            adj[s].append(t)
+            indeg[t] += 1
+    layers, frontier = [], [i for i in ids if indeg[i] == 0]
+    seen = set()
+    while frontier:
+        layers.append(frontier[:])
+        seen.update(frontier)
+        nxt = []
+        for u in frontier:
+            for v in adj[u]:
+                indeg[v] -= 1
+                if indeg[v] == 0 and v not in seen:
+                    nxt.append(v)
+        frontier = nxt
+    # Any nodes not reached (e.g. cyclic or isolated) go into a last layer
+    if len(seen) != len(ids):
+        layers.append([i for i in ids if i not in seen])
+    return layers
+
+# ---------- S3 helpers ----------
+def _parse_s3_url(u: str) -> Tuple[str, str]:
+    """Return (bucket, key) for s3://bucket/key...; raises ValueError if malformed."""
+    u = (u or "").strip()
+    if not u.startswith("s3://"):
+        raise ValueError("not an s3:// URL")
+    rest = u[5:]
+    i = rest.find("/")
+    if i <= 0:
+        raise ValueError("missing key")
+    return rest[:i], rest[i + 1 :].lstrip("/")
+
+# ---------- parameter builders ----------
+def _bucket() -> str:
+    return os.getenv("NGIAB_S3_BUCKET", "test-ngen")
+
+def _kind_to_template(kind: str, mode: str = "real") -> str:
+    """Map UI node kind to a WorkflowTemplate name for the selected mode."""
+    mode = (mode or "real").lower()
+    # Real templates (provided)
+    REAL = {
+        "pre-process":        "ngiab-data-preprocess",
+        "preprocess":         "ngiab-data-preprocess",
+        "calibration-config": "ngiab-calibration-config",
+        "calibration-run":    "ngiab-calibration-run",
+        "run ngiab":          "ngiab-run",
+        "teehr":              "ngiab-teehr",
+        "default":            "ngiab-run",
+    }
+    # Dummy templates (adjust names to your cluster if different)
+    DUMMY = {
+        "pre-process":        "dummy-preprocess",
+        "preprocess":         "dummy-preprocess",
+        "calibration-config": "dummy-calibration-config",
+        "calibration-run":    "dummy-calibration-run",
+        "run ngiab":          "dummy-run",
+        "teehr":              "dummy-teehr",
+        "default":            "dummy-run",
+    }
+    table = REAL if mode == "real" else DUMMY
+    k = (kind or "").lower()
+    for key, tpl in table.items():
+        if key != "default" and key in k:
+            return tpl
+    return table["default"]
+
+# Pod requests per stage (cpu, memory); same defaults as the WorkflowTemplate inputs
+_STAGE_RESOURCES = {
+    "cal_run": ("2", "8Gi"),
+    "run": ("8", "8Gi"),
+    "teehr": ("1", "4Gi"),
+}
+
+
+def _resource_params(cfg: Dict[str, Any], tag: str, cpu: str | None = None) -> Dict[str, str]:
+    cpu_default, memory_default = _STAGE_RESOURCES[tag]
+    return {
+        "cpu_request": str(cfg.get("cpu_request") or cpu or cpu_default),
+        "memory_request": str(cfg.get("memory_request") or memory_default),
+    }
+
+
+def _job_root_prefix(user: str, wf_uuid: str) -> str:
+    # user/<workflow-uuid>/<argo-job-name>
+    # NOTE: {{workflow.name}} is resolved by Argo at runtime.
+    return f"{user}/{wf_uuid}/{{{{workflow.name}}}}"
+
+
+def _resolve_workflow_name_placeholder(value: str | None, argo_wf_name: str) -> str:
+    if not value:
+        return ""
+    return (
+        str(value)
+        .replace("{{workflow.name}}", argo_wf_name)
+        .replace("{{ workflow.name }}", argo_wf_name)
+    )
+
+
+def _params_for(
+    kind: str,
+    cfg: Dict[str, Any],
+    user: str,
+    wf_uuid: str,                 # <-- CHANGED: pass workflow UUID instead of run_id for paths
+    last_in_chain: bool,
+    upstream_key: Optional[str],
+    upstream_bucket: Optional[str] = None,
+) -> Dict[str, str]:
+    bucket = _bucket()
+
+    # Base output path = user/<wf-uuid>/<argo-job-name>
+    out_prefix = _job_root_prefix(user, wf_uuid)
+    final_prefix = ""             # <- requirement #3: no more /Run/Final/
+
+    k = (kind or "").lower()
+
+    if "pre-process" in k or "preprocess" in k:
+        return {
+            "output_bucket": str(cfg.get("output_bucket") or bucket),
+            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
+            "selector_type": str(cfg.get("selector_type") or "gage"),
+            "selector_value": str(cfg.get("selector_value") or "01359139"),
+            "vpu": str(cfg.get("vpu") or ""),
+            "start_date": str(cfg.get("start_date") or "2020-01-01"),
+            "end_date": str(cfg.get("end_date") or "2020-01-15"),
+            "output_name": str(cfg.get("output_name") or "ngiab"),
+            "source": str(cfg.get("source") or "nwm"),
+            "debug": str(cfg.get("debug") or "false"),
+            "all": str(cfg.get("all") or "false"),
+            "subset": str(cfg.get("subset") or "true"),
+            "forcings": str(cfg.get("forcings") or "true"),
+            "realization": str(cfg.get("realization") or "true"),
+            "run": str(cfg.get("run") or "false"),
+            "validate": str(cfg.get("validate") or "false"),
+        }
+
+    if "calibration-config" in k:
+        ibucket = str(cfg.get("input_bucket") or bucket)
+        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
+        if not ikey and cfg.get("input_s3_url"):
+            try:
+                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
+            except Exception:
+                pass
+        ikey = ikey.lstrip("/")
+        return {
+            "output_bucket": str(cfg.get("output_bucket") or bucket),
+            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
+            "final_prefix": final_prefix,
+            "input_bucket": ibucket,
+            "input_key": ikey,
+            "input_s3_key": ikey,
+            "input_s3_url": str(cfg.get("input_s3_url") or ""),
+            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
+            "gage": str(cfg.get("gage") or cfg.get("selector_value") or "01359139"),
+            "iterations": str(cfg.get("iterations") or "100"),
+            "warmup": str(cfg.get("warmup") or "365"),
+            "calibration_ratio": str(cfg.get("calibration_ratio") or "0.5"),
+            "force": str(cfg.get("force") or "false"),
+            "debug": str(cfg.get("debug") or "false"),
+            "vpu": str(cfg.get("vpu") or ""),
+        }
+
+    if "calibration-run" in k:
+        ibucket = str(cfg.get("input_bucket") or bucket)
+        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
+        if not ikey and cfg.get("input_s3_url"):
+            try:
+                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
+            except Exception:
+                pass
+        ikey = ikey.lstrip("/")
+        return {
+            "output_bucket": str(cfg.get("output_bucket") or bucket),
+            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
+            "final_prefix": final_prefix,
+            "input_bucket": ibucket,
+            "input_key": ikey,
+            "input_s3_key": ikey,
+            "input_s3_url": str(cfg.get("input_s3_url") or ""),
+            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
+            **_resource_params(cfg, "cal_run"),
+        }
+
+    if "run" in k and "ngiab" in k:
+        ibucket = str(cfg.get("input_bucket") or bucket)
+        ikey = upstream_key or str(cfg.get("input_key") or cfg.get("input_s3_key") or "")
+        if not ikey and cfg.get("input_s3_url"):
+            try:
+                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"])); ikey = _ikey
+            except Exception:
+                pass
+        ikey = ikey.lstrip("/")
+        return {
+            "output_bucket": str(cfg.get("output_bucket") or bucket),
+            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
+            "final_prefix": final_prefix,
+            "input_bucket": ibucket,
+            "input_key": ikey,
+            "input_s3_url": str(cfg.get("input_s3_url") or ""),
+            "input_subdir": str(cfg.get("input_subdir") or "ngiab"),
+            "output_name": str(cfg.get("output_name") or "ngiab"),
+            "ngen_np": str(cfg.get("ngen_np") or "8"),
+            "image_ngen": str(cfg.get("image_ngen") or "awiciroh/ciroh-ngen-image:latest"),
+            # ngen runs ngen_np MPI ranks: request one CPU per rank unless told otherwise
+            **_resource_params(cfg, "run", cpu=str(cfg.get("ngen_np") or "8")),
+        }
+    if "teehr" in k:
+        # derive input bucket/key (from upstream pointer or provided fields)
+        ibucket = str(cfg.get("input_bucket") or bucket)
+        ikey = upstream_key or str(cfg.get("input_s3_key") or cfg.get("input_key") or "")
+        if (not ikey) and cfg.get("input_s3_url"):
+            try:
+                ibucket, _ikey = _parse_s3_url(str(cfg["input_s3_url"]))
+                ikey = _ikey
+            except Exception:
+                pass
+        ikey = ikey.lstrip("/")
+
+        subdir_default = "outputs"
+        if upstream_key and not str(upstream_key).endswith("outputs.tgz"):
+            subdir_default = f"{cfg.get('input_subdir') or 'ngiab'}/outputs"
+
+        return {
+            "output_bucket": str(cfg.get("output_bucket") or upstream_bucket or bucket),
+            "output_prefix": str(cfg.get("output_prefix") or out_prefix),
+            "final_prefix": final_prefix,
+            "input_bucket": ibucket,
+            "input_s3_key": ikey,
+            "input_s3_url": str(cfg.get("input_s3_url") or ""),
+            "teehr_inputs_subdir": str(cfg.get("teehr_inputs_subdir") or subdir_default),  # <— updated default
+            "teehr_results_subdir": str(cfg.get("teehr_results_subdir") or "teehr"),
+            "teehr_args": str(cfg.get("teehr_args") or ""),
+            "image_teehr": str(cfg.get("image_teehr") or "awiciroh/ngiab-teehr:x86"),
+            **_resource_params(cfg, "teehr"),
+        }
+
+    # teehr, default, etc.
+    return {"output_bucket": bucket, "output_prefix": out_prefix, "final_prefix": final_prefix}
+
+
+# ---------- chain compilation ----------
+def _make_params(node: "NodeIR", user: str, wf_uuid: str, last_flag: bool, incoming: dict | None, branch: str) -> dict:
+    """Build params and append the branch suffix to output/final prefixes."""
+    upstream_key = None
+    if incoming and incoming.get("dataset_bucket") and incoming.get("dataset_key"):
+        upstream_key = incoming["dataset_key"]
+    upstream_bucket = incoming.get("dataset_bucket") if incoming else None
+    params = _params_for(
+        node.kind, node.config_dict(), user, wf_uuid, last_in_chain=last_flag,
+        upstream_key=upstream_key, upstream_bucket=upstream_bucket
+    )
+    # If we know the producing bucket/key, set explicit inputs for artifact binding
+    if incoming and incoming.get("dataset_bucket") and incoming.get("dataset_key"):
+        params.setdefault("input_bucket", incoming["dataset_bucket"])
+        params.setdefault("input_key", incoming["dataset_key"])
+        params.setdefault("input_s3_key", incoming["dataset_key"])
+    # unique branch path for outputs
+    base = params.get("output_prefix")
+    if base:
+        params["output_prefix"] = f"{base.rstrip('/')}/{branch}"
+    if params.get("final_prefix"):
+        params["final_prefix"] = f"{params['final_prefix'].rstrip('/')}/{branch}"
+    return params
+
+
+def _dataset_pointer_from_params(kind: str, params: dict, inherit: dict | None = None) -> dict:
+    lk = (kind or "").lower()
+    inherit = dict(inherit or {})
+    if ("preprocess" in lk) or ("pre-process" in lk):
+        inherit.update({
+            "dataset_bucket": params.get("output_bucket", ""),
+            "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/{params.get('output_name','ngiab')}.tgz",
+        })
+        return inherit
+    if "calibration-config" in lk:
+        inherit.update({
+            "dataset_bucket": params.get("output_bucket", ""),
+            "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/calibration-prepared.tgz",
+        })
+        return inherit
+    if "calibration-run" in lk:
+        inherit.update({
+            "dataset_bucket": params.get("output_bucket", ""),
+            "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/calibrated.tgz",
+        })
+        return inherit
+    if (("ngiab" in lk) and ("run" in lk)):
+        inherit.update({
+            "dataset_bucket": params.get("output_bucket", ""),
+            "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/{params.get('output_name','ngiab')}.tgz",
+        })
+        return inherit
+    if "teehr" in lk:
+        # teehr packages into teehr_results.tgz
+        inherit.update({
+            "dataset_bucket": params.get("output_bucket", ""),
+            "dataset_key": f"{params.get('output_prefix','').rstrip('/')}/teehr_results.tgz",
+        })
+        return inherit
+    return inherit
+
+
+def _is_dataset_consumer(tag: str) -> bool:
+    return tag in {"cal_cfg", "cal_run", "run", "teehr"}
+
+
+@dataclass(frozen=True)
+class NodeIR:
+    id: str
+    kind: str
+    tag: str
+    template: str
+    config: str  # canonical JSON of the node config
+
+    def config_dict(self) -> dict:
+        return json.loads(self.config)
+
+
+@dataclass(frozen=True)
+class WorkflowOptions:
+    """Workflow-level scheduling knobs (RUN_WORKFLOW ``options``, defaults from the environment)."""
+    parallelism: int = 0  # max pods of this run at once, 0 = unlimited
+    priority_class: str = ""  # PriorityClass for every pod of the run
+
+    @classmethod
+    def from_data(cls, raw: dict | None) -> "WorkflowOptions":
+        raw = raw or {}
+        parallelism = raw.get("parallelism")
+        return cls(
+            parallelism=max(int(parallelism if parallelism not in (None, "") else WORKFLOW_PARALLELISM), 0),
+            priority_class=str(raw.get("priorityClass") or raw.get("priority_class") or POD_PRIORITY_CLASS),
+        )
+
+
+@dataclass(frozen=True)
+class GraphIR:
+    """Immutable, hashable form of the part of a UI graph that determines the Argo manifest."""
+    nodes: Tuple[NodeIR, ...]
+    edges: Tuple[Tuple[str, str], ...]  # induced on ``nodes``, in UI order
+    mode: str
+    options: WorkflowOptions = WorkflowOptions()
+    # memoized outputs this compile may wire in instead of tasks: (cache_key, bucket, object_key)
+    reuse: Tuple[Tuple[str, str, str], ...] = ()
+    # clean nodes of an incremental run, fed from their recorded outputs: (node id, ((bucket, key, cache_key), ...))
+    pinned: Tuple[Tuple[str, Tuple[Tuple[str, str, str], ...]], ...] = ()
+
+    @property
+    def digest(self) -> str:
+        payload = json.dumps(
+            [
+                self.mode,
+                [list(vars(n).values()) for n in self.nodes],
+                [list(e) for e in self.edges],
+                list(vars(self.options).values()),
+                [list(r) for r in self.reuse],
+                [[nid, [list(o) for o in outs]] for nid, outs in self.pinned],
+            ],
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def user_config(cfg: dict | None) -> dict:
+    """A node config without the server-owned entries (``_runtime`` and any other ``_``-prefixed key)."""
+    return {k: v for k, v in (cfg or {}).items() if not str(k).startswith("_")}
+
+
+def graph_ir(
+    chain: list[dict],
+    edges: list | None,
+    mode: str = "real",
+    options: WorkflowOptions | None = None,
+    reuse: dict[str, tuple[str, str]] | None = None,
+    pinned: dict[str, list[tuple[str, str, str]]] | None = None,
+) -> GraphIR:
+    """
+    Freeze the chain nodes (in chain order), the edges between them, the mode and the run options.
+    ``reuse`` maps cache keys to already produced (bucket, object_key) outputs; ``pinned`` nodes
+    are not run at all and feed their recorded (bucket, object_key, cache_key) outputs downstream.
+    """
+    nodes = []
+    for n in chain:
+        kind = n.get("label") or n.get("id") or ""
+        nodes.append(NodeIR(
+            id=str(n["id"]),
+            kind=str(kind),
+            tag=_kind_tag(kind),
+            template=_kind_to_template(kind, mode),
+            config=json.dumps(user_config(n.get("config")), sort_keys=True, separators=(",", ":"), default=str),
+        ))
+    ids = {n.id for n in nodes}
+    induced = tuple((s, t) for (s, t) in _normalize_edges(edges) if s in ids and t in ids)
+    return GraphIR(
+        nodes=tuple(nodes),
+        edges=induced,
+        mode=(mode or "real").lower(),
+        options=options or WorkflowOptions(),
+        reuse=tuple(sorted((k, b, o) for k, (b, o) in (reuse or {}).items())),
+        pinned=tuple(sorted((str(nid), tuple(tuple(o) for o in outs)) for nid, outs in (pinned or {}).items())),
+    )
+
+
+def _substitute(value, user: str, wf_uuid: str):
+    if isinstance(value, str):
+        return value.replace(USER_PLACEHOLDER, user).replace(WF_UUID_PLACEHOLDER, wf_uuid)
+    if isinstance(value, dict):
+        return {k: _substitute(v, user, wf_uuid) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, user, wf_uuid) for v in value]
+    return value
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """A compiled chain with placeholders for the run-specific values. Never mutate it."""
+    digest: str
+    manifest: dict
+    tasks_by_node: dict
+    datasets_by_node: dict
+    reused_by_node: dict  # nodes with no task left: {ui node id: [pointers to the reused outputs]}
+
+    @property
+    def has_tasks(self) -> bool:
+        return bool(self.tasks_by_node)
+
+    def cache_keys(self) -> set[str]:
+        """Cache keys of every planned instance (what to look up in the memo)."""
+        pointers = [p for ps in (*self.datasets_by_node.values(), *self.reused_by_node.values()) for p in ps]
+        return {p["cache_key"] for p in pointers if p.get("cache_key")}
+
+    def render(self, user: str, wf_uuid: str) -> tuple[dict, dict[str, list[str]], dict[str, list[dict]]]:
+        """Copy of (manifest, tasks_by_node, datasets_by_node) for one run."""
+        return (
+            _substitute(self.manifest, user, wf_uuid),
+            {nid: list(names) for nid, names in self.tasks_by_node.items()},
+            _substitute(self.datasets_by_node, user, wf_uuid),
+        )
+
+
+@dataclass(frozen=True)
+class TaskSpec:
+    """One DAG task of a compiled chain, independent of how the manifest is rendered."""
+    name: str
+    template: str
+    params: Tuple[Tuple[str, str], ...]
+    dependencies: Optional[Tuple[str, ...]] = None
+    # compacted fan-out: one Argo iteration per item, params reference "{{item.<key>}}"
+    items: Optional[Tuple[Tuple[Tuple[str, str], ...], ...]] = None
+    # capped stage: the task runs inside this nested DAG instead of "main"
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class GroupSpec:
+    """Nested DAG holding one capped stage's tasks; it is a single task of "main"."""
+    name: str
+    parallelism: int
+    dependencies: Optional[Tuple[str, ...]] = None
+
+
+@dataclass
+class ChainPlan:
+    tasks: list[TaskSpec]
+    groups: list[GroupSpec]
+    tasks_by_node: dict[str, list[str]]
+    datasets_by_node: dict[str, list[dict]]
+    options: WorkflowOptions
+    reused_by_node: dict[str, list[dict]]
+
+
+def item_task_name(task: str, index: int) -> str:
+    """How one withItems iteration is tracked in tasks_by_node (Argo names it "<task>(<index>:<item>)")."""
+    return f"{task}({index})"
+
+
+def _compact(instances: list[dict]) -> tuple[tuple, tuple]:
+    """Split per-instance params into (task params, withItems items): only the differing keys become items."""
+    keys = list(dict.fromkeys(k for p in instances for k in p))
+    varying = [k for k in keys if len({p.get(k, "") for p in instances}) > 1]
+    params = tuple((k, "{{item.%s}}" % k if k in varying else instances[0].get(k, "")) for k in keys)
+    items = tuple(tuple((k, p.get(k, "")) for k in varying) for p in instances)
+    return params, items
+
+
+# Params that only say where outputs go (or how big the pod is), not what they contain
+_MEMO_IGNORED = {"output_bucket", "output_prefix", "final_prefix", "cpu_request", "memory_request"}
+# Params derived from the upstream pointer; the upstream cache key stands in for them
+_MEMO_UPSTREAM = {"input_bucket", "input_key", "input_s3_key"}
+
+
+def _cache_key(node: NodeIR, params: dict, incoming: dict | None) -> str | None:
+    """Content address of one task instance, or None when it must not be memoized."""
+    if not MEMOIZE or str(node.config_dict().get("cache", "true")).lower() in ("false", "0", "no"):
+        return None
+    ignored = set(_MEMO_IGNORED)
+    upstream = None
+    if incoming:
+        upstream = incoming.get("cache_key")
+        if not upstream:
+            return None  # input produced by an un-memoized task: content unknown
+        ignored |= _MEMO_UPSTREAM
+    payload = json.dumps(
+        [node.template, sorted((k, v) for k, v in params.items() if k not in ignored), upstream],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stage_cap(node: NodeIR) -> int:
+    """Max concurrent tasks for this node's stage (0 = no cap)."""
+    raw = node.config_dict().get("max_parallel")
+    try:
+        return max(int(raw), 0) if raw not in (None, "") else STAGE_PARALLELISM.get(node.tag, 0)
+    except (TypeError, ValueError):
+        return STAGE_PARALLELISM.get(node.tag, 0)
+
+
+def plan_chain(ir: GraphIR, user: str, wf_uuid: str) -> ChainPlan:
+    """Lay out the DAG tasks for a chain."""
+    nodes_by_id = {n.id: n for n in ir.nodes}
+    node_ids = list(nodes_by_id)
+    log.info("[DAG] UI edges (normalized): %s", list(ir.edges))
+
+    # Build parents/children maps on the induced subgraph
+    parents = {nid: [] for nid in node_ids}
+    children = {nid: [] for nid in node_ids}
+    for (s, t) in ir.edges:
+        parents[t].append(s)
+        children[s].append(t)
+
+    # Topological order
+    topo_layers = _topo_layers([{"id": nid} for nid in node_ids], list(ir.edges))
+    log.info("[DAG] topo layers: %s", topo_layers)
+
+    sinks = {nid for nid in node_ids if not children[nid]}
+
+    tasks: list[TaskSpec] = []
+    groups: list[GroupSpec] = []
+    tasks_by_node: dict[str, list[str]] = {nid: [] for nid in node_ids}
+    datasets_by_node: dict[str, list[dict]] = {nid: [] for nid in node_ids}
+    instances_by_node: dict[str, list[dict]] = {}
+    dag_task_of: dict[str, str] = {}  # instance task name -> task of "main" it runs in
+    reuse = {k: (b, o) for k, b, o in ir.reuse}
+    reused_by_node: dict[str, list[dict]] = {}
+    pinned = dict(ir.pinned)
+
+    for layer in topo_layers:
+        for nid in layer:
+            node = nodes_by_id[nid]
+            kind, tag = node.kind, node.tag
+
+            is_last = nid in sinks
+            valid_parent_ids = [pid for pid in parents[nid] if _allowed_parent(nodes_by_id[pid].tag, tag)]
+            if tag == "run" and len(valid_parent_ids) > 1:
+                valid_parent_ids.sort(key=lambda x: _parent_preference_order(nodes_by_id[x].tag))
+
+            if nid in pinned:
+                # clean node of an incremental run: its recorded outputs stand in for its tasks
+                instances_by_node[nid] = [
+                    {"dataset_bucket": b, "dataset_key": k, "cache_key": ck or None,
+                     "task": None, "kind": kind, "tag": tag, "pinned": True}
+                    for b, k, ck in pinned[nid]
+                ]
+                continue
+
+            parent_instances: list[dict] = []
+            for pid in valid_parent_ids:
+                parent_instances.extend(instances_by_node.get(pid, []))
+
+            if parent_instances and _is_dataset_consumer(tag):
+                # fan-out: one instance per upstream instance
+                branches = [(idx, pinst, (dag_task_of.get(pinst["task"]),)) for idx, pinst in enumerate(parent_instances)]
+            else:
+                # single instance (optional fan-in)
+                incoming = parent_instances[0] if len(parent_instances) == 1 else None
+                branches = [(0, incoming, tuple(dag_task_of.get(pi["task"]) for pi in parent_instances))]
+
+            base = f"t-{_slug(kind)}-{_slug(nid)}"
+            created: list[dict] = []
+            pending: list[tuple] = []  # (idx, incoming, deps, params, pointer) still to run
+            for idx, incoming, deps in branches:
+                branch = f"{base}-{idx:02d}"
+                params = _make_params(node, user, wf_uuid, is_last, incoming=incoming, branch=branch)
+                key = _cache_key(node, params, incoming)
+                if key in reuse:
+                    # memo hit: no task, downstream reads the recorded output
+                    bucket, object_key = reuse[key]
+                    pointer = dict(incoming or {})
+                    pointer.update({
+                        "dataset_bucket": bucket, "dataset_key": object_key, "cache_key": key,
+                        "task": None, "kind": kind, "tag": tag, "reused": True,
+                    })
+                    created.append(pointer)
+                    continue
+                deps = tuple(dict.fromkeys(d for d in deps if d)) or None  # reused parents have no task
+                pointer = _dataset_pointer_from_params(kind, params, inherit=incoming or {})
+                pointer.pop("reused", None)
+                pointer.pop("pinned", None)
+                pointer.update({"kind": kind, "tag": tag, "cache_key": key})
+                pending.append((idx, incoming, deps, params, pointer))
+                created.append(pointer)
+
+            compact = FANOUT_COMPACT_AT > 0 and len(pending) >= FANOUT_COMPACT_AT
+            cap = _stage_cap(node)
+            # a cap only matters when the stage has more tasks than it allows
+            group = f"g-{_slug(kind)}-{_slug(nid)}" if 0 < cap < len(pending) else None
+            all_deps = tuple(dict.fromkeys(d for p in pending for d in (p[2] or ()))) or None
+
+            for idx, incoming, deps, params, pointer in pending:
+                tname = item_task_name(base, idx) if compact else f"{base}-{idx:02d}"
+                if not compact:
+                    # inside a group the group carries the dependencies
+                    tasks.append(TaskSpec(tname, node.template, tuple(params.items()), None if group else deps, None, group))
+                dag_task_of[tname] = group or (base if compact else tname)
+                tasks_by_node[nid].append(tname)
+                pointer["task"] = tname
+
+            if compact:
+                # one templated task looping over the upstream pointers; it waits for every parent task
+                params, items = _compact([p[3] for p in pending])
+                tasks.append(TaskSpec(base, node.template, params, None if group else all_deps, items, group))
+            if group:
+                groups.append(GroupSpec(group, cap, all_deps))
+            if created and not pending:
+                reused_by_node[nid] = created
+
+            instances_by_node[nid] = created
+            datasets_by_node[nid] = created
+
+    for nid in (*reused_by_node, *pinned):
+        # nothing left to run for these (reused ones are recorded as done by the caller)
+        tasks_by_node.pop(nid, None)
+        datasets_by_node.pop(nid, None)
+    return ChainPlan(tasks, groups, tasks_by_node, datasets_by_node, ir.options, reused_by_node)
+
+
+def _task_json(t: TaskSpec) -> dict:
+    task = {
+        "arguments": {"parameters": [{"name": k, "value": v} for k, v in t.params]},
+        "name": t.name,
+        "templateRef": {"name": t.template, "template": "main"},
+    }
+    if t.dependencies:
+        task["dependencies"] = list(t.dependencies)
+    if t.items is not None:
+        task["withItems"] = [dict(item) for item in t.items]
+    return task
+
+
+def render_manifest(plan: ChainPlan, wf_uuid: str) -> dict:
+    """Argo Workflow JSON for a planned chain, built directly (same shape as the Hera rendering)."""
+    main_tasks = []
+    grouped: dict[str, list[dict]] = {g.name: [] for g in plan.groups}
+    for t in plan.tasks:
+        (grouped[t.group] if t.group else main_tasks).append(_task_json(t))
+    templates = [{"dag": {"tasks": main_tasks}, "name": "main"}]
+    for g in plan.groups:
+        group_task = {"name": g.name, "template": g.name}
+        if g.dependencies:
+            group_task["dependencies"] = list(g.dependencies)
+        main_tasks.append(group_task)
+        templates.append({"dag": {"tasks": grouped[g.name]}, "name": g.name, "parallelism": g.parallelism})
+
+    spec = {"entrypoint": "main", "templates": templates}
+    if plan.options.parallelism:
+        spec["parallelism"] = plan.options.parallelism
+    if plan.options.priority_class:
+        spec["podPriorityClassName"] = plan.options.priority_class
+    return {
+        "apiVersion": "argoproj.io/v1alpha1",
+        "kind": "Workflow",
+        "metadata": {
+            "generateName": "ngiab-chain-",
+            "labels": flowforge_labels(wf_uuid),
+            "namespace": ARGO_NAMESPACE,
+        },
+        "spec": spec,
+    }
+
+
+def _hera_task(t: TaskSpec) -> Task:
+    return Task(
+        name=t.name,
+        template_ref=TemplateRef(name=t.template, template="main"),
+        arguments=Arguments(parameters=[Parameter(name=k, value=v) for k, v in t.params]),
+        dependencies=list(t.dependencies) if t.dependencies else None,
+        with_items=[dict(item) for item in t.items] if t.items is not None else None,
+    )
+
+
+def render_hera(plan: ChainPlan, wf_uuid: str) -> Workflow:
+    """The same chain built through Hera models (reference rendering, FLOWFORGE_MANIFEST_RENDERER=hera)."""
+    with Workflow(
+        generate_name="ngiab-chain-",
+        entrypoint="main",
+        namespace=ARGO_NAMESPACE,
+        labels=flowforge_labels(wf_uuid),
+        parallelism=plan.options.parallelism or None,
+        pod_priority_class_name=plan.options.priority_class or None,
+    ) as w:
+        with DAG(name="main"):
+            for t in plan.tasks:
+                if not t.group:
+                    _hera_task(t)
+            for g in plan.groups:
+                Task(name=g.name, template=g.name, dependencies=list(g.dependencies) if g.dependencies else None)
+        for g in plan.groups:
+            with DAG(name=g.name, parallelism=g.parallelism):
+                for t in plan.tasks:
+                    if t.group == g.name:
+                        _hera_task(t)
+    return w
+
+
+def _compile(ir: GraphIR) -> CompiledWorkflow:
+    user, wf_uuid = USER_PLACEHOLDER, WF_UUID_PLACEHOLDER
+    plan = plan_chain(ir, user, wf_uuid)
+    if MANIFEST_RENDERER == "hera":
+        manifest = render_hera(plan, wf_uuid).to_dict()
+    else:
+        manifest = render_manifest(plan, wf_uuid)
+    return CompiledWorkflow(
+        digest=ir.digest,
+        manifest=manifest,
+        tasks_by_node=plan.tasks_by_node,
+        datasets_by_node=plan.datasets_by_node,
+        reused_by_node=plan.reused_by_node,
+    )
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _compile_cached(ir: GraphIR) -> CompiledWorkflow:
+    return _compile(ir)
+
+
+def compile_chain(
+    chain: list[dict],
+    edges: list | None,
+    mode: str = "real",
+    options: WorkflowOptions | None = None,
+    reuse: dict[str, tuple[str, str]] | None = None,
+    pinned: dict[str, list[tuple[str, str, str]]] | None = None,
+) -> CompiledWorkflow:
+    """Compiled manifest for a chain, from the LRU when this graph+config was compiled before."""
+    return _compile_cached(graph_ir(chain, edges, mode, options, reuse, pinned))
+
+
+def dirty_nodes(previous: dict | None, nodes: list[dict], edges: list | None, done: set[str]) -> set[str]:
+    """
+    Nodes of ``nodes`` that must run again compared to the ``previous`` stored graph: new nodes,
+    nodes whose kind, config or parent set changed, nodes not in ``done`` (no successful recorded
+    output) -- and every descendant of those. Server-owned config keys are not compared.
+    """
+    prev_nodes = {str(n.get("id")): n for n in (previous or {}).get("nodes") or []}
+    prev_parents: dict[str, set[str]] = {}
+    for s, t in _normalize_edges((previous or {}).get("edges")):
+        prev_parents.setdefault(t, set()).add(s)
+
+    ids = {str(n["id"]) for n in nodes}
+    parents: dict[str, set[str]] = {nid: set() for nid in ids}
+    children: dict[str, list[str]] = {nid: [] for nid in ids}
+    for s, t in _normalize_edges(edges):
+        if s in ids and t in ids:
+            parents[t].add(s)
+            children[s].append(t)
+
+    def _canon(cfg) -> str:
+        return json.dumps(user_config(cfg), sort_keys=True, separators=(",", ":"), default=str)
+
+    changed = set()
+    for n in nodes:
+        nid = str(n["id"])
+        before = prev_nodes.get(nid)
+        if (
+            before is None
+            or nid not in done
+            or (before.get("label") or before.get("id")) != (n.get("label") or n.get("id"))
+            or _canon(before.get("config")) != _canon(n.get("config"))
+            or prev_parents.get(nid, set()) != parents[nid]
+        ):
+            changed.add(nid)
+
+    dirty, stack = set(), list(changed)
+    while stack:
+        nid = stack.pop()
+        if nid not in dirty:
+            dirty.add(nid)
+            stack.extend(children[nid])
+    return dirty
+
+
+def create_workflow(manifest: dict) -> str:
+    """Submit a rendered manifest on the pooled session (blocking; run it through ``argo_call``); returns its name."""
+    namespace = manifest.get("metadata", {}).get("namespace") or ARGO_NAMESPACE
+    created = post_json(f"api/v1/workflows/{namespace}", {"workflow": manifest})
+    return created["metadata"]["name"]
@@ -0,0 +1,145 @@
+# tethysapp/flowforge/consumers/leadership.py
+"""
+Cross-replica ownership of Argo status watchers.
+
+Several ASGI replicas (or watcher daemons) may all be asked to watch the same
+Argo Workflow. Each one first tries ``pg_try_advisory_lock`` on a key derived
+from the Argo Workflow name; only the holder runs the watcher, the others
+stand by and retry every LEASE_RETRY_SEC. Locks are session-level and live on
+one dedicated connection per process: if a replica dies, Postgres drops its
+connection and its locks, and a standby takes over on its next retry. A
+heartbeat on that connection notices when *we* lost it and demotes every
+watcher we were leading.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+
+from ..argo.config import LEASE_HEARTBEAT_SEC, LEASE_RETRY_SEC
+from .handlers.model_run_handler import get_async_engine
+
+log = logging.getLogger(__name__)
+
+
+def lease_key(name: str) -> int:
+    """Signed 64-bit advisory-lock key for an Argo Workflow name."""
+    digest = hashlib.sha1(f"flowforge-watch:{name}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class AdvisoryLeases:
+    """Advisory locks held on one dedicated DB connection for this process."""
+
+    def __init__(self):
+        self._conn = None
+        self._io = asyncio.Lock()  # one statement at a time on the shared connection
+        self._held: dict[str, asyncio.Event] = {}  # key -> "lost" event
+        self._heartbeat: asyncio.Task | None = None
+
+    async def _connection(self):
+        if self._conn is None or self._conn.closed:
+            engine = await get_async_engine()
+            self._conn = await engine.connect()
+            # autocommit: advisory locks are session-scoped, keep no transaction open
+            await self._conn.execution_options(isolation_level="AUTOCOMMIT")
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._beat(), name="flowforge-lease-heartbeat")
+        return self._conn
+
+    async def try_acquire(self, name: str) -> asyncio.Event | None:
+        """Take the lease for ``name``; returns an Event set if the lease is lost, or None if someone else holds it."""
+        async with self._io:
+            conn = await self._connection()
+            got = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:k)"), {"k": lease_key(name)}
+            )).scalar()
+        if not got:
+            return None
+        lost = self._held[name] = asyncio.Event()
+        return lost
+
+    async def release(self, name: str) -> None:
+        if self._held.pop(name, None) is None:
+            return
+        try:
+            async with self._io:
+                if self._conn is not None and not self._conn.closed:
+                    await self._conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": lease_key(name)})
+        except Exception as e:
+            log.warning("[leases] could not release %s: %s", name, e)
+
+    async def _beat(self) -> None:
+        while self._held or self._conn is not None:
+            await asyncio.sleep(LEASE_HEARTBEAT_SEC)
+            try:
+                async with self._io:
+                    await self._conn.execute(text("SELECT 1"))
+            except Exception as e:
+                log.warning("[leases] lease connection lost (%s); standing down %d watcher(s)", e, len(self._held))
+                self._drop_all()
+                return
+
+    def _drop_all(self) -> None:
+        conn, self._conn = self._conn, None
+        for lost in self._held.values():
+            lost.set()
+        self._held.clear()
+        if conn is not None:
+            asyncio.create_task(self._close_quietly(conn))
+
+    @staticmethod
+    async def _close_quietly(conn) -> None:
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+
+leases = AdvisoryLeases()
+
+
+async def run_as_leader(
+    name: str,
+    body: Callable[[], Awaitable[None]],
+    still_wanted: Callable[[], Awaitable[bool]],
+) -> None:
+    """
+    Run ``body()`` only while this process holds the lease for ``name``.
+    Standby replicas poll for the lease until ``still_wanted()`` says the
+    workflow no longer needs watching; a lost lease cancels the body and we
+    go back to standby.
+    """
+    while True:
+        try:
+            lost = await leases.try_acquire(name)
+        except Exception as e:
+            log.warning("[leases] lease check for %s failed: %s", name, e)
+            lost = None
+
+        if lost is not None:
+            log.info("[leases] leading watcher for %s", name)
+            task = asyncio.create_task(body(), name=f"lead:{name}")
+            waiter = asyncio.create_task(lost.wait())
+            try:
+                await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+                if not task.done():
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                await leases.release(name)
+            if not lost.is_set():
+                task.result()  # surface the watcher's own error to the registry
+                return
+
+        await asyncio.sleep(LEASE_RETRY_SEC)
+        try:
+            if not await still_wanted():
+                return
+        except Exception as e:
+            log.warning("[leases] standby check for %s failed: %s", name, e)
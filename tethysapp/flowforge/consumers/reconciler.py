@@ -0,0 +1,141 @@
+# tethysapp/flowforge/consumers/reconciler.py
+"""
+Startup reconciliation of workflows the DB still thinks are running.
+
+Watchers used to come back only when someone reopened a workflow
+(GET_WORKFLOW); anything nobody looked at again stayed "running" forever.
+Once per process (web server or watcher daemon boot, see services.py) we:
+  1. load every running/queued Workflow row with its `argo_workflow` and
+     `_runtime.tasks` (see active_watch_specs),
+  2. read all FlowForge-managed Argo Workflows with ONE labelled list call,
+  3. finalize rows whose Argo run is terminal or gone, in one transaction each,
+  4. start watchers only for runs that are still active.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from uuid import UUID
+
+import requests
+from sqlalchemy import select
+
+from ..argo.attribution import TaskAttribution
+from ..argo.client import argo_call, get_json
+from ..argo.config import ARGO_NAMESPACE, LABEL_MANAGED
+from ..argo.events import node_phases
+from ..model import Node as NodeModel
+from .handlers.model_run_handler import get_async_sessionmaker
+from .handlers.ngiab_backend_handler import (
+    _TERMINAL,
+    _NodeStatusBatch,
+    active_watch_specs,
+    start_status_watcher,
+)
+
+log = logging.getLogger(__name__)
+
+_LIST_FIELDS = "items.metadata.name,items.status.phase,items.status.nodes"
+_GET_FIELDS = "metadata.name,status.phase,status.nodes"
+
+
+async def _read_missing(name: str) -> dict | None:
+    """Direct read for a run the labelled listing did not return (e.g. submitted before labels); None if gone."""
+    try:
+        return await argo_call(get_json, f"api/v1/workflows/{ARGO_NAMESPACE}/{name}", {"fields": _GET_FIELDS})
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+
+
+async def _finalize(spec: dict, phase: str | None, phases: dict[str, str]) -> str | None:
+    """Write final node statuses for a terminal (or vanished) Argo run; returns the aggregate status."""
+    wf_id = UUID(spec["workflow_id"])
+    argo_wf_name = spec["argo_workflow"]
+    attribution = TaskAttribution(spec.get("tasks") or {}, workflow_name=argo_wf_name)
+    attribution.apply(phases)
+    reason = f"argo: {phase}" if phase else "argo workflow not found"
+
+    batch = _NodeStatusBatch(wf_id)
+    SessionFactory = await get_async_sessionmaker()
+    async with SessionFactory() as session:
+        current = dict((await session.execute(
+            select(NodeModel.name, NodeModel.status).where(NodeModel.workflow_id == wf_id)
+        )).all())
+        for ui in attribution.nodes():
+            if not attribution.expected.get(ui):
+                continue  # not part of this run
+            status = attribution.status(ui)
+            message = status
+            if status == "running":
+                status, message = "error", reason  # the run is over; this node never finished
+            if current.get(ui) == status:
+                continue
+            batch.set_status(ui, status, message)
+            if status == "success":
+                batch.add_node_outputs(ui, (spec.get("datasets") or {}).get(ui), spec.get("user") or "", argo_wf_name)
+        return await batch.flush(session)
+
+
+async def reconcile_active_workflows() -> dict[str, int]:
+    """Finalize finished runs and re-attach watchers to active ones; returns counts per outcome."""
+    counts = {"watching": 0, "finalized": 0, "missing": 0}
+    SessionFactory = await get_async_sessionmaker()
+    async with SessionFactory() as session:
+        specs = await active_watch_specs(session)
+    if not specs:
+        return counts
+
+    listing = await argo_call(
+        get_json,
+        f"api/v1/workflows/{ARGO_NAMESPACE}",
+        {"listOptions.labelSelector": f"{LABEL_MANAGED}=true", "fields": _LIST_FIELDS},
+    )
+    by_name = {
+        (wf.get("metadata") or {}).get("name"): wf
+        for wf in (listing or {}).get("items") or []
+    }
+
+    for spec in specs:
+        name = spec["argo_workflow"]
+        try:
+            wf = by_name[name] if name in by_name else await _read_missing(name)
+            if wf is None:
+                await _finalize(spec, None, {})
+                counts["missing"] += 1
+                continue
+            phase = (wf.get("status") or {}).get("phase")
+            if phase in _TERMINAL:
+                await _finalize(spec, phase, node_phases(wf))
+                counts["finalized"] += 1
+                continue
+        except Exception:
+            log.exception("[reconcile] could not reconcile %s; watching it instead", name)
+        if start_status_watcher(spec):
+            counts["watching"] += 1
+    return counts
+
+
+_reconcile_task: asyncio.Task | None = None
+_RETRY_SEC = 30.0
+
+
+async def _reconcile_logged() -> None:
+    # Runs once at startup; nothing else will trigger it again, so retry until it goes through
+    while True:
+        try:
+            counts = await reconcile_active_workflows()
+            log.info("[reconcile] startup reconciliation done: %s", counts)
+            return
+        except Exception:
+            log.exception("[reconcile] startup reconciliation failed; retrying in %.0fs", _RETRY_SEC)
+        await asyncio.sleep(_RETRY_SEC)
+
+
+def reconcile_once() -> asyncio.Task:
+    """Schedule the startup reconciliation the first time this is called in a process."""
+    global _reconcile_task
+    if _reconcile_task is None:
+        _reconcile_task = asyncio.create_task(_reconcile_logged(), name="flowforge-reconcile")
+    return _reconcile_task
@@ -0,0 +1,79 @@
+# tethysapp/flowforge/consumers/services.py
+"""
+Per-process background services: startup reconciliation, the WorkflowTemplate
+refresher and the submission-queue dispatcher.
+
+They must not wait for a browser: after a restart nothing would be reconciled,
+provisioned or dispatched until someone opened the app. So they start with the
+process instead:
+  - web processes schedule them onto the server's event loop when the
+    websocket routes are loaded (``schedule_background_services``),
+  - the watcher daemon starts them at boot.
+``start_background_services`` is guarded so each process starts them once.
+Tables added after the store was initialized are created first (ensure_schema).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+
+from ..argo.config import FLOWFORGE_WATCHER_MODE
+
+log = logging.getLogger(__name__)
+
+_started = False
+_lock = threading.Lock()
+
+
+async def _start_services(reconcile: bool) -> None:
+    from ..argo.templates import start_template_refresher
+    from ..model.init_db import ensure_schema
+    from .admission import submission_queue
+    from .handlers.model_run_handler import get_async_engine
+    from .reconciler import reconcile_once
+
+    try:
+        # stores initialized before a table existed (submission_queue, ...) get it now
+        await ensure_schema(await get_async_engine())
+    except Exception:
+        log.exception("[services] could not create missing tables")
+    if reconcile:
+        reconcile_once()
+    # Templates synced up front (and kept fresh) so submits never wait on them
+    start_template_refresher()
+    # Every process competes for the submission-queue dispatcher lease
+    submission_queue.start()
+    log.info("[services] background services started")
+
+
+def start_background_services(reconcile: bool = True) -> asyncio.Task | None:
+    """Start the services on the running loop, once per process; the startup task, or None if already started."""
+    global _started
+    with _lock:
+        if _started:
+            return None
+        _started = True
+    return asyncio.create_task(_start_services(reconcile), name="flowforge-services")
+
+
+def _server_loop() -> asyncio.AbstractEventLoop | None:
+    # Daphne runs the ASGI application on the loop behind its Twisted reactor
+    daphne_server = sys.modules.get("daphne.server")
+    return getattr(daphne_server, "twisted_loop", None)
+
+
+def schedule_background_services() -> bool:
+    """
+    In a web server process, start the services as soon as its loop runs.
+
+    Management commands, tests and other tools may load the routes (and Daphne)
+    too, but never run the server loop, so the queued start never fires there.
+    """
+    loop = _server_loop()
+    if loop is None or loop.is_closed():
+        return False
+    # The watcher daemon does its own reconciliation
+    loop.call_soon_threadsafe(start_background_services, FLOWFORGE_WATCHER_MODE != "daemon")
+    return True
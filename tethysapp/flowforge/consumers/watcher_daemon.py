@@ -0,0 +1,84 @@
+# tethysapp/flowforge/consumers/watcher_daemon.py
+"""
+Standalone home for Argo status watchers (FLOWFORGE_WATCHER_MODE=daemon).
+
+Web workers send ``watch.start`` (and ``watch.stop`` on cancel) messages on
+WATCHER_CHANNEL; this process runs
+one watcher per Argo Workflow, writes status to the DB and publishes frames on
+each workflow's channel-layer group, which the web workers only relay. A
+periodic sweep re-adopts every running/queued workflow from the DB, so nothing
+is lost if a message is dropped or the daemon restarts (at boot, the startup
+reconciler finalizes runs that ended while nobody was watching). The daemon
+also runs the template refresher and competes for the submission-queue lease
+(see services.py), so queued runs dispatch even before any web worker is up.
+
+Run it from the portal's Django project:
+    python manage.py flowforge_watcher
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+
+from tethysapp.flowforge.app import App
+from ..argo.config import WATCHER_CHANNEL, WATCHER_SWEEP_SEC
+from ..argo.events import stop_event_streams
+from ..argo.registry import watchers
+from .handlers.model_run_handler import get_async_sessionmaker
+from .handlers.ngiab_backend_handler import active_watch_specs, start_status_watcher
+from .reconciler import reconcile_active_workflows
+from .services import start_background_services
+
+log = logging.getLogger(__name__)
+
+
+async def sweep_active_workflows() -> int:
+    """Start watchers for every active workflow in the DB; returns how many were started."""
+    SessionFactory = await get_async_sessionmaker()
+    async with SessionFactory() as session:
+        specs = await active_watch_specs(session)
+    return sum(1 for spec in specs if start_status_watcher(spec))
+
+
+async def _sweep_forever() -> None:
+    while True:
+        try:
+            started = await sweep_active_workflows()
+            if started:
+                log.info("[watcher-daemon] adopted %d workflow(s) from the DB", started)
+        except Exception:
+            log.exception("[watcher-daemon] DB sweep failed")
+        await asyncio.sleep(WATCHER_SWEEP_SEC)
+
+
+async def run_watcher_daemon() -> None:
+    """Serve watch requests from the web workers until cancelled."""
+    layer = get_channel_layer(App.package)
+    try:
+        log.info("[watcher-daemon] reconciled active workflows: %s", await reconcile_active_workflows())
+    except Exception:
+        log.exception("[watcher-daemon] startup reconciliation failed; the DB sweep will adopt them")
+    start_background_services(reconcile=False)
+    sweeper = asyncio.create_task(_sweep_forever(), name="watcher-daemon-sweep")
+    log.info("[watcher-daemon] listening on channel '%s'", WATCHER_CHANNEL)
+    try:
+        while True:
+            message = await layer.receive(WATCHER_CHANNEL)
+            if message.get("type") == "watch.stop":
+                if watchers.cancel(message.get("argo_workflow") or ""):
+                    log.info("[watcher-daemon] stopped watching %s", message.get("argo_workflow"))
+                continue
+            if message.get("type") != "watch.start":
+                continue
+            try:
+                if start_status_watcher(message):
+                    log.info("[watcher-daemon] watching %s (%d active)", message.get("argo_workflow"), len(watchers.keys()))
+            except Exception:
+                log.exception("[watcher-daemon] bad watch request: %s", message.get("argo_workflow"))
+    finally:
+        sweeper.cancel()
+        for key in watchers.keys():
+            watchers.cancel(key)
+        stop_event_streams()
@@ -9,10 +9,15 @@ from tethys_sdk.routing import consumer
 
 from .backend_actions import BackendActions
 from .handlers import NgiabBackendHandler, HomeImportHandler
+from ..argo.registry import workflow_group
+from .services import schedule_background_services
 from tethysapp.flowforge.app import App
 
 log = logging.getLogger(__name__)
 
+# Reconciler, template refresher and queue dispatcher start with the server, not on a connect
+schedule_background_services()
+
 
 @consumer(name="flowforge", url="flowforge")
 class BackendConsumer(AsyncConsumer):
@@ -32,6 +37,8 @@ class BackendConsumer(AsyncConsumer):
 
         # Join a broadcast group (optional; useful for server->all pushes)
         self.group_name = "workflows"
+        # Status group of the workflow this socket is currently showing (see follow_workflow)
+        self.workflow_group_name = None
         await self.channel_layer.group_add(self.group_name, self.channel_name)
 
         # Accept connection
@@ -41,6 +48,8 @@ class BackendConsumer(AsyncConsumer):
     async def websocket_disconnect(self, close_code):
         try:
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            if self.workflow_group_name:
+                await self.channel_layer.group_discard(self.workflow_group_name, self.channel_name)
         finally:
             log.debug("WebSocket disconnected")
 
@@ -103,6 +112,21 @@ class BackendConsumer(AsyncConsumer):
             event_summary = event if "bytes" not in event else f"BYTES: {len(event['bytes'])}"
             log.exception(f"Unexpected error while handling message: {event_summary}")
 
+    # ---- Workflow status fan-out ------------------------------------------------
+    async def follow_workflow(self, wf_id):
+        """Receive status frames of `wf_id` (and stop receiving the previously followed one)."""
+        group = workflow_group(wf_id)
+        if group == self.workflow_group_name:
+            return
+        if self.workflow_group_name:
+            await self.channel_layer.group_discard(self.workflow_group_name, self.channel_name)
+        await self.channel_layer.group_add(group, self.channel_name)
+        self.workflow_group_name = group
+
+    async def flowforge_relay(self, event):
+        """Channel-layer message {"type": "flowforge.relay"} from a shared watcher -> websocket frame."""
+        await self.send_action(event.get("action"), event.get("payload"))
+
     # ---- Utilities for handlers ------------------------------------------------
     async def send_action(self, action: BackendActions | str, payload):
         """Send an action to the frontend as a JSON text frame."""
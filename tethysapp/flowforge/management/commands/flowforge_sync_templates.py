@@ -0,0 +1,16 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Create or update every packaged FlowForge WorkflowTemplate in Argo (real and dummy modes)."
+
+    def handle(self, *args, **options):
+        from tethysapp.flowforge.argo.templates import provision_templates
+
+        results = asyncio.run(provision_templates())
+        for name, outcome in sorted(results.items()):
+            self.stdout.write(f"{name}: {outcome}")
+        if any(outcome.startswith("error") for outcome in results.values()):
+            raise SystemExit(1)
@@ -0,0 +1,16 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Run FlowForge's Argo status watchers outside the web workers (FLOWFORGE_WATCHER_MODE=daemon)."
+
+    def handle(self, *args, **options):
+        from tethysapp.flowforge.consumers.watcher_daemon import run_watcher_daemon
+
+        self.stdout.write("FlowForge watcher daemon starting...")
+        try:
+            asyncio.run(run_watcher_daemon())
+        except KeyboardInterrupt:
+            self.stdout.write("FlowForge watcher daemon stopped.")
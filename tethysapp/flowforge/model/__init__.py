@@ -7,8 +7,9 @@ from .workflow_template import WorkflowTemplate
 from .workflow import Workflow
 from .node import Node
 from .virtual_output import VirtualOutput
+from .submission import Submission
 
-__all__ = ["Base", "WorkflowTemplate", "Workflow", "Node", "VirtualOutput"]
+__all__ = ["Base", "WorkflowTemplate", "Workflow", "Node", "VirtualOutput", "Submission"]
 
 
 log = logging.getLogger(__name__)
@@ -23,5 +24,5 @@ def _log_after_insert(mapper, connection, target):
     log.info("Created %s (id=%s)", target.__class__.__name__, identity)
 
 
-for _model in (WorkflowTemplate, Workflow, Node, VirtualOutput):
+for _model in (WorkflowTemplate, Workflow, Node, VirtualOutput, Submission):
     event.listen(_model, "after_insert", _log_after_insert)
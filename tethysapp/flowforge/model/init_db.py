@@ -20,3 +20,12 @@ def create_tables(engine, first_time: bool = False):
         session = SessionMaker()
         session.close()
         print("Finishing Initializing Persistent Storage")
+
+
+async def ensure_schema(engine) -> None:
+    """
+    Create tables added after the store was initialized (e.g. submission_queue) on an async
+    engine; create_all leaves existing tables alone, so this is safe on every startup.
+    """
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,32 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.types import JSON
+
+from .__base import Base
+
+
+class Submission(Base):
+    """One queued Argo submission (a chain run or an ad-hoc node run) waiting for admission."""
+
+    __tablename__ = "submission_queue"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workflow_id = Column(UUID(as_uuid=True), ForeignKey("workflow.id", ondelete="CASCADE"), nullable=False, index=True)
+    user = Column(String(255), nullable=False, index=True)
+
+    kind = Column(String(32), nullable=False)      # chain|node
+    priority = Column(Integer, nullable=False, default=0)  # higher goes first
+    payload = Column(JSON, nullable=False)          # everything the dispatcher needs to submit
+    node_ids = Column(JSON, nullable=True)          # UI nodes that get queue-position updates
+
+    status = Column(String(32), nullable=False, default="queued", index=True)  # queued|dispatched|submitting|cancelled
+    message = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<Submission id={self.id} workflow_id={self.workflow_id} user='{self.user}' status='{self.status}'>"
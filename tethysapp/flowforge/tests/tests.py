@@ -1,11 +1,171 @@
 # Most of your test classes should inherit from TethysTestCase
+import asyncio
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+import requests
+from hera.exceptions import NotFound
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.orm import Session
 from tethys_sdk.testing import TethysTestCase
 
+from tethysapp.flowforge.argo import client as argo_client
+from tethysapp.flowforge.argo.attribution import TaskAttribution
+from tethysapp.flowforge.argo import schedule
+from tethysapp.flowforge.argo import limits
+from tethysapp.flowforge.argo.limits import ArgoUnavailable, CircuitBreaker, RateLimiter
+from tethysapp.flowforge.consumers import admission, leadership, services
+from tethysapp.flowforge.consumers.admission import admission_order
+from tethysapp.flowforge.argo.jobs import SubmissionJob
+from tethysapp.flowforge.consumers.handlers import ngiab_backend_handler as backend
+from tethysapp.flowforge.consumers.handlers.ngiab_backend_handler import (
+    _NodeStatusBatch,
+    _aggregate_status_sql,
+    _forget_argo_run,
+    _runtime_watch_spec,
+)
+from tethysapp.flowforge.consumers.handlers import ngiab_compiler
+from tethysapp.flowforge.consumers.handlers.ngiab_compiler import (
+    WorkflowOptions,
+    dirty_nodes,
+    graph_ir,
+    plan_chain,
+    render_hera,
+    render_manifest,
+)
+from tethysapp.flowforge.model import Base, Node, Submission, Workflow, WorkflowTemplate
+
 # For testing rendered HTML templates it may be helpful to use BeautifulSoup.
 # from bs4 import BeautifulSoup
 # For help, see https://www.crummy.com/software/BeautifulSoup/bs4/doc/
 
 
+class _Rows:
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def all(self):
+        return self.rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
+
+
+class _RecordingSession:
+    """AsyncSession stand-in: records statements and commits, hands back the given rows in order."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.statements = []
+        self.added = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return _Rows(self.results.pop(0) if self.results else [])
+
+    def add_all(self, rows):
+        self.added.extend(rows)
+
+    async def commit(self):
+        self.commits += 1
+
+
+class _BoolOr:
+    def __init__(self):
+        self.value = False
+
+    def step(self, value):
+        self.value = self.value or bool(value)
+
+    def finalize(self):
+        return self.value
+
+
+class _BoolAnd(_BoolOr):
+    def __init__(self):
+        self.value = True
+
+    def step(self, value):
+        self.value = self.value and bool(value)
+
+
+def _sqlite_engine():
+    """In-memory engine with the workflow tables and Postgres' bool_or/bool_and aggregates."""
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _aggregates(dbapi_connection, _):
+        dbapi_connection.create_aggregate("bool_or", 1, _BoolOr)
+        dbapi_connection.create_aggregate("bool_and", 1, _BoolAnd)
+
+    Base.metadata.create_all(
+        engine, tables=[WorkflowTemplate.__table__, Workflow.__table__, Node.__table__, Submission.__table__],
+    )
+    return engine
+
+
+class _AsyncSession:
+    """AsyncSession over a sync SQLite one (no async SQLite driver here), for driving handlers."""
+
+    def __init__(self, session):
+        self.sync = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement, *args, **kwargs):
+        return self.sync.execute(statement, *args, **kwargs)
+
+    async def commit(self):
+        self.sync.commit()
+
+    async def flush(self):
+        self.sync.flush()
+
+    async def refresh(self, obj):
+        self.sync.refresh(obj)
+
+    def add(self, obj):
+        self.sync.add(obj)
+
+    def add_all(self, objs):
+        self.sync.add_all(objs)
+
+
+def _handler(session):
+    """NgiabBackendHandler on a fake consumer, whose action handlers use ``session``."""
+    consumer = mock.Mock(
+        send_action=mock.AsyncMock(), send_error=mock.AsyncMock(), follow_workflow=mock.AsyncMock(), scope={"user": None},
+    )
+    handler = backend.NgiabBackendHandler(consumer)
+    handler.get_sessionmaker = mock.AsyncMock(return_value=lambda: _AsyncSession(session))
+    return handler, consumer
+
+
+def _seed_workflow(session, status, argo_name, nodes):
+    """A workflow row with ``nodes`` = [(name, status, runtime tasks)]; returns it."""
+    wf = Workflow(name="wf", user="joe", status=status,
+                  message=json.dumps({"argo_workflow": argo_name}) if argo_name else None,
+                  graph={"nodes": [{"id": n, "label": n, "config": {}} for n, _, _ in nodes], "edges": []})
+    session.add(wf)
+    session.flush()
+    session.add_all(
+        Node(workflow_id=wf.id, name=name, kind="Run NGIAB", user="joe", status=st, order_index=i,
+             config={"_runtime": {"tasks": tasks, "datasets": []}})
+        for i, (name, st, tasks) in enumerate(nodes)
+    )
+    session.commit()
+    return wf
+
+
 """
 To run tests for an app:
 
@@ -140,4 +300,719 @@ class FlowforgeTestCase(TethysTestCase):
 
         context = response.context
         self.assertEqual(context['my_integer'], 10)
-        '''
\ No newline at end of file
+        '''
+
+    def test_direct_manifest_matches_hera(self):
+        """
+        The direct JSON renderer must produce exactly what the Hera models would, fan-out included.
+        """
+        chain = [
+            {"id": "pre-a", "label": "Pre-Process", "config": {"selector_value": "01359139"}},
+            {"id": "pre-b", "label": "Pre-Process", "config": {"selector_value": "01013500"}},
+            {"id": "cal", "label": "Calibration-Config", "config": {"iterations": "10"}},
+            {"id": "run", "label": "Run NGIAB", "config": {}},
+            {"id": "teehr", "label": "TEEHR", "config": {}},
+        ]
+        edges = [
+            {"source": "pre-a", "target": "cal"},
+            {"source": "pre-b", "target": "cal"},
+            {"source": "cal", "target": "run"},
+            {"source": "run", "target": "teehr"},
+        ]
+        plan = plan_chain(graph_ir(chain, edges), "joe", "wf-uuid")
+
+        self.assertEqual(render_manifest(plan, "wf-uuid"), render_hera(plan, "wf-uuid").to_dict())
+        self.assertEqual(len(plan.tasks_by_node["teehr"]), 2)
+
+    def test_fanout_compaction(self):
+        """
+        A large fan-out becomes one withItems task that waits for every parent of its members and
+        whose iterations still attribute to the right UI node; a smaller one stays expanded.
+        """
+        def plan_for(fan):
+            chain = [{"id": f"pre-{i}", "label": "Pre-Process", "config": {"vpu": str(i)}} for i in range(fan)]
+            chain.append({"id": "cal", "label": "Calibration-Config", "config": {}})
+            chain.append({"id": "run", "label": "Run NGIAB", "config": {}})
+            edges = [{"source": f"pre-{i}", "target": "cal"} for i in range(fan)]
+            edges.append({"source": "cal", "target": "run"})
+            return plan_chain(graph_ir(chain, edges), "joe", "wf-uuid")
+
+        with mock.patch.object(ngiab_compiler, "FANOUT_COMPACT_AT", 3):
+            plan = plan_for(3)
+            small = plan_for(2)
+        manifest = render_manifest(plan, "wf-uuid")
+        self.assertEqual(manifest, render_hera(plan, "wf-uuid").to_dict())
+        by_name = {t["name"]: t for t in manifest["spec"]["templates"][0]["dag"]["tasks"]}
+
+        self.assertEqual(len(by_name["t-calibration-config-cal"]["withItems"]), 3)
+        self.assertEqual(
+            sorted(by_name["t-calibration-config-cal"]["dependencies"]),
+            [f"t-pre-process-pre-{i}-00" for i in range(3)],
+        )
+        self.assertEqual(len(by_name["t-run-ngiab-run"]["withItems"]), 3)
+        self.assertEqual(by_name["t-run-ngiab-run"]["dependencies"], ["t-calibration-config-cal"])
+        self.assertEqual(plan.tasks_by_node["run"][1], "t-run-ngiab-run(1)")
+        attribution = TaskAttribution(plan.tasks_by_node, workflow_name="ngiab-chain-abc")
+        self.assertEqual(
+            attribution.resolve("ngiab-chain-abc.t-run-ngiab-run(1:input_key=joe/x.tgz)"),
+            ("run", "t-run-ngiab-run(1)"),
+        )
+
+        small_tasks = {t.name for t in small.tasks}
+        self.assertIn("t-run-ngiab-run-01", small_tasks)
+        self.assertTrue(all(t.items is None for t in small.tasks))
+
+    def test_admission_fair_share(self):
+        """
+        A user with a big backlog takes turns with everyone else and caps hold; a priority only
+        reorders that user's own runs.
+        """
+        from types import SimpleNamespace
+
+        rows = [SimpleNamespace(user="sweep", priority=0, created_at=i) for i in range(10)]
+        rows[5].priority = 3
+        rows.append(SimpleNamespace(user="ann", priority=0, created_at=10))
+        rows.append(SimpleNamespace(user="bob", priority=10, created_at=11))
+
+        admit, waiting = admission_order(rows, {"sweep": 1}, max_inflight=4, max_per_user=2)
+
+        self.assertEqual([r.user for r in admit], ["ann", "bob", "sweep"])
+        self.assertEqual(admit[-1].created_at, 5)
+        self.assertEqual([r.created_at for r in waiting], [0, 1, 2, 3, 4, 6, 7, 8, 9])
+
+    def test_status_batch_is_one_transaction(self):
+        """
+        A watcher tick (node statuses, upstream failures, outputs, workflow aggregate) commits once.
+        """
+        wf_id, node_a = uuid.uuid4(), uuid.uuid4()
+        batch = _NodeStatusBatch(wf_id)
+        batch.set_status("a", "success", "success")
+        batch.set_status("b", "error", "error")
+        batch.add_node_outputs("a", [{"dataset_bucket": "bkt", "dataset_key": "joe/a.tgz"}], "joe", "ngiab-chain-abc")
+        batch.fail_remaining("upstream failure")
+        # rows returned by: node UPDATE, fail UPDATE .. RETURNING, node id SELECT, workflow UPDATE .. RETURNING
+        session = _RecordingSession([], [("c",)], [("a", node_a)], [("error",)])
+
+        agg = asyncio.run(batch.flush(session))
+
+        self.assertEqual(agg, "error")
+        self.assertEqual(session.commits, 1)
+        self.assertEqual(len(session.statements), 4)
+        self.assertEqual(batch.upstream_failed, ["c"])
+        self.assertEqual([(v.node_id, v.object_key) for v in session.added], [(node_a, "joe/a.tgz")])
+
+    def test_aggregate_status_matches_python_rules(self):
+        """
+        The workflow status computed in SQL follows the per-node rules it replaced.
+        """
+        def python_rules(statuses):
+            if not statuses:
+                return None
+            if "error" in statuses:
+                return "error"
+            if set(statuses) <= {"success"}:
+                return "success"
+            return "running"
+
+        cases = [
+            (), ("success",), ("success", "success"), ("success", "error"), ("running", "success"),
+            ("idle",), ("queued", "idle"), ("error", "running"), ("error",),
+        ]
+        with Session(_sqlite_engine()) as session:
+            for statuses in cases:
+                wf = Workflow(name="wf", user="joe")
+                session.add(wf)
+                session.flush()
+                session.add_all(
+                    Node(workflow_id=wf.id, name=f"n{i}", kind="teehr", user="joe", status=status)
+                    for i, status in enumerate(statuses)
+                )
+                session.flush()
+                sql = session.execute(select(_aggregate_status_sql(wf.id))).scalar()
+                self.assertEqual(sql, python_rules(statuses), statuses)
+
+    def test_circuit_breaker_cycle(self):
+        """
+        closed -> open after N outages -> one half-open probe -> closed again on success.
+        """
+        breaker = CircuitBreaker(failures=2, reset_sec=0.05)
+        outage = requests.ConnectionError("down")
+
+        breaker.before_call()
+        breaker.record(outage)
+        self.assertFalse(breaker.is_open)
+        breaker.record(requests.HTTPError(response=mock.Mock(status_code=404)))  # 4xx: Argo answered, streak resets
+        breaker.record(outage)
+        self.assertFalse(breaker.is_open)
+        breaker.record(outage)
+        self.assertTrue(breaker.is_open)
+        self.assertRaises(ArgoUnavailable, breaker.before_call)
+
+        time.sleep(0.06)
+        breaker.before_call()  # this caller is the probe
+        self.assertRaises(ArgoUnavailable, breaker.before_call)
+        breaker.record(None)
+        self.assertFalse(breaker.is_open)
+        breaker.before_call()
+
+    def test_cancelled_probe_releases_breaker(self):
+        """
+        Cancelling the half-open probe must not leave the breaker refusing calls forever.
+        """
+        breaker = CircuitBreaker(failures=1, reset_sec=0.05)
+        breaker.record(requests.ConnectionError("down"))
+        time.sleep(0.06)
+        started, finish = threading.Event(), threading.Event()
+
+        def slow_call():
+            started.set()
+            finish.wait(5)
+
+        async def scenario():
+            task = asyncio.ensure_future(argo_client.argo_call(slow_call))
+            while not started.is_set():
+                await asyncio.sleep(0.005)
+            self.assertTrue(breaker.is_open)  # probe in flight
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            finish.set()
+
+        with mock.patch.object(argo_client, "breaker", breaker), \
+                mock.patch.object(argo_client, "limiter", RateLimiter(100, 10)):
+            asyncio.run(scenario())
+
+        self.assertFalse(breaker.is_open)
+        breaker.before_call()  # the next caller gets to probe
+
+    def test_background_services_start_once(self):
+        """
+        Schema check, reconciler, template refresher and queue dispatcher start once per process, not per connect.
+        """
+        async def scenario():
+            first = services.start_background_services()
+            self.assertIsNone(services.start_background_services())
+            self.assertIsNone(services.start_background_services(reconcile=False))
+            await first
+
+        with mock.patch.object(services, "_started", False), \
+                mock.patch("tethysapp.flowforge.model.init_db.ensure_schema", new_callable=mock.AsyncMock) as schema, \
+                mock.patch("tethysapp.flowforge.consumers.handlers.model_run_handler.get_async_engine",
+                           new_callable=mock.AsyncMock), \
+                mock.patch("tethysapp.flowforge.consumers.reconciler.reconcile_once") as reconcile, \
+                mock.patch("tethysapp.flowforge.argo.templates.start_template_refresher") as refresher, \
+                mock.patch("tethysapp.flowforge.consumers.admission.submission_queue") as queue:
+            asyncio.run(scenario())
+
+        calls = (schema.await_count, reconcile.call_count, refresher.call_count, queue.start.call_count)
+        self.assertEqual(calls, (1, 1, 1, 1))
+
+    def test_unchanged_graph_has_no_dirty_nodes(self):
+        """
+        Re-running a reloaded graph re-runs nothing: server-owned config (_runtime) is not a change.
+        """
+        stored = {
+            "nodes": [
+                {"id": "pre", "label": "Pre-Process", "config": {"vpu": "01"}},
+                {"id": "run", "label": "Run NGIAB", "config": {}},
+            ],
+            "edges": [{"source": "pre", "target": "run"}],
+        }
+        runtime = {"_runtime": {"tasks": ["t-run-ngiab-run-00"], "datasets": []}}
+        reloaded = [
+            {"id": "pre", "label": "Pre-Process", "config": {"vpu": "01", **runtime}},
+            {"id": "run", "label": "Run NGIAB", "config": dict(runtime)},
+        ]
+
+        self.assertEqual(dirty_nodes(stored, reloaded, stored["edges"], {"pre", "run"}), set())
+        self.assertEqual(graph_ir(reloaded, stored["edges"]), graph_ir(stored["nodes"], stored["edges"]))  # compile cache hit
+
+        reloaded[0]["config"]["vpu"] = "02"
+        self.assertEqual(dirty_nodes(stored, reloaded, stored["edges"], {"pre", "run"}), {"pre", "run"})
+
+    def test_requeued_workflow_forgets_previous_run(self):
+        """
+        A workflow re-queued for a new run must not be re-attached to its previous Argo run.
+        """
+        wf = Workflow(id=uuid.uuid4(), name="wf", user="joe", status="queued",
+                      message='{"argo_workflow": "ngiab-chain-old", "note": "kept"}')
+        row = Node(name="run", kind="Run NGIAB", status="running",
+                   config={"_runtime": {"tasks": ["t-run-ngiab-run-00"], "datasets": []}})
+        self.assertEqual(_runtime_watch_spec(wf, [row])["argo_workflow"], "ngiab-chain-old")
+
+        _forget_argo_run(wf)
+
+        self.assertEqual(wf.message, '{"note": "kept"}')
+        self.assertIsNone(_runtime_watch_spec(wf, [row]))
+
+    def test_cancel_from_another_replica_terminates_new_run(self):
+        """
+        A submission cancelled while its Argo run was being created gets that run terminated.
+        """
+        job = SubmissionJob(id="j", workflow_id="wf")
+        argo = mock.AsyncMock()
+        with mock.patch.object(backend, "argo_call", argo), \
+                mock.patch.object(backend.submission_queue, "cancelled", mock.AsyncMock(return_value=False)):
+            self.assertFalse(asyncio.run(backend._terminate_if_cancelled(job, "sub-1", "ngiab-chain-abc")))
+        argo.assert_not_awaited()
+
+        with mock.patch.object(backend, "argo_call", argo), \
+                mock.patch.object(backend.submission_queue, "cancelled", mock.AsyncMock(return_value=True)):
+            self.assertTrue(asyncio.run(backend._terminate_if_cancelled(job, "sub-1", "ngiab-chain-abc")))
+        argo.assert_awaited_once()
+        self.assertEqual(argo.await_args.args[:2], (backend.terminate_workflow, "ngiab-chain-abc"))
+        self.assertEqual((job.stage, job.error), ("failed", "cancelled"))
+
+    def test_single_node_watch_spec_follows_phase(self):
+        """
+        Ad-hoc node runs go through watch specs too, so the daemon / lease holder can watch them by phase.
+        """
+        wf_id = uuid.uuid4()
+        spec = backend.watch_spec("ngiab-run-x1", {}, {}, wf_id, "joe", channel="chan-1", phase_node="run")
+        self.assertEqual((spec["phase_node"], spec["reply_to"]), ("run", "chan-1"))
+        self.assertNotIn("phase_node", backend.watch_spec("ngiab-chain-abc", {"run": ["t"]}, {}, wf_id, "joe"))
+
+        registry = mock.Mock()
+        with mock.patch.object(backend, "watchers", registry), \
+                mock.patch.object(backend, "WATCHER_LEADERSHIP", "local"), \
+                mock.patch.object(backend, "_watch_workflow_phase", mock.Mock(return_value="phase")) as phase, \
+                mock.patch.object(backend, "_watch_workflow_nodes", mock.Mock(return_value="nodes")):
+            backend.start_status_watcher(spec)
+            key, factory = registry.ensure.call_args.args
+            self.assertEqual((key, factory()), ("ngiab-run-x1", "phase"))
+        self.assertEqual(phase.call_args.args[1:], ("ngiab-run-x1", "run", wf_id))
+
+    def test_poll_scheduler_cadence(self):
+        """
+        Fast while Pending / just submitted, stretched (capped) while a long run is quiet,
+        tight again near its expected end, never slow for short kinds.
+        """
+        clock = [1000.0]
+        with mock.patch.object(schedule.time, "monotonic", lambda: clock[0]):
+            polls = schedule.PollScheduler()
+            polls.track("long", kinds=["pre", "cal_run"])
+            polls.track("short", kinds=["cal_cfg"])
+
+            self.assertEqual(polls.observe("long", "Pending", True), schedule.POLL_FAST_SEC)
+            self.assertFalse(polls.due("long"))
+            self.assertEqual(polls.next_delay(["long", "untracked"]), schedule.POLL_FAST_SEC)
+
+            clock[0] += schedule.POLL_FAST_WINDOW_SEC + 1
+            self.assertEqual(polls.observe("long", "Running", True), schedule.POLL_SEC)
+            clock[0] += schedule.POLL_RAMP_SEC
+            stretched = polls.observe("long", "Running", False)
+            self.assertGreater(stretched, schedule.POLL_SEC)
+            clock[0] += schedule.POLL_RAMP_SEC * schedule.POLL_MAX_SEC / schedule.POLL_SEC
+            self.assertEqual(polls.observe("long", "Running", False), schedule.POLL_MAX_SEC)
+            self.assertEqual(polls.observe("long", "Running", True), schedule.POLL_SEC)  # change resets the ramp
+
+            clock[0] = 1000.0 + 0.8 * schedule.EXPECTED_SEC_BY_KIND["cal_run"]
+            polls.observe("long", "Running", False)
+            clock[0] += schedule.POLL_RAMP_SEC * 10
+            self.assertEqual(polls.observe("long", "Running", False), schedule.POLL_SEC)  # near the expected end
+
+            polls.observe("short", "Running", True)
+            clock[0] += schedule.POLL_RAMP_SEC * 10
+            self.assertEqual(polls.observe("short", "Running", False), schedule.POLL_SEC)
+            self.assertTrue(polls.due("untracked"))
+
+    def test_poll_scheduler_backoff(self):
+        """
+        Failed reads back off exponentially (with jitter, capped); one good read resets it.
+        """
+        with mock.patch.object(schedule.time, "monotonic", lambda: 5000.0):
+            polls = schedule.PollScheduler()
+            polls.track("wf")
+            for errors in range(1, 12):
+                ceiling = min(schedule.POLL_ERROR_MAX_SEC, schedule.POLL_SEC * 2 ** errors)
+                backoff = polls.failed("wf")
+                self.assertGreaterEqual(backoff, ceiling / 2)
+                self.assertLessEqual(backoff, ceiling)
+            self.assertEqual(polls.snapshot()["wf"]["errors"], 11)
+
+            self.assertEqual(polls.observe("wf", "Pending", False), schedule.POLL_FAST_SEC)
+            self.assertEqual(polls.snapshot()["wf"]["errors"], 0)
+            self.assertLessEqual(polls.failed("wf"), schedule.POLL_SEC * 2)
+
+    def test_rate_limiter_reserves_tokens_for_priority_calls(self):
+        """
+        Status reads stop at their reserve; submissions and control calls still get tokens; refill is timed.
+        """
+        clock = [0.0]
+        with mock.patch.object(limits.time, "monotonic", lambda: clock[0]):
+            bucket = RateLimiter(rate=2.0, burst=10)
+            taken = 0
+            while bucket.try_acquire(limits.PRIORITY_STATUS) == 0.0:
+                taken += 1
+            self.assertEqual(taken, 5)  # half the bucket stays for higher priorities
+            self.assertAlmostEqual(bucket.try_acquire(limits.PRIORITY_STATUS), 0.5)
+
+            self.assertEqual(bucket.try_acquire(limits.PRIORITY_TEMPLATE), 0.0)
+            self.assertEqual(bucket.try_acquire(limits.PRIORITY_TEMPLATE), 0.0)
+            self.assertGreater(bucket.try_acquire(limits.PRIORITY_TEMPLATE), 0.0)
+            self.assertEqual(bucket.try_acquire(limits.PRIORITY_CONTROL), 0.0)
+            self.assertEqual(bucket.try_acquire(limits.PRIORITY_SUBMIT), 0.0)
+            self.assertEqual(bucket.try_acquire(limits.PRIORITY_SUBMIT), 0.0)  # submissions may drain it
+            self.assertAlmostEqual(bucket.try_acquire(limits.PRIORITY_SUBMIT), 0.5)
+
+            clock[0] += 5.0  # refilled to 10 (burst cap)
+            self.assertEqual(sum(bucket.try_acquire(limits.PRIORITY_SUBMIT) == 0.0 for _ in range(12)), 10)
+
+    def test_argo_call_submit_passes_waiting_status_reads(self):
+        """
+        With the bucket at the status reserve, a submission goes through while a status read waits.
+        """
+        bucket = RateLimiter(rate=0.5, burst=4)
+
+        async def scenario():
+            await argo_client.argo_call(lambda: "read")
+            await argo_client.argo_call(lambda: "read")
+            status = asyncio.ensure_future(argo_client.argo_call(lambda: "late read"))
+            submit = await asyncio.wait_for(
+                argo_client.argo_call(lambda: "created", priority=limits.PRIORITY_SUBMIT), timeout=1.0,
+            )
+            self.assertEqual(submit, "created")
+            self.assertFalse(status.done())
+            status.cancel()
+            await asyncio.gather(status, return_exceptions=True)
+
+        with mock.patch.object(argo_client, "limiter", bucket), \
+                mock.patch.object(argo_client, "breaker", CircuitBreaker(failures=3, reset_sec=30)):
+            asyncio.run(scenario())
+
+    def test_lease_key_is_stable_signed_64_bit(self):
+        """
+        Every replica derives the same advisory-lock key for a workflow name, and it fits a Postgres bigint.
+        """
+        key = leadership.lease_key("ngiab-chain-abc")
+        self.assertEqual(key, leadership.lease_key("ngiab-chain-abc"))
+        self.assertNotEqual(key, leadership.lease_key("ngiab-chain-abd"))
+        for name in ("", "x", "ngiab-chain-abc", "a" * 300):
+            self.assertTrue(-2 ** 63 <= leadership.lease_key(name) < 2 ** 63)
+
+    def test_run_as_leader_standby_and_takeover(self):
+        """
+        A standby polls until the lease frees up, then leads; a lost lease stops the body and
+        sends it back to standby, which ends once the workflow is no longer wanted.
+        """
+        class FakeLeases:
+            def __init__(self, grants):
+                self.grants = list(grants)  # per try: True = lease granted
+                self.lost = []
+                self.released = []
+
+            async def try_acquire(self, name):
+                if not self.grants.pop(0):
+                    return None
+                self.lost.append(asyncio.Event())
+                return self.lost[-1]
+
+            async def release(self, name):
+                self.released.append(name)
+
+        async def standby_then_lead():
+            ran = []
+
+            async def body():
+                ran.append(len(fake.grants))
+
+            await leadership.run_as_leader("wf-a", body, mock.AsyncMock(return_value=True))
+            return ran
+
+        fake = FakeLeases([False, False, True])
+        with mock.patch.object(leadership, "leases", fake), mock.patch.object(leadership, "LEASE_RETRY_SEC", 0):
+            self.assertEqual(asyncio.run(standby_then_lead()), [0])
+        self.assertEqual(fake.released, ["wf-a"])
+
+        async def lose_lease():
+            started = asyncio.Event()
+            cancelled = []
+
+            async def body():
+                started.set()
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    cancelled.append(True)
+                    raise
+
+            leader = asyncio.ensure_future(leadership.run_as_leader("wf-b", body, wanted))
+            await started.wait()
+            fake.lost[-1].set()  # e.g. the lease connection died
+            await asyncio.wait_for(leader, timeout=1.0)
+            return cancelled
+
+        fake = FakeLeases([True])
+        wanted = mock.AsyncMock(return_value=False)
+        with mock.patch.object(leadership, "leases", fake), mock.patch.object(leadership, "LEASE_RETRY_SEC", 0):
+            self.assertEqual(asyncio.run(lose_lease()), [True])
+        self.assertEqual(fake.released, ["wf-b"])
+        self.assertEqual(wanted.await_count, 1)  # back on standby, which ends as the run is no longer wanted
+
+    def test_compile_cache_reuses_unchanged_graph(self):
+        """
+        The same graph+config compiles once; each run only swaps in its user and workflow id.
+        """
+        chain = [
+            {"id": "pre", "label": "Pre-Process", "config": {"selector_value": "01359139"}},
+            {"id": "run", "label": "Run NGIAB", "config": {}},
+        ]
+        edges = [{"source": "pre", "target": "run"}]
+        ngiab_compiler._compile_cached.cache_clear()
+
+        first = ngiab_compiler.compile_chain(chain, edges)
+        again = ngiab_compiler.compile_chain([dict(n) for n in chain], list(edges))
+        self.assertIs(again, first)
+        self.assertEqual(ngiab_compiler._compile_cached.cache_info().hits, 1)
+
+        changed = [chain[0], {"id": "run", "label": "Run NGIAB", "config": {"ngen_np": "4"}}]
+        self.assertIsNot(ngiab_compiler.compile_chain(changed, edges), first)
+
+        manifest, tasks_by_node, _ = first.render("joe", "wf-1")
+        text = json.dumps(manifest)
+        self.assertNotIn(ngiab_compiler.USER_PLACEHOLDER, text)
+        self.assertNotIn(ngiab_compiler.WF_UUID_PLACEHOLDER, text)
+        self.assertEqual(manifest["metadata"]["labels"], first.render("ann", "wf-1")[0]["metadata"]["labels"])
+        self.assertIn("joe/", text)
+        tasks_by_node["run"].append("mutated")
+        self.assertNotIn("mutated", first.tasks_by_node["run"])  # runs get copies, the cache stays intact
+
+    def test_parallelism_caps_and_resource_requests(self):
+        """
+        Run options bound the workflow, a stage cap wraps the stage in a nested DAG, ngen_np sizes
+        the NGIAB pods; pod sizes alone do not change what a task computes (its cache key).
+        """
+        chain = [{"id": f"pre-{i}", "label": "Pre-Process", "config": {"vpu": str(i)}} for i in range(3)]
+        chain.append({"id": "run", "label": "Run NGIAB", "config": {"ngen_np": "4", "max_parallel": "2"}})
+        edges = [{"source": f"pre-{i}", "target": "run"} for i in range(3)]
+        options = WorkflowOptions.from_data({"parallelism": 5, "priorityClass": "batch-low"})
+
+        with mock.patch.object(ngiab_compiler, "FANOUT_COMPACT_AT", 0), mock.patch.object(ngiab_compiler, "MEMOIZE", True):
+            plan = plan_chain(graph_ir(chain, edges, options=options), "joe", "wf-uuid")
+            bigger = [*chain[:3], {"id": "run", "label": "Run NGIAB",
+                                   "config": {"ngen_np": "4", "max_parallel": "2", "memory_request": "32Gi"}}]
+            bigger_plan = plan_chain(graph_ir(bigger, edges, options=options), "joe", "wf-uuid")
+        manifest = render_manifest(plan, "wf-uuid")
+        self.assertEqual(manifest, render_hera(plan, "wf-uuid").to_dict())
+
+        self.assertEqual((manifest["spec"]["parallelism"], manifest["spec"]["podPriorityClassName"]), (5, "batch-low"))
+        group = next(t for t in manifest["spec"]["templates"] if t["name"] == "g-run-ngiab-run")
+        self.assertEqual(group["parallelism"], 2)
+        self.assertEqual(len(group["dag"]["tasks"]), 3)
+        main = {t["name"]: t for t in manifest["spec"]["templates"][0]["dag"]["tasks"]}
+        self.assertEqual(sorted(main["g-run-ngiab-run"]["dependencies"]), [f"t-pre-process-pre-{i}-00" for i in range(3)])
+
+        params = {p["name"]: p["value"] for p in group["dag"]["tasks"][0]["arguments"]["parameters"]}
+        self.assertEqual((params["cpu_request"], params["memory_request"]), ("4", "8Gi"))
+        keys = [p["cache_key"] for p in plan.datasets_by_node["run"]]
+        self.assertTrue(all(keys))
+        self.assertEqual(keys, [p["cache_key"] for p in bigger_plan.datasets_by_node["run"]])
+
+    def test_memo_hits_replace_tasks(self):
+        """
+        Instances whose cache key has a recorded output get no task; downstream reads that output.
+        Keys ignore where outputs go, follow upstream content, and opt-outs are never memoized.
+        """
+        chain = [
+            {"id": "pre", "label": "Pre-Process", "config": {"selector_value": "01359139"}},
+            {"id": "run", "label": "Run NGIAB", "config": {}},
+            {"id": "teehr", "label": "TEEHR", "config": {"cache": "false"}},
+        ]
+        edges = [{"source": "pre", "target": "run"}, {"source": "run", "target": "teehr"}]
+        with mock.patch.object(ngiab_compiler, "MEMOIZE", True):
+            cold = plan_chain(graph_ir(chain, edges), "joe", "wf-1")
+            other_run = plan_chain(graph_ir(chain, edges), "joe", "wf-2")
+            pre_key = cold.datasets_by_node["pre"][0]["cache_key"]
+            run_key = cold.datasets_by_node["run"][0]["cache_key"]
+            reuse = {pre_key: ("bkt", "joe/old/pre.tgz")}
+            warm = plan_chain(graph_ir(chain, edges, reuse=reuse), "joe", "wf-3")
+
+        self.assertTrue(pre_key and run_key)
+        self.assertEqual(pre_key, other_run.datasets_by_node["pre"][0]["cache_key"])  # output location is ignored
+        self.assertIsNone(cold.datasets_by_node["teehr"][0]["cache_key"])
+
+        self.assertNotIn("pre", warm.tasks_by_node)
+        self.assertEqual(warm.reused_by_node["pre"][0]["dataset_key"], "joe/old/pre.tgz")
+        run_task = next(t for t in warm.tasks if t.name in warm.tasks_by_node["run"])
+        self.assertIsNone(run_task.dependencies)  # the reused parent has no task to wait for
+        self.assertEqual(dict(run_task.params)["input_key"], "joe/old/pre.tgz")
+        self.assertEqual(warm.datasets_by_node["run"][0]["cache_key"], run_key)  # same content, same key
+
+    def test_retry_resets_only_failed_nodes(self):
+        """
+        RETRY_WORKFLOW retries the stored Argo run, resets failed rows only and re-attaches a watcher
+        for them; a running workflow is refused and a run Argo no longer has is re-run instead.
+        """
+        with Session(_sqlite_engine(), expire_on_commit=False) as session:
+            wf = _seed_workflow(session, "error", "ngiab-chain-abc", [
+                ("pre", "success", ["t-pre"]), ("run", "error", ["t-run"]), ("teehr", "error", ["t-teehr"]),
+            ])
+            handler, consumer = _handler(session)
+            argo, watch = mock.AsyncMock(), mock.AsyncMock()
+            with mock.patch.object(backend, "argo_call", argo), mock.patch.object(backend, "launch_watcher", watch):
+                asyncio.run(handler.receive_retry_workflow(None, {"type": "RETRY_WORKFLOW"}, {"workflowId": str(wf.id)}))
+
+            self.assertEqual(argo.await_args.args[:2], (backend.retry_workflow, "ngiab-chain-abc"))
+            statuses = dict(session.execute(select(Node.name, Node.status)).all())
+            self.assertEqual(statuses, {"pre": "success", "run": "running", "teehr": "running"})
+            session.refresh(wf)
+            self.assertEqual(wf.status, "running")
+            self.assertEqual(watch.await_args.args[:2], ("ngiab-chain-abc", {"run": ["t-run"], "teehr": ["t-teehr"]}))
+
+            # running: refused, Argo untouched
+            argo.reset_mock()
+            with mock.patch.object(backend, "argo_call", argo):
+                asyncio.run(handler.receive_retry_workflow(None, {"type": "RETRY_WORKFLOW"}, {"workflowId": str(wf.id)}))
+            argo.assert_not_awaited()
+            self.assertEqual(consumer.send_action.await_args.args[1]["message"], "Workflow is still running.")
+
+            # gone from Argo: incremental re-run of the stored graph
+            wf.status = "error"
+            session.commit()
+            handler.receive_run_workflow = mock.AsyncMock()
+            gone = mock.AsyncMock(side_effect=NotFound("gone"))
+            with mock.patch.object(backend, "argo_call", gone):
+                asyncio.run(handler.receive_retry_workflow(None, {"type": "RETRY_WORKFLOW"}, {"workflowId": str(wf.id)}))
+            rerun = handler.receive_run_workflow.await_args.args[2]
+            self.assertEqual((rerun["workflowId"], [n["id"] for n in rerun["workflow"]["nodes"]]),
+                             (str(wf.id), ["pre", "run", "teehr"]))
+            consumer.send_error.assert_not_awaited()
+
+    def test_cancel_marks_unfinished_nodes_and_stops_run(self):
+        """
+        CANCEL_WORKFLOW flags the submission, terminates (or gracefully stops) the Argo run, drops
+        its watcher and marks every unfinished node cancelled in one go; finished nodes keep their state.
+        """
+        with Session(_sqlite_engine(), expire_on_commit=False) as session:
+            wf = _seed_workflow(session, "running", "ngiab-chain-abc", [
+                ("pre", "success", ["t-pre"]), ("run", "running", ["t-run"]), ("teehr", "idle", ["t-teehr"]),
+            ])
+            session.add(Submission(workflow_id=wf.id, user="joe", kind="chain", payload={}, status="dispatched"))
+            session.commit()
+            handler, consumer = _handler(session)
+            argo, registry = mock.AsyncMock(), mock.Mock()
+            with mock.patch.object(backend, "argo_call", argo), mock.patch.object(backend, "watchers", registry), \
+                    mock.patch.object(backend, "FLOWFORGE_WATCHER_MODE", "inprocess"), \
+                    mock.patch.object(backend.submissions, "cancel", mock.AsyncMock(return_value=[])):
+                asyncio.run(handler.receive_cancel_workflow(None, {"type": "CANCEL_WORKFLOW"}, {"workflowId": str(wf.id)}))
+
+            self.assertEqual(argo.await_args.args[:2], (backend.terminate_workflow, "ngiab-chain-abc"))
+            registry.cancel.assert_called_once_with("ngiab-chain-abc")
+            rows = {name: (st, msg) for name, st, msg in session.execute(select(Node.name, Node.status, Node.message))}
+            self.assertEqual(rows["pre"][0], "success")
+            self.assertEqual(rows["run"], ("error", backend.CANCELLED))
+            self.assertEqual(rows["teehr"], ("error", backend.CANCELLED))
+            self.assertEqual(session.execute(select(Submission.status)).scalar(), "cancelled")
+            session.refresh(wf)
+            self.assertEqual(wf.status, "error")
+            consumer.send_error.assert_not_awaited()
+
+            # a late watcher tick of the terminated run does not bring the node back
+            batch = _NodeStatusBatch(wf.id)
+            batch.set_status("run", "running", "argo: Running")
+            asyncio.run(batch.flush(_AsyncSession(session)))
+            self.assertEqual(session.execute(select(Node.status).where(Node.name == "run")).scalar(), "error")
+
+            argo.reset_mock()
+            wf.status = "running"
+            session.execute(Node.__table__.update().where(Node.name == "teehr").values(status="running"))
+            session.commit()
+            with mock.patch.object(backend, "argo_call", argo), mock.patch.object(backend, "watchers", registry), \
+                    mock.patch.object(backend.submissions, "cancel", mock.AsyncMock(return_value=[])):
+                asyncio.run(handler.receive_cancel_node(
+                    None, {"type": "CANCEL_NODE"}, {"nodeId": "teehr", "workflowId": str(wf.id), "graceful": True},
+                ))
+            self.assertEqual(argo.await_args.args[:2], (backend.stop_workflow, "ngiab-chain-abc"))
+            self.assertEqual(session.execute(select(Node.message).where(Node.name == "teehr")).scalar(), backend.CANCELLED)
+
+    def test_adhoc_nodes_share_one_run(self):
+        """
+        Disconnected nodes selected together become one workflow row, one submission and one
+        edgeless manifest whose tasks do not depend on each other.
+        """
+        with Session(_sqlite_engine(), expire_on_commit=False) as session:
+            handler, consumer = _handler(session)
+            consumer.channel_name = "specific.abc"
+            nodes = [
+                {"id": "pre", "label": "Pre-Process", "config": {"input_s3_url": "s3://bucket//in/data.nc"}},
+                {"id": "teehr", "label": "TEEHR", "config": {}},
+            ]
+            with mock.patch.object(backend.submission_queue, "wake"):
+                asyncio.run(handler._run_adhoc_batch(_AsyncSession(session), nodes, "joe", "real"))
+
+            wf = session.execute(select(Workflow)).scalar_one()
+            self.assertEqual((wf.status, wf.graph["edges"], wf.layers), ("queued", [], [["pre", "teehr"]]))
+            self.assertEqual(sorted(session.execute(select(Node.name)).scalars()), ["pre", "teehr"])
+            sub = session.execute(select(Submission)).scalar_one()
+            self.assertEqual((sub.workflow_id, sub.node_ids, sub.payload["reply_to"]), (wf.id, ["pre", "teehr"], "specific.abc"))
+            self.assertEqual(sub.payload["nodes"][0]["config"]["input_key"], "in/data.nc")
+            submitted = [c.args[1] for c in consumer.send_action.await_args_list if c.args[0] == backend.BackendActions.WORKFLOW_SUBMITTED]
+            self.assertEqual([s["nodeIds"] for s in submitted], [["pre", "teehr"]])
+
+            manifest, tasks_by_node, _ = ngiab_compiler.compile_chain(sub.payload["nodes"], []).render("joe", str(wf.id))
+            self.assertEqual(set(tasks_by_node), {"pre", "teehr"})
+            dag = next(t["dag"]["tasks"] for t in manifest["spec"]["templates"] if "dag" in t)
+            self.assertEqual(len(dag), 2)
+            self.assertFalse(any(t.get("dependencies") or t.get("depends") for t in dag))
+
+    def test_reopened_workflow_relaunches_unfinished_nodes_only(self):
+        """
+        GET_WORKFLOW of a running workflow re-attaches a watcher for the rows that still have
+        tasks to follow (the reconciler's spec); finished workflows get none.
+        """
+        with Session(_sqlite_engine(), expire_on_commit=False) as session:
+            wf = _seed_workflow(session, "running", "ngiab-chain-abc", [
+                ("pre", "success", ["t-pre"]), ("run", "running", ["t-run"]), ("teehr", "idle", []),
+            ])
+            handler, consumer = _handler(session)
+            launch = mock.AsyncMock()
+            with mock.patch.object(backend, "launch_watch_spec", launch):
+                asyncio.run(handler.receive_get_workflow(None, {"type": "GET_WORKFLOW"}, {"id": wf.id}))
+
+            spec = launch.await_args.args[0]
+            self.assertEqual(spec, _runtime_watch_spec(wf, session.execute(select(Node)).scalars().all()))
+            self.assertEqual((spec["argo_workflow"], spec["tasks"]), ("ngiab-chain-abc", {"run": ["t-run"]}))
+            consumer.follow_workflow.assert_awaited_once_with(wf.id)
+
+            wf.status = "success"
+            session.commit()
+            launch.reset_mock()
+            with mock.patch.object(backend, "launch_watch_spec", launch):
+                asyncio.run(handler.receive_get_workflow(None, {"type": "GET_WORKFLOW"}, {"id": wf.id}))
+            launch.assert_not_awaited()
+            consumer.send_error.assert_not_awaited()
+
+    def test_only_unclaimed_stale_submissions_are_requeued(self):
+        """
+        A dispatched row goes back to the queue only when no job claimed it for QUEUE_ORPHAN_SEC;
+        a job holding an outdated dispatch (row re-queued and dispatched again) cannot claim it.
+        """
+        now = datetime.now(timezone.utc)
+        stale = now - timedelta(seconds=admission.QUEUE_ORPHAN_SEC + 60)
+        with Session(_sqlite_engine(), expire_on_commit=False) as session:
+            wf = _seed_workflow(session, "queued", None, [("run", "idle", [])])
+            rows = {
+                name: Submission(workflow_id=wf.id, user="joe", kind="chain", payload={}, status=status, dispatched_at=at)
+                for name, status, at in [
+                    ("fresh", "dispatched", now), ("orphan", "dispatched", stale), ("claimed", "submitting", stale),
+                ]
+            }
+            session.add_all(rows.values())
+            session.commit()
+            queue = admission.SubmissionQueue()
+            sessions = mock.AsyncMock(return_value=lambda: _AsyncSession(session))
+            with mock.patch.object(admission, "get_async_sessionmaker", sessions):
+                self.assertEqual(asyncio.run(queue._requeue_orphans()), 1)
+                self.assertTrue(asyncio.run(queue.claim(rows["fresh"])))
+                self.assertFalse(asyncio.run(queue.claim(rows["fresh"])))  # already submitting
+
+                # the orphan's old job shows up after it was re-queued and dispatched again
+                session.execute(Submission.__table__.update().where(Submission.id == rows["orphan"].id)
+                                .values(status="dispatched", dispatched_at=now))
+                session.commit()
+                outdated = mock.Mock(id=rows["orphan"].id, dispatched_at=stale)
+                self.assertFalse(asyncio.run(queue.claim(outdated)))
+
+            current = dict(session.execute(select(Submission.id, Submission.status)).all())
+            statuses = {name: current[row.id] for name, row in rows.items()}
+            self.assertEqual(statuses, {"fresh": "submitting", "orphan": "dispatched", "claimed": "submitting"})